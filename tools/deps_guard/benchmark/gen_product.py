@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+import random
+import struct
+
+BASE_ADDR = 0x1000
+PAGE_SIZE = 0x1000
+TOOLCHAIN = "(//build/toolchain/ohos:ohos_clang_arm64)"
+
+SHT_PROGBITS = 1
+SHT_STRTAB = 3
+SHT_DYNAMIC = 6
+SHT_NOBITS = 8
+SHT_DYNSYM = 11
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+def _align(size, align):
+	return (size + align - 1) & ~(align - 1)
+
+def build_elf(needed, soname="", exports=(), imports=(), text_size=256, data_size=64, bss_size=0):
+	"""
+	Build a minimal ELF64 little endian shared object or executable.
+
+	It has a read only segment with .dynsym, .dynstr and .text, a writable
+	segment with .data, .dynamic and .bss, and full section headers, which
+	is all deps_guard and readelf need.
+	"""
+	dynstr = bytearray(b"\0")
+	def add_string(s):
+		offset = len(dynstr)
+		dynstr.extend(s.encode() + b"\0")
+		return offset
+
+	needed_offsets = [add_string(name) for name in needed]
+	soname_offset = add_string(soname) if soname else 0
+
+	# Symbol 0 is the null symbol, defined ones live in .text (section 3)
+	dynsym = bytearray(24)
+	for name in imports:
+		dynsym.extend(struct.pack("<IBBHQQ", add_string(name), 0x12, 0, 0, 0, 0))
+	for idx, name in enumerate(exports):
+		dynsym.extend(struct.pack("<IBBHQQ", add_string(name), 0x12, 0, 3, idx * 16, 16))
+
+	ehsize = 64
+	phnum = 3
+	dynsym_off = ehsize + phnum * 56
+	dynstr_off = dynsym_off + len(dynsym)
+	text_off = _align(dynstr_off + len(dynstr), 16)
+	ro_end = text_off + text_size
+
+	# Writable segment starts on a new page in memory, same offset modulo page size in file
+	data_off = _align(ro_end, 16)
+	rw_vaddr = BASE_ADDR + PAGE_SIZE + _align(data_off, PAGE_SIZE) + (data_off % PAGE_SIZE)
+	dyn_off = _align(data_off + data_size, 8)
+
+	dyn = [(1, off) for off in needed_offsets]
+	if soname:
+		dyn.append((14, soname_offset))
+	dyn.extend([
+		(5, BASE_ADDR + dynstr_off),
+		(6, BASE_ADDR + dynsym_off),
+		(10, len(dynstr)),
+		(11, 24),
+		(0, 0)
+	])
+	dynamic = b"".join([struct.pack("<qQ", tag, val) for tag, val in dyn])
+	rw_end = dyn_off + len(dynamic)
+
+	shstrtab = b"\0.dynsym\0.dynstr\0.text\0.data\0.dynamic\0.bss\0.shstrtab\0"
+	shstrtab_off = rw_end
+	sh_off = _align(shstrtab_off + len(shstrtab), 8)
+
+	def rw_addr(off):
+		return rw_vaddr + off - data_off
+
+	header = b"\x7fELF" + bytes([2, 1, 1]) + b"\0" * 9
+	header += struct.pack("<HHIQQQIHHHHHH", 3, 183, 1, 0, ehsize, sh_off, 0, ehsize, 56, phnum, 64, 8, 7)
+
+	phdrs = struct.pack("<IIQQQQQQ", 1, 5, 0, BASE_ADDR, BASE_ADDR, ro_end, ro_end, PAGE_SIZE)
+	phdrs += struct.pack("<IIQQQQQQ", 1, 6, data_off, rw_addr(data_off), rw_addr(data_off), rw_end - data_off, rw_end - data_off + bss_size, PAGE_SIZE)
+	phdrs += struct.pack("<IIQQQQQQ", 2, 6, dyn_off, rw_addr(dyn_off), rw_addr(dyn_off), len(dynamic), len(dynamic), 8)
+
+	def shdr(name, sh_type, flags, addr, off, size, link=0, info=0, align=1, entsize=0):
+		return struct.pack("<IIQQQQIIQQ", name, sh_type, flags, addr, off, size, link, info, align, entsize)
+
+	shdrs = shdr(0, 0, 0, 0, 0, 0)
+	shdrs += shdr(1, SHT_DYNSYM, SHF_ALLOC, BASE_ADDR + dynsym_off, dynsym_off, len(dynsym), 2, 1 + len(imports), 8, 24)
+	shdrs += shdr(9, SHT_STRTAB, SHF_ALLOC, BASE_ADDR + dynstr_off, dynstr_off, len(dynstr))
+	shdrs += shdr(17, SHT_PROGBITS, SHF_ALLOC | SHF_EXECINSTR, BASE_ADDR + text_off, text_off, text_size, align=16)
+	shdrs += shdr(23, SHT_PROGBITS, SHF_ALLOC | SHF_WRITE, rw_addr(data_off), data_off, data_size, align=16)
+	shdrs += shdr(29, SHT_DYNAMIC, SHF_ALLOC | SHF_WRITE, rw_addr(dyn_off), dyn_off, len(dynamic), 2, 0, 8, 16)
+	shdrs += shdr(38, SHT_NOBITS, SHF_ALLOC | SHF_WRITE, rw_addr(rw_end), rw_end, bss_size, align=16)
+	shdrs += shdr(43, SHT_STRTAB, 0, 0, shstrtab_off, len(shstrtab))
+
+	out = bytearray(header + phdrs + dynsym + dynstr)
+	out.extend(b"\0" * (text_off - len(out)))
+	out.extend(b"\xc0\x03\x5f\xd6" * (text_size // 4))
+	out.extend(b"\0" * (dyn_off - len(out)))
+	out.extend(dynamic)
+	out.extend(shstrtab)
+	out.extend(b"\0" * (sh_off - len(out)))
+	out.extend(shdrs)
+	return bytes(out)
+
+def build_hcb(module_names):
+	"""Build hdf_default.hcb with one device host for each HDI service module."""
+	def string(s):
+		return s.encode() + b"\0"
+	def node(name, attrs, children=()):
+		body = b""
+		for attr, value in attrs:
+			body += b"\x02" + string(attr) + b"\x14" + string(value)
+		for child in children:
+			body += child
+		return b"\x01" + string(name) + struct.pack("<I", len(body)) + body
+
+	hosts = []
+	for idx, name in enumerate(module_names):
+		device = node("device0", [], [node("device_node", [("moduleName", name), ("serviceName", "%s_service" % name)])])
+		hosts.append(node("host%d" % idx, [("hostName", "%s_host" % name)], [device]))
+	root = node("root", [("module", "default")], [node("device_info", [("match_attr", "hdf_manager")], hosts)])
+	return struct.pack("<IIIIi", 0xA00AA00A, 1, 0, 0, len(root)) + root
+
+class ProductGenerator(object):
+	"""
+	Generate a fake product out directory for benchmarking deps_guard.
+
+	The packages/phone tree holds system libraries, executables, napi
+	modules, SA modules, chipset (vendor) modules and HDI services with a
+	random but acyclic NEEDED graph, and some libraries are depended by a
+	symbolic link name. system_module_info.json, SA profiles,
+	hdf_default.hcb and build_configs/parts_info/inner_kits_info.json
+	describe the modules the same way a real build does. The same seed always gives the same product.
+	"""
+	def __init__(self, out_path, modules=1000, fanout=4, exports=20, imports=2, seed=0):
+		self._out_path = out_path
+		self._count = modules
+		self._fanout = fanout
+		self._exports = exports
+		self._imports = imports
+		self._random = random.Random(seed)
+		self._modules = []
+
+	def __add_module(self, kind, idx):
+		component = "part_%d" % (idx % max(1, self._count // 20))
+		if kind in ("bin", "vendor_bin"):
+			name = "%s_%d" % (kind, idx)
+		else:
+			name = "lib%s_%d.z.so" % (kind, idx)
+		if kind == "napi":
+			path = "system/lib64/module/%s" % name
+		elif kind in ("bin", ):
+			path = "system/bin/%s" % name
+		elif kind == "vendor_bin":
+			path = "vendor/bin/%s" % name
+		elif kind in ("vendor", "hdi"):
+			path = "vendor/lib64/%s" % name
+		else:
+			path = "system/lib64/%s" % name
+		mod = {
+			"idx": len(self._modules),
+			"kind": kind,
+			"name": name,
+			"path": path,
+			"component": component,
+			"label": "//%s/%s:%s" % (component, kind, name.split(".")[0]),
+			"needed": [],
+			"link": None
+		}
+		self._modules.append(mod)
+		return mod
+
+	def __plan_modules(self):
+		# Libraries come first, so picking callees from earlier modules never makes a cycle
+		count = self._count
+		kinds = [("vendor_bin", 0.02), ("napi", 0.02), ("sa", 0.03), ("bin", 0.10), ("vendor", 0.08), ("hdi", 0.02)]
+		numbers = [(kind, max(1, int(count * ratio))) for kind, ratio in kinds]
+		numbers.insert(0, ("lib", max(1, count - sum([n for kind, n in numbers]))))
+		idx = 0
+		for kind, n in numbers:
+			for i in range(n):
+				self.__add_module(kind, idx)
+				idx += 1
+
+		libs = [mod for mod in self._modules if mod["kind"] == "lib"]
+		for mod in libs[:max(1, len(libs) // 20)]:
+			mod["chipsetsdk"] = True
+		for mod in self._random.sample(libs, len(libs) // 20):
+			mod["link"] = mod["name"].replace(".z.so", ".so")
+
+		chipsetsdks = [mod for mod in libs if mod.get("chipsetsdk")]
+		vendor_libs = []
+		for mod in self._modules:
+			if mod["kind"] == "lib":
+				# Prefer nearby libraries, like layers of a real system
+				candidates = libs[max(0, mod["idx"] - 200):mod["idx"]]
+			elif mod["kind"] in ("vendor", "vendor_bin", "hdi"):
+				candidates = chipsetsdks + vendor_libs
+			else:
+				candidates = libs
+
+			n = min(len(candidates), self._random.randint(0, 2 * self._fanout))
+			mod["needed"] = self._random.sample(candidates, n)
+			if mod["kind"] == "vendor":
+				vendor_libs.append(mod)
+
+	def __write_elf(self, mod):
+		images = os.path.join(self._out_path, "packages/phone")
+		file = os.path.join(images, mod["path"])
+		needed = [(dep["link"] or dep["name"]) if self._random.random() < 0.5 else dep["name"] for dep in mod["needed"]]
+		exports = []
+		if mod["kind"] not in ("bin", "vendor_bin"):
+			exports = ["%s_f%d" % (mod["name"].split(".")[0], i) for i in range(self._exports)]
+		imports = []
+		for dep in mod["needed"]:
+			imports.extend(["%s_f%d" % (dep["name"].split(".")[0], i) for i in range(min(self._imports, self._exports))])
+
+		soname = mod["name"] if exports else ""
+		with open(file, "wb") as f:
+			f.write(build_elf(needed, soname, exports, imports,
+				self._random.randint(1, 64) * 64, self._random.randint(0, 16) * 64, self._random.randint(0, 4) * 1024))
+		if mod["link"]:
+			link = os.path.join(os.path.dirname(file), mod["link"])
+			if not os.path.lexists(link):
+				os.symlink(mod["name"], link)
+
+	def __module_info(self, mod):
+		item = {
+			"dest": [mod["path"]],
+			"label": mod["label"] + TOOLCHAIN,
+			"label_name": mod["label"].split(":")[1],
+			"part_name": mod["component"],
+			"subsystem_name": "subsystem_%s" % mod["component"].split("_")[1]
+		}
+		if mod["kind"] == "sa":
+			item["shlib_type"] = "sa"
+		elif mod["kind"] == "napi":
+			item["shlib_type"] = "napi"
+		elif mod["kind"] == "hdi":
+			item["shlib_type"] = "hdi"
+		if mod.get("chipsetsdk"):
+			item["innerapi_tags"] = ["chipsetsdk"]
+		return item
+
+	def __write_info_files(self):
+		with open(os.path.join(self._out_path, "packages/phone/system_module_info.json"), "w") as f:
+			json.dump([self.__module_info(mod) for mod in self._modules], f, indent=1)
+
+		inner_kits = {}
+		for mod in self._modules:
+			if mod["kind"] != "lib" or mod["idx"] % 4:
+				continue
+			name = mod["label"].split(":")[1]
+			inner_kits.setdefault(mod["component"], {})[name] = {
+				"label": mod["label"],
+				"name": name,
+				"header_base": "//%s/interfaces/inner_api/%s/include" % (mod["component"], name),
+				"header_files": ["%s.h" % name]
+			}
+		with open(os.path.join(self._out_path, "build_configs/parts_info/inner_kits_info.json"), "w") as f:
+			json.dump(inner_kits, f, indent=1)
+
+		# Up to three SA modules in one process, as foundation and other service processes do
+		sa_modules = [mod for mod in self._modules if mod["kind"] == "sa"]
+		for i in range(0, len(sa_modules), 3):
+			process = "sa_process_%d" % (i // 3)
+			items = []
+			for j, mod in enumerate(sa_modules[i:i + 3]):
+				items.append("    <systemability>\n        <name>%d</name>\n        <libpath>%s</libpath>\n        <run-on-create>true</run-on-create>\n    </systemability>\n" % (1000 + i + j, mod["name"]))
+			with open(os.path.join(self._out_path, "packages/phone/system/profile/%s.xml" % process), "w") as f:
+				f.write("<?xml version=\"1.0\" encoding=\"utf-8\"?>\n<info>\n    <process>%s</process>\n%s</info>\n" % (process, "".join(items)))
+
+		with open(os.path.join(self._out_path, "packages/phone/vendor/etc/hdfconfig/hdf_default.hcb"), "wb") as f:
+			f.write(build_hcb([mod["name"] for mod in self._modules if mod["kind"] == "hdi"]))
+
+	def generate(self):
+		"""Write the product, return the numbers of modules, dependencies and symbolic links."""
+		for d in ("packages/phone/system/lib64/module", "packages/phone/system/bin", "packages/phone/system/profile",
+				"packages/phone/vendor/lib64", "packages/phone/vendor/bin", "packages/phone/vendor/etc/hdfconfig", "build_configs/parts_info"):
+			os.makedirs(os.path.join(self._out_path, d), exist_ok=True)
+
+		self.__plan_modules()
+		for mod in self._modules:
+			self.__write_elf(mod)
+		self.__write_info_files()
+		return {
+			"modules": len(self._modules),
+			"deps": sum([len(mod["needed"]) for mod in self._modules]),
+			"links": len([mod for mod in self._modules if mod["link"]])
+		}
+
+if __name__ == '__main__':
+	import argparse
+
+	parser = argparse.ArgumentParser(description='Generate a fake product out directory for benchmarking deps_guard.')
+	parser.add_argument('-o', '--output', help='output product directory', required=True)
+	parser.add_argument('-m', '--modules', type=int, default=1000, help='number of ELF modules')
+	parser.add_argument('--fanout', type=int, default=4, help='average number of NEEDED libraries of each module')
+	parser.add_argument('--exports', type=int, default=20, help='exported symbols of each library')
+	parser.add_argument('--imports', type=int, default=2, help='symbols imported from each NEEDED library')
+	parser.add_argument('--seed', type=int, default=0, help='random seed')
+	args = parser.parse_args()
+
+	stats = ProductGenerator(args.output, args.modules, args.fanout, args.exports, args.imports, args.seed).generate()
+	print("Generated %d modules, %d dependencies, %d symbolic links in %s" % (stats["modules"], stats["deps"], stats["links"], args.output))
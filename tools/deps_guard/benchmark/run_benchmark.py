@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import io
+import sys
+import json
+import shutil
+import argparse
+import platform
+import contextlib
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gen_product import ProductGenerator
+
+BENCHMARK_VERSION = 1
+DEFAULT_SIZES = "1000,10000,50000"
+GEN_PARAMS_NAME = "gen_params.json"
+
+# Phases shorter than this are too noisy to report as regressions
+MIN_COMPARE_SECONDS = 0.05
+
+def prepare_product(work_dir, size, params):
+	"""Generate the product of size modules in work_dir, reuse it if it was generated with the same parameters."""
+	out_path = os.path.join(work_dir, "product_%d" % size)
+	params = dict(params, modules=size)
+	try:
+		with open(os.path.join(out_path, GEN_PARAMS_NAME)) as f:
+			if json.load(f) == params:
+				return out_path
+	except (OSError, ValueError):
+		pass
+
+	if os.path.exists(out_path):
+		shutil.rmtree(out_path)
+	print("Generating %d modules in %s ..." % (size, out_path))
+	ProductGenerator(out_path, **params).generate()
+	with open(os.path.join(out_path, GEN_PARAMS_NAME), "w") as f:
+		json.dump(params, f)
+	return out_path
+
+def run_once(out_path, jobs, symbols):
+	"""Scan the product and check all rules in this process, return the phases of PhaseProfiler."""
+	from elf_file_mgr import ElfFileMgr
+	from elf_file_mgr.phase_profiler import PhaseProfiler
+	from rules_checker import check_all_rules
+
+	profiler = PhaseProfiler()
+	args = argparse.Namespace(rules=None, no_fail=True)
+	with contextlib.redirect_stdout(io.StringIO()):
+		mgr = ElfFileMgr(out_path)
+		mgr.scan_all_files(jobs=jobs, symbols=symbols, profiler=profiler)
+		with profiler.phase("rules") as phase:
+			check_all_rules(mgr, args, None, profiler)
+			phase["count"] = len(mgr.get_all())
+	return {"modules": len(mgr.get_all()), "deps": len(mgr.get_all_deps()), "phases": profiler.get_phases()}
+
+def measure(out_path, jobs, symbols, repeat):
+	"""Best wall and CPU time of each phase over repeat runs, each run in a new process."""
+	ctx = multiprocessing.get_context("spawn")
+	best = None
+	for i in range(repeat):
+		with ctx.Pool(1) as pool:
+			res = pool.apply(run_once, (out_path, jobs, symbols))
+		phases = dict([(item["name"], item) for item in res["phases"]])
+		if best is None:
+			best = res
+			best["phases"] = phases
+			continue
+		for name, item in phases.items():
+			old = best["phases"][name]
+			for key in ("wall", "cpu", "peak_rss_kb"):
+				if item[key] is not None and (old[key] is None or item[key] < old[key]):
+					old[key] = item[key]
+
+	scan = [item for name, item in best["phases"].items() if name != "rules" and not name.startswith("rule:")]
+	best["scan_wall"] = sum([item["wall"] for item in scan])
+	best["rules_wall"] = best["phases"]["rules"]["wall"]
+	best["modules_per_second"] = best["modules"] / max(best["scan_wall"] + best["rules_wall"], 1e-9)
+	return best
+
+def print_result(size, res):
+	print("%d modules, %d dependencies: scan %.3fs, rules %.3fs, %.0f modules/s" % (res["modules"], res["deps"], res["scan_wall"], res["rules_wall"], res["modules_per_second"]))
+	print("  %-32s %8s %10s %10s %12s" % ("phase", "count", "wall(s)", "cpu(s)", "peak RSS(KB)"))
+	for name, item in res["phases"].items():
+		print("  %-32s %8s %10.3f %10.3f %12s" % (name, "" if item["count"] is None else item["count"], item["wall"], item["cpu"] or 0.0, item["peak_rss_kb"]))
+
+def compare_results(old, new, threshold):
+	"""Return phases whose wall time grew more than threshold times, as (size, phase, old, new)."""
+	regressions = []
+	for size, res in new["results"].items():
+		if size not in old.get("results", {}):
+			continue
+		old_phases = old["results"][size]["phases"]
+		for name, item in res["phases"].items():
+			if name not in old_phases or old_phases[name]["wall"] < MIN_COMPARE_SECONDS:
+				continue
+			if item["wall"] > old_phases[name]["wall"] * threshold:
+				regressions.append((size, name, old_phases[name]["wall"], item["wall"]))
+	return regressions
+
+def main():
+	parser = argparse.ArgumentParser(description='Benchmark deps_guard scanning and rule checking on generated products.')
+	parser.add_argument('-s', '--sizes', default=DEFAULT_SIZES, help='comma separated numbers of modules, default is %s' % DEFAULT_SIZES)
+	parser.add_argument('-w', '--work-dir', default="deps_guard_benchmark", help='directory for generated products, they are reused by later runs')
+	parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes to parse ELF files')
+	parser.add_argument('--symbols', action='store_true', help='also load and bind dynamic symbols')
+	parser.add_argument('--repeat', type=int, default=3, help='runs of each size, the best time of each phase is reported')
+	parser.add_argument('--fanout', type=int, default=4, help='average number of NEEDED libraries of each module')
+	parser.add_argument('--seed', type=int, default=0, help='random seed of the generator')
+	parser.add_argument('-o', '--output', help='save results as JSON', required=False)
+	parser.add_argument('--compare', help='results JSON of an earlier run, fail if any phase gets slower than --threshold times', required=False)
+	parser.add_argument('--threshold', type=float, default=1.25, help='allowed slow down against --compare results')
+	args = parser.parse_args()
+
+	params = {"fanout": args.fanout, "seed": args.seed}
+	results = {
+		"version": BENCHMARK_VERSION,
+		"python": platform.python_version(),
+		"jobs": args.jobs,
+		"symbols": args.symbols,
+		"results": {}
+	}
+	for size in [int(s) for s in args.sizes.split(",") if s]:
+		out_path = prepare_product(args.work_dir, size, params)
+		res = measure(out_path, args.jobs, args.symbols, args.repeat)
+		print_result(size, res)
+		results["results"][str(size)] = res
+
+	if args.output:
+		with open(args.output, "w") as f:
+			json.dump(results, f, indent=4)
+
+	if args.compare:
+		with open(args.compare) as f:
+			old = json.load(f)
+		regressions = compare_results(old, results, args.threshold)
+		for size, name, old_wall, new_wall in regressions:
+			print("REGRESSION: %s modules, %s takes %.3fs, was %.3fs" % (size, name, new_wall, old_wall))
+		if regressions:
+			sys.exit(1)
+		print("No regression against %s" % args.compare)
+
+if __name__ == '__main__':
+	main()
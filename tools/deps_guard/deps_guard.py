@@ -16,15 +16,30 @@
 # limitations under the License.
 #
 
-from elf_file_mgr import ElfFileMgr
+import os
+import json
+import multiprocessing
+
+from elf_file_mgr import ElfFileMgr, ElfFile, ElfCache, ElfInfoPool, CompactGraph, GraphDiff
+from elf_file_mgr.elf_cache import CACHE_FILE_NAME
+from elf_file_mgr.graph_snapshot import GRAPH_SNAPSHOT_NAME, create_graph_snapshot, save_graph_snapshot, load_graph_snapshot
+from elf_file_mgr.unused_deps import UnusedDepsReport, UNUSED_DEPS_REPORT_NAME
+from elf_file_mgr.startup_cost import StartupCostEstimator, STARTUP_COST_REPORT_NAME
+from elf_file_mgr.phase_profiler import PhaseProfiler, PHASE_PROFILE_NAME, NULL_PROFILER
+from elf_file_mgr.graph_store import save_graph_store, save_rule_findings, GRAPH_STORE_NAME
+from elf_file_mgr.graph_export import GraphFilter, GRAPH_EXPORT_FORMATS
+from elf_file_mgr.dep_cycles import DepsCycleReport, CYCLES_REPORT_NAME
+
+GRAPH_DIFF_NAME = "deps_guard_graph_diff.json"
+BATCH_REPORT_VERSION = 1
 
 def __createArgParser():
 	import argparse
 
 	parser = argparse.ArgumentParser(description='Check architecture information from compiled output files.')
 
-	parser.add_argument('-i', '--input',
-						help='input asset files root directory', required=True)
+	parser.add_argument('-i', '--input', action='append',
+						help='input asset files root directory, repeat it to check several products in one run', required=True)
 
 	parser.add_argument('-r', '--rules', action='append',
 						help='rules directory', required=False)
@@ -32,24 +47,391 @@ def __createArgParser():
 	parser.add_argument('-n', '--no-fail',
 						help='force to pass all rules', required=False)
 
+	parser.add_argument('--enable-rule', action='append', metavar='RULE_NAME',
+						help='also check the optional rule, such as NO-Cycle-Depends', required=False)
+
+	parser.add_argument('--source-root', metavar='DIR',
+						help='warn about headers of Chipset SDK modules not found in the source tree DIR', required=False)
+
+	parser.add_argument('--elf-backend', choices=['native', 'readelf'], default='native',
+						help='ELF parsing backend, readelf is always used as a fallback', required=False)
+
+	parser.add_argument('-j', '--jobs', type=int, default=1,
+						help='number of processes to parse ELF files', required=False)
+
+	parser.add_argument('--rule-jobs', type=int, default=1,
+						help='number of processes to check rules, rules are split among them and share the frozen graph', required=False)
+
+	parser.add_argument('--cache', nargs='?', const='', default=None,
+						help='cache parsed ELF and hcb metadata in a sqlite file, default is %s in the input directory' % CACHE_FILE_NAME, required=False)
+
+	parser.add_argument('--cache-size', type=int, default=256,
+						help='max size of the cache in MB', required=False)
+
+	parser.add_argument('--invalidate-cache', action='store_true',
+						help='drop all cached data before scanning', required=False)
+
+	parser.add_argument('--compact', action='store_true',
+						help='convert the dependency graph to a compact store before checking rules', required=False)
+
+	parser.add_argument('--rule-timing', action='store_true',
+						help='print time spent in each rule', required=False)
+
+	parser.add_argument('--report-stale-whitelist', action='store_true',
+						help='warn about white list entries not matched by any module', required=False)
+
+	parser.add_argument('--symbols', action='store_true',
+						help='bind imported dynamic symbols to depended libraries to count calls of each dependency', required=False)
+
+	parser.add_argument('--unused-deps', action='store_true',
+						help='report NEEDED libraries resolving no symbols and pages each process entry would save, implies --symbols, saved as %s' % UNUSED_DEPS_REPORT_NAME, required=False)
+
+	parser.add_argument('--startup-cost', type=int, nargs='?', const=20, default=None, metavar='N',
+						help='print the N heaviest process entries by load closure cost, all of them are saved as %s' % STARTUP_COST_REPORT_NAME, required=False)
+
+	parser.add_argument('--cycles', action='store_true',
+						help='print circular dependencies between modules, saved as %s' % CYCLES_REPORT_NAME, required=False)
+
+	parser.add_argument('--profile', nargs='?', const='', default=None, metavar='FILE',
+						help='record wall time, CPU time, peak RSS and item count of each phase as JSON, default is %s in the input directory' % PHASE_PROFILE_NAME, required=False)
+
+	parser.add_argument('--profile-cprofile', metavar='DIR',
+						help='with --profile, also dump cProfile statistics of each phase to DIR', required=False)
+
+	parser.add_argument('--save-graph', action='store_true',
+						help='save the dependency graph to %s in the input directory for later runs with --baseline' % GRAPH_SNAPSHOT_NAME, required=False)
+
+	parser.add_argument('--baseline',
+						help='baseline product out directory or graph file, report graph changes against it and only check affected modules; the directory is scanned if it has no saved graph, nothing is written into it', required=False)
+
+	parser.add_argument('--graph-db', nargs='?', const='', default=None, metavar='FILE',
+						help='save modules, dependencies, symbols and rule findings to a sqlite file for deps_query.py, default is %s in the input directory' % GRAPH_STORE_NAME, required=False)
+
+	parser.add_argument('--export-graph', metavar='FILE',
+						help='stream the dependency graph to FILE, the format is guessed from the extension: .dot, .graphml or .jsonl; with several inputs, %%s in FILE is replaced by the input directory name', required=False)
+
+	parser.add_argument('--export-format', choices=GRAPH_EXPORT_FORMATS,
+						help='format of --export-graph', required=False)
+
+	parser.add_argument('--export-filter', action='append', metavar='KEY=VALUE',
+						help='only export modules with component, subsystem or modGroup of VALUE, can be repeated', required=False)
+
+	parser.add_argument('--export-around', action='append', metavar='MODULE',
+						help='only export modules around MODULE (name or path), can be repeated', required=False)
+
+	parser.add_argument('--export-depth', type=int, default=1,
+						help='number of dependency levels around --export-around modules', required=False)
+
+	parser.add_argument('--report', metavar='FILE',
+						help='with several inputs, save rule results of all products as JSON', required=False)
+
 	return parser
 
-def deps_guard(out_path, args=None):
+def __diff_with_baseline(mgr, snapshot, baseline, jobs, cache, profiler):
+	old = load_graph_snapshot(baseline)
+	if old is None:
+		print("No dependency graph saved in %s, scanning it now ..." % baseline)
+		old_mgr = ElfFileMgr(baseline, read_only=True)
+		old_mgr.scan_all_files(jobs=jobs, cache=cache, profiler=profiler)
+		old = create_graph_snapshot(old_mgr)
+
+	diff = GraphDiff(old, snapshot)
+	print("Dependency graph changes against %s:" % baseline)
+	diff.print_report()
+
+	try:
+		with open(os.path.join(mgr.get_product_out_path(), GRAPH_DIFF_NAME), "w") as f:
+			json.dump(diff.to_json(), f, indent=4)
+	except:
+		pass
+
+	return diff.get_affected_paths()
+
+def __open_cache(out_path, args):
+	if args and getattr(args, "cache", None) is not None:
+		cache_file = args.cache or os.path.join(out_path, CACHE_FILE_NAME)
+		return ElfCache(cache_file, args.cache_size * 1024 * 1024, args.invalidate_cache)
+	return None
+
+def __graph_db_file(out_path, args):
+	if args and getattr(args, "graph_db", None) is not None:
+		return args.graph_db or os.path.join(out_path, GRAPH_STORE_NAME)
+	return None
+
+def __export_graph(mgr, args):
+	graph_filter = None
+	if args.export_filter or args.export_around:
+		graph_filter = GraphFilter()
+	for expr in args.export_filter or []:
+		graph_filter.add_expr(expr)
+	if args.export_around:
+		modules = []
+		for name in args.export_around:
+			found = mgr.get_elf_by_path(name) or mgr.get_elf_by_name(name)
+			if not found:
+				print("No module named %s to export around" % name)
+				continue
+			modules.append(found)
+		if not modules:
+			raise Exception("ERROR: none of --export-around modules %s is found." % ", ".join(args.export_around))
+		graph_filter.around(modules, args.export_depth)
+
+	file = args.export_graph
+	if "%s" in file:
+		# Batch runs export each product to its own file
+		file = file % os.path.basename(os.path.normpath(mgr.get_product_out_path()))
+	fmt = mgr.export_graph(file, getattr(args, "export_format", None), graph_filter)
+	print("Dependency graph is exported to %s as %s" % (file, fmt))
+
+def __scan_product(out_path, args, jobs, cache, phases):
+	"""Scan one product and write optional reports, return (mgr, modules to check or None for all)."""
+	baseline = None
+	if args and getattr(args, "baseline", None):
+		baseline = args.baseline
+
+	unused_deps = False
+	if args and getattr(args, "unused_deps", False):
+		unused_deps = True
+
+	symbols = unused_deps
+	if args and getattr(args, "symbols", False):
+		symbols = True
+
 	mgr = ElfFileMgr(out_path)
-	mgr.scan_all_files()
+	mgr.scan_all_files(jobs=jobs, cache=cache, symbols=symbols, profiler=phases)
+
+	save_graph = False
+	if args and getattr(args, "save_graph", False):
+		save_graph = True
+
+	snapshot = None
+	if baseline or save_graph:
+		with phases.phase("snapshot") as phase:
+			snapshot = create_graph_snapshot(mgr)
+			if save_graph:
+				# Saved for later runs with --baseline
+				save_graph_snapshot(snapshot, mgr.get_product_out_path())
+			phase["count"] = len(snapshot["deps"])
+
+	affected = None
+	if baseline:
+		with phases.phase("baseline") as phase:
+			affected = __diff_with_baseline(mgr, snapshot, baseline, jobs, cache, phases)
+			phase["count"] = len(affected)
+	snapshot = None
+
+	graph_db = __graph_db_file(out_path, args)
+	if graph_db:
+		# Saved before compacting, symbols are not kept by the compact graph
+		with phases.phase("graph_db") as phase:
+			save_graph_store(mgr, graph_db)
+			phase["count"] = len(mgr.get_all_deps())
+
+	if args and getattr(args, "export_graph", None):
+		with phases.phase("export_graph") as phase:
+			__export_graph(mgr, args)
+			phase["count"] = len(mgr.get_all_deps())
+
+	if unused_deps:
+		with phases.phase("unused_deps") as phase:
+			report = UnusedDepsReport(mgr)
+			report.print_report()
+			report.save(mgr.get_product_out_path())
+			phase["count"] = len(report.get_unused_deps())
+
+	if args and getattr(args, "startup_cost", None) is not None:
+		with phases.phase("startup_cost") as phase:
+			estimator = StartupCostEstimator(mgr)
+			estimator.print_report(args.startup_cost)
+			estimator.save(mgr.get_product_out_path())
+			phase["count"] = len(estimator.get_entries())
+
+	if args and getattr(args, "cycles", False):
+		with phases.phase("cycles") as phase:
+			report = DepsCycleReport(mgr)
+			report.print_report()
+			report.save(mgr.get_product_out_path())
+			phase["count"] = len(report.get_cycles())
+
+	if args and getattr(args, "compact", False):
+		with phases.phase("compact") as phase:
+			mgr = CompactGraph(mgr)
+			phase["count"] = len(mgr.get_all())
+
+	modules = None
+	if affected is not None:
+		modules = [elf for elf in mgr.get_all() if elf["path"] in affected]
+		print("%d modules affected, checking rules on them only" % len(modules))
+
+	return (mgr, modules)
+
+def __get_jobs(args):
+	if args and getattr(args, "jobs", None):
+		return args.jobs
+	return 1
+
+def __get_profiler(args):
+	if args and getattr(args, "profile", None) is not None:
+		return PhaseProfiler(getattr(args, "profile_cprofile", None))
+	return None
+
+def deps_guard(out_path, args=None):
+	if args and getattr(args, "elf_backend", None):
+		ElfFile.BACKEND = args.elf_backend
+
+	jobs = __get_jobs(args)
+	profiler = __get_profiler(args)
+	phases = profiler or NULL_PROFILER
+
+	cache = __open_cache(out_path, args)
+	try:
+		mgr, modules = __scan_product(out_path, args, jobs, cache, phases)
+	finally:
+		if cache:
+			cache.close()
 
 	from rules_checker import check_all_rules
 
-	passed = check_all_rules(mgr, args)
+	results = []
+	with phases.phase("rules") as phase:
+		passed = check_all_rules(mgr, args, modules, profiler, results)
+		phase["count"] = len(mgr.get_all()) if modules is None else len(modules)
+
+	graph_db = __graph_db_file(out_path, args)
+	if graph_db:
+		save_rule_findings(graph_db, results)
+		print("Dependency graph and rule findings are saved in %s" % graph_db)
+
+	if profiler:
+		print("Time and memory of each phase:")
+		profiler.print_report()
+		profiler.save(args.profile or os.path.join(mgr.get_product_out_path(), PHASE_PROFILE_NAME))
+
 	if passed:
 		print("All rules passed")
 		return
 
 	raise Exception("ERROR: deps_guard failed.")
 
+# Products checked by worker processes, inherited from the parent by fork
+_batch_products = []
+
+def _check_product_job(idx):
+	from rules_checker import evaluate_rules
+
+	mgr, args = _batch_products[idx]
+	# Outputs are written by the parent process
+	return evaluate_rules(mgr, args, side_effects=False)
+
+def __check_products(mgrs, args, jobs):
+	_batch_products[:] = [(mgr, args) for mgr in mgrs]
+	try:
+		if jobs > 1 and len(mgrs) > 1 and "fork" in multiprocessing.get_all_start_methods():
+			# Graphs are shared copy on write instead of being pickled to workers
+			with multiprocessing.get_context("fork").Pool(min(jobs, len(mgrs))) as pool:
+				return pool.map(_check_product_job, range(len(mgrs)), 1)
+		return [_check_product_job(idx) for idx in range(len(mgrs))]
+	finally:
+		_batch_products[:] = []
+
+def deps_guard_products(out_paths, args=None):
+	"""
+	Check several products in one run and print one consolidated report.
+
+	Parsed ELF files, hcb files and SA profiles are shared by content across
+	products, so byte identical prebuilt libraries are parsed only once.
+	Rules of each product run in parallel with --jobs.
+	"""
+	if args and getattr(args, "elf_backend", None):
+		ElfFile.BACKEND = args.elf_backend
+	if args and getattr(args, "baseline", None):
+		raise Exception("ERROR: --baseline only works with one input.")
+	if args and getattr(args, "graph_db", None):
+		raise Exception("ERROR: --graph-db FILE only works with one input, each product is saved in its input directory without FILE.")
+	if args and getattr(args, "export_graph", None) and "%s" not in args.export_graph:
+		raise Exception("ERROR: --export-graph FILE needs %s in it with several inputs.")
+
+	jobs = __get_jobs(args)
+	profiler = __get_profiler(args)
+	phases = profiler or NULL_PROFILER
+
+	pool = ElfInfoPool(__open_cache(out_paths[0], args))
+	mgrs = []
+	try:
+		for out_path in out_paths:
+			print("Scan product %s now ..." % out_path)
+			mgr, modules = __scan_product(out_path, args, jobs, pool, phases)
+			mgrs.append(mgr)
+	finally:
+		pool.close()
+
+	files, unique = pool.get_elf_stats()
+	print("%d ELF files in %d products, %d of them have unique contents" % (files, len(mgrs), unique))
+
+	from rules_checker import print_rule_results, write_rule_outputs
+
+	with phases.phase("rules") as phase:
+		results = __check_products(mgrs, args, jobs)
+		phase["count"] = len(mgrs)
+	with phases.phase("rule_outputs") as phase:
+		for rules in results:
+			write_rule_outputs(rules)
+		phase["count"] = sum([len(rule["outputs"]) for rules in results for rule in rules])
+
+	products = []
+	for mgr, rules in zip(mgrs, results):
+		graph_db = __graph_db_file(mgr.get_product_out_path(), args)
+		if graph_db:
+			save_rule_findings(graph_db, rules)
+		print("Rule checking results of %s:" % mgr.get_product_out_path())
+		products.append({
+			"input": mgr.get_product_out_path(),
+			"modules": len(mgr.get_all()),
+			"deps": len(mgr.get_all_deps()),
+			"passed": print_rule_results(rules),
+			"rules": rules
+		})
+
+	print("Summary of %d products:" % len(products))
+	for product in products:
+		failed = [rule["name"] for rule in product["rules"] if not rule["passed"]]
+		print("  %-6s %s: %d modules, %d dependencies%s" % ("PASSED" if product["passed"] else "FAILED", product["input"],
+			product["modules"], product["deps"], ", failed rules: %s" % ", ".join(failed) if failed else ""))
+
+	if args and getattr(args, "report", None):
+		with open(args.report, "w") as f:
+			json.dump({"version": BATCH_REPORT_VERSION, "elf_files": files, "unique_elf_files": unique, "products": products}, f, indent=4)
+
+	if profiler:
+		print("Time and memory of each phase:")
+		profiler.print_report()
+		profiler.save(args.profile or os.path.join(out_paths[0], PHASE_PROFILE_NAME))
+
+	if all([product["passed"] for product in products]) or (args and args.no_fail):
+		print("All rules passed")
+		return
+
+	raise Exception("ERROR: deps_guard failed.")
+
 if __name__ == '__main__':
 
 	parser = __createArgParser()
 	args = parser.parse_args()
 
-	deps_guard(args.input, args)
+	# Report bad filters before scanning
+	for expr in args.export_filter or []:
+		try:
+			GraphFilter().add_expr(expr)
+		except ValueError as e:
+			parser.error("--export-filter: %s" % str(e))
+
+	# The same product given twice is checked once
+	inputs = []
+	for out_path in args.input:
+		if os.path.realpath(out_path) not in [os.path.realpath(item) for item in inputs]:
+			inputs.append(out_path)
+
+	if len(inputs) == 1:
+		deps_guard(inputs[0], args)
+	else:
+		deps_guard_products(inputs, args)
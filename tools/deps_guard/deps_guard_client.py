@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import json
+import socket
+
+from rules_checker import print_rule_results
+
+SOCKET_NAME = "deps_guard.sock"
+
+def __createArgParser():
+	import argparse
+
+	parser = argparse.ArgumentParser(description='Get deps_guard results from a running deps_guard_daemon.py.')
+
+	parser.add_argument('command', nargs='?', choices=['check', 'status', 'stop'], default='check',
+						help='check: apply pending changes and print rule results; status: print graph status; stop: stop the daemon')
+
+	parser.add_argument('-i', '--input',
+						help='input asset files root directory the daemon is watching', required=False)
+
+	parser.add_argument('-s', '--socket',
+						help='unix socket of the daemon, default is %s in the input directory' % SOCKET_NAME, required=False)
+
+	parser.add_argument('-n', '--no-fail',
+						help='force to pass all rules', required=False)
+
+	parser.add_argument('--timeout', type=float, default=600,
+						help='seconds to wait for the daemon', required=False)
+
+	return parser
+
+def request(socket_path, cmd, timeout=600):
+	conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	conn.settimeout(timeout)
+	try:
+		conn.connect(socket_path)
+		conn.sendall(json.dumps({"cmd": cmd}).encode("utf-8") + b"\n")
+		data = b""
+		while True:
+			chunk = conn.recv(64 * 1024)
+			if not chunk:
+				break
+			data += chunk
+	finally:
+		conn.close()
+	return json.loads(data.decode("utf-8"))
+
+if __name__ == '__main__':
+
+	parser = __createArgParser()
+	args = parser.parse_args()
+
+	socket_path = args.socket
+	if not socket_path:
+		if not args.input:
+			parser.error("-i or -s is required")
+		socket_path = os.path.join(args.input, SOCKET_NAME)
+
+	try:
+		res = request(socket_path, args.command, args.timeout)
+	except (OSError, ValueError) as e:
+		print("Can not get results from deps_guard daemon on %s: %s" % (socket_path, str(e)))
+		sys.exit(2)
+
+	if args.command != "check":
+		print(json.dumps(res, indent=4))
+		sys.exit(0)
+
+	if print_rule_results(res["rules"]) or args.no_fail:
+		print("All rules passed")
+		sys.exit(0)
+
+	print("ERROR: deps_guard failed.")
+	sys.exit(1)
@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+import time
+import socket
+import selectors
+
+from elf_file_mgr import ElfFileMgr, ElfFile, ElfCache
+from elf_file_mgr.elf_cache import CACHE_FILE_NAME
+from elf_file_mgr.file_watcher import create_file_watcher
+from rules_checker import get_enabled_rules, evaluate_rules
+from rules_checker.base_rule import reset_white_lists
+
+SOCKET_NAME = "deps_guard.sock"
+
+# Wait until files are quiet for this long, a rebuild writes many files
+DEBOUNCE_SECONDS = 0.5
+
+# Input kinds classified again by the module info loaders
+MODULE_INFO_INPUTS = ("elf", "module_info", "sa_profile", "hdi")
+
+# Files written by deps_guard itself
+OUTPUT_FILES = ("chipsetsdk_info.json", SOCKET_NAME)
+
+def __createArgParser():
+	import argparse
+
+	parser = argparse.ArgumentParser(description='Keep the dependency graph in memory, check rules again when compiled output files change.')
+
+	parser.add_argument('-i', '--input',
+						help='input asset files root directory', required=True)
+
+	parser.add_argument('-r', '--rules', action='append',
+						help='rules directory', required=False)
+
+	parser.add_argument('--enable-rule', action='append', metavar='RULE_NAME',
+						help='also check the optional rule, such as NO-Cycle-Depends', required=False)
+
+	parser.add_argument('--source-root', metavar='DIR',
+						help='warn about headers of Chipset SDK modules not found in the source tree DIR', required=False)
+
+	parser.add_argument('-s', '--socket',
+						help='unix socket to serve results on, default is %s in the input directory' % SOCKET_NAME, required=False)
+
+	parser.add_argument('--elf-backend', choices=['native', 'readelf'], default='native',
+						help='ELF parsing backend, readelf is always used as a fallback', required=False)
+
+	parser.add_argument('-j', '--jobs', type=int, default=1,
+						help='number of processes to parse ELF files', required=False)
+
+	parser.add_argument('--rule-jobs', type=int, default=1,
+						help='number of processes to check rules', required=False)
+
+	parser.add_argument('--cache', nargs='?', const='', default=None,
+						help='cache parsed ELF and hcb metadata in a sqlite file, default is %s in the input directory' % CACHE_FILE_NAME, required=False)
+
+	parser.add_argument('--poll', type=float, nargs='?', const=2.0, default=None, metavar='SECONDS',
+						help='poll for changes every SECONDS instead of using inotify', required=False)
+
+	return parser
+
+class DepsGuardDaemon(object):
+	"""
+	Scan the product once, then update the graph in place for changed files.
+
+	Only changed ELF files are parsed again, and only rules whose INPUTS or
+	white lists changed are checked again. Results are served as one JSON
+	line for each request on a unix socket, see deps_guard_client.py.
+	"""
+	def __init__(self, out_path, args):
+		self._out_path = out_path
+		self._args = args
+		self._jobs = args.jobs or 1
+		self._cache = None
+		if args.cache is not None:
+			self._cache = ElfCache(args.cache or os.path.join(out_path, CACHE_FILE_NAME))
+		self._socket_path = args.socket or os.path.join(out_path, SOCKET_NAME)
+		self._rules_dirs = [os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "rules"))]
+		self._rules_dirs += [os.path.realpath(d) for d in (args.rules or [])]
+
+		self._rules = get_enabled_rules(args)
+		self._mgr = None
+		self._results = {}
+		self._generation = 0
+		self._last_update = None
+		self._pending = set()
+		self._rescan = False
+		self._changed_at = None
+		self._watcher = None
+		self._server = None
+		self._running = False
+
+	def __scan(self):
+		# The old graph is kept if scanning fails
+		mgr = ElfFileMgr(self._out_path)
+		mgr.scan_all_files(jobs=self._jobs, cache=self._cache)
+		self._mgr = mgr
+
+	def __check(self, rules):
+		for res in evaluate_rules(self._mgr, self._args, rules):
+			self._results[res["name"]] = res
+		self._generation += 1
+
+	def __watch_roots(self):
+		images = os.path.join(self._out_path, "packages/phone")
+		roots = [(os.path.join(images, "system"), True), (os.path.join(images, "vendor"), True), (images, False)]
+		roots.append((os.path.join(self._out_path, "build_configs/parts_info"), False))
+		roots += [(d, True) for d in self._rules_dirs]
+		return roots
+
+	def __watch(self):
+		if self._watcher:
+			self._watcher.close()
+		self._watcher = create_file_watcher(self.__watch_roots(), self._args.poll is not None)
+
+	def __input_kind(self, f):
+		name = os.path.basename(f)
+		if name == "system_module_info.json":
+			return "module_info"
+		if name == "inner_kits_info.json":
+			return "inner_kits"
+		if name == "hdf_default.hcb":
+			return "hdi"
+		for d in self._rules_dirs:
+			if f.startswith(d + os.sep):
+				return "whitelist:%s" % os.path.relpath(f, d).split(os.sep)[0]
+		if name.endswith(".xml") and os.path.dirname(f).endswith(os.path.join("system", "profile")):
+			return "sa_profile"
+		return "elf"
+
+	def start(self):
+		self.__scan()
+		self.__check(self._rules)
+		self.__watch()
+
+		if os.path.exists(self._socket_path):
+			os.unlink(self._socket_path)
+		self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		self._server.bind(self._socket_path)
+		self._server.listen(8)
+		self._running = True
+		print("Watching %s, serving results on %s" % (self._out_path, self._socket_path))
+
+	def __collect(self, changes):
+		if changes is None:
+			self._rescan = True
+		else:
+			changes = [f for f in changes if os.path.basename(f) not in OUTPUT_FILES]
+			if not changes:
+				return
+			self._pending.update(changes)
+		self._changed_at = time.monotonic()
+
+	def __apply_changes(self):
+		files = self._pending
+		rescan = self._rescan
+		self._pending = set()
+		self._rescan = False
+		self._changed_at = None
+
+		start = time.perf_counter()
+		summary = {"files": len(files), "rescan": rescan}
+		try:
+			rules = self.__update(files, rescan, summary)
+		except Exception as e:
+			# Such as a file changed again while it is parsed, the graph may be half updated
+			print("Applying %d changed files failed: %r" % (len(files), e))
+			if rescan:
+				rules = None
+			else:
+				try:
+					summary["rescan"] = True
+					rules = self.__update(files, True, summary)
+				except Exception as e:
+					print("Scanning all files failed: %r" % e)
+					rules = None
+			if rules is None:
+				# Try again on the next change
+				self._rescan = True
+				print("Results of generation %d are kept" % self._generation)
+				return
+
+		summary["rules"] = [rule.RULE_NAME for rule in rules]
+		summary["seconds"] = time.perf_counter() - start
+		self._last_update = summary
+		print("%d changed files applied in %.3f seconds, rules checked again: %s" % (len(files), summary["seconds"], ", ".join(summary["rules"]) or "none"))
+
+	def __update(self, files, rescan, summary):
+		"""Apply changed files to the graph and check affected rules again, return the rules checked."""
+		if rescan:
+			print("Events are lost or changes can not be applied, scanning all files again ...")
+			reset_white_lists()
+			self.__scan()
+			self.__watch()
+			rules = self._rules
+		else:
+			kinds = set()
+			elf_files = []
+			for f in files:
+				kind = self.__input_kind(f)
+				if kind == "elf":
+					elf_files.append(f)
+				else:
+					kinds.add(kind)
+
+			if elf_files:
+				summary.update(self._mgr.update_files(elf_files, self._jobs, self._cache))
+				if summary["added"] or summary["changed"] or summary["removed"] or summary["relinked"]:
+					kinds.add("elf")
+			if not kinds.isdisjoint(MODULE_INFO_INPUTS):
+				self._mgr.load_module_info(self._jobs, self._cache)
+			for kind in kinds:
+				if kind.startswith("whitelist:"):
+					reset_white_lists(kind[len("whitelist:"):])
+
+			rules = [rule for rule in self._rules if "whitelist:%s" % rule.RULE_NAME in kinds or not kinds.isdisjoint(rule.INPUTS)]
+
+		if rules:
+			self.__check(rules)
+		return rules
+
+	def flush(self):
+		"""Apply all changes made so far right now."""
+		self.__collect(self._watcher.read_changes())
+		if self._pending or self._rescan:
+			self.__apply_changes()
+
+	def get_results(self):
+		rules = [self._results[rule.RULE_NAME] for rule in self._rules]
+		return {
+			"generation": self._generation,
+			"passed": all([res["passed"] for res in rules]),
+			"rules": rules,
+			"last_update": self._last_update
+		}
+
+	def get_status(self):
+		return {
+			"generation": self._generation,
+			"modules": len(self._mgr.get_all()),
+			"deps": len(self._mgr.get_all_deps()),
+			"pending": len(self._pending),
+			"last_update": self._last_update
+		}
+
+	def __handle_client(self, conn):
+		conn.settimeout(10)
+		data = b""
+		while not data.endswith(b"\n"):
+			chunk = conn.recv(4096)
+			if not chunk:
+				break
+			data += chunk
+		try:
+			res = self.__handle_request(json.loads(data.decode("utf-8")))
+		except Exception as e:
+			print("client request error: %r" % e)
+			res = {"error": "request failed: %r" % e}
+		conn.sendall(json.dumps(res).encode("utf-8") + b"\n")
+
+	def __handle_request(self, request):
+		if not isinstance(request, dict):
+			return {"error": "request must be a JSON object"}
+
+		cmd = request.get("cmd")
+		if cmd == "check":
+			self.flush()
+			return self.get_results()
+		if cmd == "status":
+			return self.get_status()
+		if cmd == "stop":
+			self._running = False
+			return {"stopped": True}
+		return {"error": "unknown command %s" % cmd}
+
+	def serve_forever(self):
+		sel = selectors.DefaultSelector()
+		sel.register(self._server, selectors.EVENT_READ, "client")
+		watcher = None
+		watch_fd = None
+		next_poll = time.monotonic() + (self._args.poll or 0)
+
+		try:
+			while self._running:
+				if watcher is not self._watcher:
+					# The watcher is created again after a full scan
+					if watch_fd is not None:
+						sel.unregister(watch_fd)
+					watcher = self._watcher
+					watch_fd = watcher.fileno()
+					if watch_fd is not None:
+						sel.register(watch_fd, selectors.EVENT_READ, "watch")
+
+				now = time.monotonic()
+				timeout = None
+				if watch_fd is None:
+					timeout = max(0, next_poll - now)
+				if self._changed_at is not None:
+					wait = max(0, self._changed_at + DEBOUNCE_SECONDS - now)
+					timeout = wait if timeout is None else min(timeout, wait)
+
+				for key, mask in sel.select(timeout):
+					if key.data == "watch":
+						self.__collect(self._watcher.read_changes())
+						continue
+					conn, addr = self._server.accept()
+					try:
+						self.__handle_client(conn)
+					except Exception as e:
+						print("client connection error: %r" % e)
+					finally:
+						conn.close()
+
+				if watch_fd is None and time.monotonic() >= next_poll:
+					self.__collect(self._watcher.read_changes())
+					next_poll = time.monotonic() + self._args.poll
+				if self._changed_at is not None and time.monotonic() - self._changed_at >= DEBOUNCE_SECONDS:
+					self.__apply_changes()
+		finally:
+			sel.close()
+			self.close()
+
+	def close(self):
+		if self._server:
+			self._server.close()
+			self._server = None
+			try:
+				os.unlink(self._socket_path)
+			except OSError:
+				pass
+		if self._watcher:
+			self._watcher.close()
+			self._watcher = None
+		if self._cache:
+			self._cache.close()
+			self._cache = None
+
+if __name__ == '__main__':
+
+	parser = __createArgParser()
+	args = parser.parse_args()
+
+	if args.elf_backend:
+		ElfFile.BACKEND = args.elf_backend
+
+	daemon = DepsGuardDaemon(args.input, args)
+	daemon.start()
+	try:
+		daemon.serve_forever()
+	except KeyboardInterrupt:
+		pass
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import json
+import sqlite3
+
+from elf_file_mgr.graph_store import GraphStore, GRAPH_STORE_NAME, DEP_FLAGS
+
+def __createArgParser():
+	import argparse
+
+	parser = argparse.ArgumentParser(description='Query the dependency graph saved by deps_guard.py --graph-db without scanning the images again.')
+
+	parser.add_argument('-i', '--input',
+						help='input asset files root directory, the store is %s in it' % GRAPH_STORE_NAME, required=False)
+
+	parser.add_argument('-d', '--db',
+						help='sqlite file saved by deps_guard.py --graph-db', required=False)
+
+	parser.add_argument('--json', action='store_true',
+						help='print results as JSON', required=False)
+
+	subparsers = parser.add_subparsers(dest='command', metavar='command')
+	subparsers.required = True
+
+	cmd = subparsers.add_parser('depended-by', help='modules depending on a module')
+	cmd.add_argument('module', help='module name or path under the images directory')
+	cmd.add_argument('-t', '--transitive', action='store_true', help='also indirect callers')
+
+	cmd = subparsers.add_parser('deps', help='modules a module depends on')
+	cmd.add_argument('module', help='module name or path under the images directory')
+	cmd.add_argument('-t', '--transitive', action='store_true', help='also indirect dependencies')
+
+	cmd = subparsers.add_parser('edges', help='dependencies with the given attributes')
+	for flag in DEP_FLAGS:
+		cmd.add_argument('--%s' % flag, action='append_const', const=flag, dest='flags', help='only %s dependencies' % flag)
+
+	cmd = subparsers.add_parser('components', help='components by fan in')
+	cmd.add_argument('-n', '--limit', type=int, default=None, help='print the first N components only')
+
+	cmd = subparsers.add_parser('symbol', help='modules exporting and importing a dynamic symbol')
+	cmd.add_argument('name', help='symbol name')
+
+	cmd = subparsers.add_parser('findings', help='rule findings of the last check')
+	cmd.add_argument('-r', '--rule', help='findings of this rule only')
+
+	cmd = subparsers.add_parser('sql', help='run a SQL query on the store')
+	cmd.add_argument('query', help='SQL statement')
+
+	return parser
+
+def __print_modules(modules, args):
+	if args.json:
+		print(json.dumps(modules, indent=4))
+		return
+	for mod in modules:
+		print("%s\t%s" % (mod["path"], mod["componentName"]))
+
+def __find_module(store, name):
+	modules = store.find_modules(name)
+	if not modules:
+		print("No module named %s" % name)
+		sys.exit(1)
+	return modules
+
+def deps_query(store, args):
+	if args.command == "depended-by":
+		__print_modules(store.get_depended_by(__find_module(store, args.module), args.transitive), args)
+	elif args.command == "deps":
+		__print_modules(store.get_deps(__find_module(store, args.module), args.transitive), args)
+	elif args.command == "edges":
+		edges = store.get_edges(args.flags or [])
+		if args.json:
+			print(json.dumps(edges, indent=4))
+			return
+		for dep in edges:
+			print("%s\t%s\t%s\t%s" % (dep["caller"]["path"], dep["caller"]["componentName"], dep["callee"]["path"], dep["callee"]["componentName"]))
+	elif args.command == "components":
+		components = store.get_components_by_fan_in(args.limit)
+		if args.json:
+			print(json.dumps(components, indent=4))
+			return
+		print("%-40s %8s %8s %8s" % ("component", "fan_in", "edges", "modules"))
+		for item in components:
+			print("%-40s %8d %8d %8d" % (item["componentName"], item["fan_in"], item["edges"], item["modules"]))
+	elif args.command == "symbol":
+		exporters, importers = store.get_symbol_modules(args.name)
+		if args.json:
+			print(json.dumps({"exporters": exporters, "importers": importers}, indent=4))
+			return
+		for mod in exporters:
+			print("export\t%s\t%s" % (mod["path"], mod["componentName"]))
+		for mod in importers:
+			print("import\t%s\t%s" % (mod["path"], mod["componentName"]))
+	elif args.command == "findings":
+		findings = store.get_findings(args.rule)
+		if args.json:
+			print(json.dumps({"rules": store.get_rules(), "findings": findings}, indent=4))
+			return
+		for rule in store.get_rules():
+			if not args.rule or rule["name"] == args.rule:
+				print("%s: %s" % (rule["name"], "passed" if rule["passed"] else "failed"))
+		for item in findings:
+			print("[%s] %s" % (item["rule"], item["message"]))
+	elif args.command == "sql":
+		rows = store.execute(args.query)
+		if args.json:
+			print(json.dumps(rows, indent=4))
+			return
+		for row in rows:
+			print("\t".join([str(val) for val in row.values()]))
+
+if __name__ == '__main__':
+
+	parser = __createArgParser()
+	args = parser.parse_args()
+
+	db_file = args.db
+	if not db_file:
+		if not args.input:
+			parser.error("-i or -d is required")
+		db_file = os.path.join(args.input, GRAPH_STORE_NAME)
+
+	try:
+		store = GraphStore(db_file)
+	except ValueError as e:
+		print("Can not open dependency graph store: %s, save it with deps_guard.py --graph-db first" % str(e))
+		sys.exit(2)
+
+	try:
+		deps_query(store, args)
+	except (sqlite3.Error, ValueError) as e:
+		print("Query failed: %s" % str(e))
+		sys.exit(1)
+	finally:
+		store.close()
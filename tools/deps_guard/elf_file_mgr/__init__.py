@@ -18,4 +18,14 @@
 
 from .elf_walker import ELFWalker
 
+from .elf_file import ElfFile
+
+from .elf_cache import ElfCache
+
+from .elf_info_pool import ElfInfoPool
+
 from .elf_file_mgr import ElfFileMgr
+
+from .compact_graph import CompactGraph
+
+from .graph_diff import GraphDiff
@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from array import array
+from collections.abc import MutableMapping
+
+_MISSING = object()
+
+# Graph lists of ElfFileWithDepsInfo, rebuilt from CSR adjacency on access
+_NODE_EDGE_KEYS = ("deps", "dependedBy", "deps_internal", "deps_external", "dependedBy_internal", "dependedBy_external")
+_EDGE_REF_KEYS = ("id", "caller_id", "callee_id", "caller", "callee")
+
+class _BitArray(object):
+	def __init__(self, size):
+		self._bits = bytearray((size + 7) // 8)
+
+	def set(self, idx):
+		self._bits[idx >> 3] |= (1 << (idx & 7))
+
+	def get(self, idx):
+		return bool(self._bits[idx >> 3] & (1 << (idx & 7)))
+
+class _ValuePool(object):
+	"""Interned values, equal strings and tuples are stored once."""
+	def __init__(self):
+		self._values = []
+		self._index = {}
+
+	def intern(self, value):
+		if isinstance(value, list):
+			key = (list, tuple(value))
+		else:
+			key = (type(value), value)
+		idx = self._index.get(key)
+		if idx is None:
+			idx = len(self._values)
+			self._index[key] = idx
+			self._values.append(key)
+		return idx
+
+	def get(self, idx):
+		kind, value = self._values[idx]
+		if kind is list:
+			return list(value)
+		return value
+
+	def __len__(self):
+		return len(self._values)
+
+class _Column(object):
+	"""Values of one key for all nodes or all edges."""
+	def __init__(self, values, pool):
+		self._present = None
+		if any(v is _MISSING for v in values):
+			self._present = _BitArray(len(values))
+			for idx, v in enumerate(values):
+				if v is not _MISSING:
+					self._present.set(idx)
+
+		found = [v for v in values if v is not _MISSING]
+		if found and all(type(v) is bool for v in found):
+			self._kind = bool
+			self._data = _BitArray(len(values))
+			for idx, v in enumerate(values):
+				if v is True:
+					self._data.set(idx)
+		elif found and all(type(v) is int and -(1 << 63) <= v < (1 << 63) for v in found):
+			self._kind = int
+			self._data = array("q", [0 if v is _MISSING else v for v in values])
+		else:
+			self._kind = None
+			self._pool = pool
+			self._data = array("I", [0 if v is _MISSING else pool.intern(v) for v in values])
+
+	def has(self, idx):
+		return self._present is None or self._present.get(idx)
+
+	def get(self, idx):
+		if not self.has(idx):
+			return _MISSING
+		if self._kind is bool:
+			return self._data.get(idx)
+		if self._kind is int:
+			return self._data[idx]
+		return self._pool.get(self._data[idx])
+
+class _CompactItem(MutableMapping):
+	__slots__ = ("_g", "_i")
+
+	def __init__(self, graph, idx):
+		self._g = graph
+		self._i = idx
+
+	def __hash__(self):
+		return hash((type(self), self._i))
+
+	def __eq__(self, other):
+		if type(other) is not type(self):
+			return NotImplemented
+		return self._i == other._i and self._g is other._g
+
+	def __repr__(self):
+		return self.__str__()
+
+	def _overflow(self):
+		return self._g._overflow.get((type(self), self._i))
+
+	def __setitem__(self, key, value):
+		if self._g._frozen:
+			raise RuntimeError("compact graph is frozen while checking rules")
+		self._g._overflow.setdefault((type(self), self._i), {})[key] = value
+
+	def __delitem__(self, key):
+		overflow = self._overflow()
+		if overflow is None or key not in overflow:
+			raise KeyError(key)
+		del overflow[key]
+
+	def __len__(self):
+		return len(list(self.__iter__()))
+
+class CompactNode(_CompactItem):
+	__slots__ = ()
+
+	def __getitem__(self, key):
+		overflow = self._overflow()
+		if overflow and key in overflow:
+			return overflow[key]
+		g = self._g
+		if key == "id":
+			return self._i + 1
+		if key in _NODE_EDGE_KEYS:
+			return g._node_edges(self._i, key)
+		col = g._node_columns.get(key)
+		val = _MISSING if col is None else col.get(self._i)
+		if val is _MISSING:
+			raise KeyError(key)
+		return val
+
+	def __contains__(self, key):
+		overflow = self._overflow()
+		if overflow and key in overflow:
+			return True
+		if key == "id" or key in _NODE_EDGE_KEYS:
+			return True
+		col = self._g._node_columns.get(key)
+		return col is not None and col.has(self._i)
+
+	def __iter__(self):
+		yield "id"
+		for key in _NODE_EDGE_KEYS:
+			yield key
+		for key, col in self._g._node_columns.items():
+			if col.has(self._i):
+				yield key
+		overflow = self._overflow()
+		if overflow:
+			for key in overflow:
+				yield key
+
+	def __str__(self):
+		return "%s:%d deps(%d) dependedBy(%d)" % (self["name"], self["id"], len(self["deps"]), len(self["dependedBy"]))
+
+class CompactDependency(_CompactItem):
+	__slots__ = ()
+
+	def __getitem__(self, key):
+		overflow = self._overflow()
+		if overflow and key in overflow:
+			return overflow[key]
+		g = self._g
+		if key == "id":
+			return self._i + 1
+		if key == "caller_id":
+			return g._callers[self._i] + 1
+		if key == "callee_id":
+			return g._callees[self._i] + 1
+		if key == "caller":
+			return CompactNode(g, g._callers[self._i])
+		if key == "callee":
+			return CompactNode(g, g._callees[self._i])
+		col = g._edge_columns.get(key)
+		val = _MISSING if col is None else col.get(self._i)
+		if val is _MISSING:
+			raise KeyError(key)
+		return val
+
+	def __contains__(self, key):
+		overflow = self._overflow()
+		if overflow and key in overflow:
+			return True
+		if key in _EDGE_REF_KEYS:
+			return True
+		col = self._g._edge_columns.get(key)
+		return col is not None and col.has(self._i)
+
+	def __iter__(self):
+		for key in _EDGE_REF_KEYS:
+			yield key
+		for key, col in self._g._edge_columns.items():
+			if col.has(self._i):
+				yield key
+		overflow = self._overflow()
+		if overflow:
+			for key in overflow:
+				yield key
+
+	def __str__(self):
+		caller = self["caller"]
+		callee = self["callee"]
+		return "(%s:%s[%d] -%d:%d-> %s:%s[%d])" % (caller["componentName"], caller["name"], caller["id"], int(self["external"]), self["calls"], callee["componentName"], callee["name"], callee["id"])
+
+class CompactGraph(object):
+	"""
+	Compact, read mostly copy of an ElfFileMgr dependency graph.
+
+	Nodes and edges are integer ids, attributes are stored in columns with
+	interned values, and deps/dependedBy are CSR adjacency arrays. Nodes and
+	edges are returned as dict compatible views so rules can run against a
+	CompactGraph the same way as against an ElfFileMgr.
+	"""
+	def __init__(self, mgr):
+		self._product_out_path = mgr.get_product_out_path()
+		self._prefix = mgr.get_product_images_path()
+		self._pool = _ValuePool()
+		self._overflow = {}
+		self._frozen = False
+
+		elfs = mgr.get_all()
+		deps = mgr.get_all_deps()
+
+		self._node_columns = self.__build_columns(elfs, _NODE_EDGE_KEYS + ("id", ))
+		self._edge_columns = self.__build_columns(deps, _EDGE_REF_KEYS)
+
+		self._callers = array("I", [dep["caller_id"] - 1 for dep in deps])
+		self._callees = array("I", [dep["callee_id"] - 1 for dep in deps])
+
+		self._deps_ptr, self._deps_idx = self.__build_csr(elfs, "deps")
+		self._rdeps_ptr, self._rdeps_idx = self.__build_csr(elfs, "dependedBy")
+
+		self._path_index = {}
+		self._name_index = {}
+		for idx, elf in enumerate(elfs):
+			self._path_index[elf["path"]] = idx
+		for elf in elfs:
+			if elf["name"] not in self._name_index:
+				self._name_index[elf["name"]] = mgr.get_elf_by_name(elf["name"])["id"] - 1
+		self._resolver = mgr.get_resolver()
+		self._query = None
+
+		# Symbols bound through each dependency, in CSR layout indexed by edge
+		self._symbols = mgr.get_symbol_table()
+		self._sym_ptr = array("I", [0])
+		self._sym_idx = array("I")
+		if self._symbols:
+			for dep in deps:
+				ids = self._symbols.intern_all(mgr.get_dep_symbols(dep))
+				self._sym_idx.extend(ids)
+				self._sym_ptr.append(len(self._sym_idx))
+
+	def __build_columns(self, items, skip_keys):
+		keys = []
+		seen = set()
+		for item in items:
+			for key in item.keys():
+				if key not in seen and key not in skip_keys:
+					seen.add(key)
+					keys.append(key)
+
+		columns = {}
+		for key in keys:
+			columns[key] = _Column([item.get(key, _MISSING) for item in items], self._pool)
+		return columns
+
+	@staticmethod
+	def __build_csr(elfs, key):
+		ptr = array("I", [0])
+		idx = array("I")
+		for elf in elfs:
+			for dep in elf[key]:
+				idx.append(dep["id"] - 1)
+			ptr.append(len(idx))
+		return (ptr, idx)
+
+	def _edge_ids(self, node, key):
+		if key.startswith("deps"):
+			ptr, idx = self._deps_ptr, self._deps_idx
+		else:
+			ptr, idx = self._rdeps_ptr, self._rdeps_idx
+		return idx[ptr[node]:ptr[node + 1]]
+
+	def _node_edges(self, node, key):
+		edges = self._edge_ids(node, key)
+		if key.endswith("_internal") or key.endswith("_external"):
+			external = self._edge_columns.get("external")
+			want = key.endswith("_external")
+			edges = [e for e in edges if (external is not None and external.get(e) is True) == want]
+		return [CompactDependency(self, e) for e in edges]
+
+	def freeze(self):
+		"""Refuse new attributes of nodes and edges until thaw(), the graph is read only otherwise."""
+		self._frozen = True
+
+	def thaw(self):
+		self._frozen = False
+
+	def is_frozen(self):
+		return self._frozen
+
+	def get_product_images_path(self):
+		return self._prefix
+
+	def get_product_out_path(self):
+		return self._product_out_path
+
+	def get_all(self):
+		return [CompactNode(self, idx) for idx in range(len(self._deps_ptr) - 1)]
+
+	def get_all_deps(self):
+		return [CompactDependency(self, idx) for idx in range(len(self._callers))]
+
+	def get_elf_by_idx(self, idx):
+		if idx < 1 or idx >= len(self._deps_ptr):
+			return None
+		return CompactNode(self, idx - 1)
+
+	def get_elf_by_path(self, path):
+		if path in self._path_index:
+			return CompactNode(self, self._path_index[path])
+		elf = self._resolver.resolve_path(self._path_index, path)
+		if elf is None:
+			return None
+		return CompactNode(self, elf)
+
+	def get_elf_by_name(self, name):
+		if name in self._name_index:
+			return CompactNode(self, self._name_index[name])
+		idx = self._resolver.resolve_link(self._path_index, name)
+		if idx is None:
+			return None
+		return CompactNode(self, idx)
+
+	def get_resolver(self):
+		return self._resolver
+
+	def get_query(self):
+		from .graph_query import DepsGraphQuery
+
+		if not self._query:
+			self._query = DepsGraphQuery(self)
+		return self._query
+
+	def get_symbol_table(self):
+		return self._symbols
+
+	def get_dep_symbols(self, dep):
+		if not self._symbols:
+			return []
+		idx = dep["id"] - 1
+		return self._symbols.get_names(self._sym_idx[self._sym_ptr[idx]:self._sym_ptr[idx + 1]])
+
+	def get_deps_csr(self):
+		"""Return (indptr, edge ids, callee of each edge) arrays of deps adjacency."""
+		return (self._deps_ptr, self._deps_idx, self._callees)
+
+	def get_depended_by_csr(self):
+		"""Return (indptr, edge ids, caller of each edge) arrays of dependedBy adjacency."""
+		return (self._rdeps_ptr, self._rdeps_idx, self._callers)
+
+if __name__ == '__main__':
+	import os
+	import sys
+	import gc
+	import tracemalloc
+
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	from elf_file_mgr import ElfFileMgr
+
+	# Memory benchmark: python elf_file_mgr/compact_graph.py <product out path>
+	tracemalloc.start()
+	base = tracemalloc.get_traced_memory()[0]
+	mgr = ElfFileMgr(sys.argv[1])
+	mgr.scan_all_files()
+	gc.collect()
+	dict_graph = tracemalloc.get_traced_memory()[0] - base
+
+	graph = CompactGraph(mgr)
+	mgr = None
+	gc.collect()
+	compact_graph = tracemalloc.get_traced_memory()[0] - base
+
+	print("modules: %d, dependencies: %d" % (len(graph.get_all()), len(graph.get_all_deps())))
+	print("dict graph:    %10d bytes" % dict_graph)
+	print("compact graph: %10d bytes" % compact_graph)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+from collections import deque
+
+CYCLES_REPORT_NAME = "deps_guard_cycles.json"
+
+def strongly_connected_components(succ):
+	"""
+	Tarjan's algorithm with an explicit stack, no recursion limit is hit on deep graphs.
+
+	succ[v] lists successors of node v. Return components as lists of node
+	indexes, callees before callers. Runs in O(V+E).
+	"""
+	n = len(succ)
+	index = [-1] * n
+	low = [0] * n
+	on_stack = [False] * n
+	stack = []
+	components = []
+	counter = 0
+	for root in range(n):
+		if index[root] >= 0:
+			continue
+		index[root] = low[root] = counter
+		counter += 1
+		stack.append(root)
+		on_stack[root] = True
+		work = [(root, 0)]
+		while work:
+			v, i = work[-1]
+			if i < len(succ[v]):
+				work[-1] = (v, i + 1)
+				w = succ[v][i]
+				if index[w] < 0:
+					index[w] = low[w] = counter
+					counter += 1
+					stack.append(w)
+					on_stack[w] = True
+					work.append((w, 0))
+				elif on_stack[w] and index[w] < low[v]:
+					low[v] = index[w]
+				continue
+
+			work.pop()
+			if work:
+				u = work[-1][0]
+				if low[v] < low[u]:
+					low[u] = low[v]
+			if low[v] == index[v]:
+				component = []
+				while True:
+					w = stack.pop()
+					on_stack[w] = False
+					component.append(w)
+					if w == v:
+						break
+				components.append(component)
+	return components
+
+def _shortest_cycle(succ, start, members):
+	"""Shortest cycle from start back to start inside members, as a list of node indexes."""
+	parent = {start: None}
+	queue = deque([start])
+	while queue:
+		v = queue.popleft()
+		for w in succ[v]:
+			if w == start:
+				path = [v]
+				while parent[path[-1]] is not None:
+					path.append(parent[path[-1]])
+				path.reverse()
+				return path + [start]
+			if w in members and w not in parent:
+				parent[w] = v
+				queue.append(w)
+	return [start]
+
+def get_cycle_key(names):
+	"""White list key of a cycle: sorted module names joined by commas."""
+	return ",".join(sorted(names))
+
+class DepsCycleReport(object):
+	"""
+	Circular dependencies between modules.
+
+	Each strongly connected component with more than one module, or with a
+	module depending on itself, is one cycle. A cycle lists its modules with
+	their component ownership and the shortest loop through its first module.
+	"""
+	def __init__(self, mgr):
+		elfs = mgr.get_all()
+		succ = [[dep["callee_id"] - 1 for dep in elf["deps"]] for elf in elfs]
+
+		self._cycles = []
+		for scc in strongly_connected_components(succ):
+			if len(scc) == 1 and scc[0] not in succ[scc[0]]:
+				continue
+			members = set(scc)
+			modules = sorted([elfs[v] for v in scc], key=lambda elf: elf["path"])
+			loop = _shortest_cycle(succ, modules[0]["id"] - 1, members)
+			self._cycles.append({
+				"key": get_cycle_key([elf["name"] for elf in modules]),
+				"size": len(modules),
+				"edges": sum([len([w for w in succ[v] if w in members]) for v in scc]),
+				"components": sorted(set([elf["componentName"] for elf in modules])),
+				"modules": modules,
+				"loop": [elfs[v] for v in loop]
+			})
+
+		self._cycles.sort(key=lambda cycle: (-cycle["size"], cycle["key"]))
+
+	def get_cycles(self):
+		"""Cycles, largest first. "modules" and "loop" hold the graph's own module objects."""
+		return self._cycles
+
+	def to_json(self):
+		res = []
+		for cycle in self._cycles:
+			item = dict([(k, cycle[k]) for k in ("key", "size", "edges", "components")])
+			item["modules"] = [{"name": elf["name"], "path": elf["path"], "componentName": elf["componentName"],
+				"subsystem": elf["subsystem"], "labelPath": elf["labelPath"]} for elf in cycle["modules"]]
+			item["loop"] = [elf["name"] for elf in cycle["loop"]]
+			res.append(item)
+		return res
+
+	def save(self, product_out_path):
+		try:
+			with open(os.path.join(product_out_path, CYCLES_REPORT_NAME), "w") as f:
+				json.dump(self.to_json(), f, indent=4)
+		except:
+			pass
+
+	def print_report(self):
+		print("%d dependency cycles found" % len(self._cycles))
+		for cycle in self._cycles:
+			print("  %d modules, %d dependencies in components [%s]:" % (cycle["size"], cycle["edges"], ", ".join(cycle["components"])))
+			print("    %s" % " -> ".join([elf["name"] for elf in cycle["loop"]]))
+
+if __name__ == '__main__':
+	import sys
+
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	from elf_file_mgr import ElfFileMgr
+
+	# Example: python elf_file_mgr/dep_cycles.py <product out path>
+	mgr = ElfFileMgr(sys.argv[1])
+	mgr.scan_all_files()
+	DepsCycleReport(mgr).print_report()
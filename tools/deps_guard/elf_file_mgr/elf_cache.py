@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+import sqlite3
+import hashlib
+import multiprocessing
+
+# Bump this when the format of cached values changes
+CACHE_VERSION = 3
+
+CACHE_FILE_NAME = "deps_guard_cache.db"
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+CACHE_KIND_ELF = "elf"
+CACHE_KIND_HCB = "hcb"
+CACHE_KIND_SA_PROFILE = "sa_profile"
+# Dynamic symbols are only shared in memory by ElfInfoPool, decoding them from sqlite is not faster than parsing
+CACHE_KIND_SYMBOLS = "symbols"
+
+def file_digest(file):
+	h = hashlib.sha1()
+	with open(file, "rb") as f:
+		while True:
+			data = f.read(1024 * 1024)
+			if not data:
+				break
+			h.update(data)
+	return h.hexdigest()
+
+def _stat_key(file):
+	st = os.stat(file)
+	return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+class ElfCache(object):
+	"""
+	Persistent cache of parsed file metadata.
+
+	Files are mapped to a content digest by (inode, size, mtime), and values
+	are stored by (kind, digest). A file whose stat changed but whose content
+	did not is hashed again and still hits the cache.
+	"""
+	def __init__(self, db_file, max_size=DEFAULT_MAX_SIZE, invalidate=False):
+		self._db_file = db_file
+		self._max_size = max_size
+		self._hits = 0
+		self._misses = 0
+		self._conn = sqlite3.connect(db_file)
+		self.__init_tables(invalidate)
+
+	def __init_tables(self, invalidate):
+		cursor = self._conn.cursor()
+		cursor.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+		row = cursor.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+		if invalidate or not row or row[0] != str(CACHE_VERSION):
+			cursor.execute("DROP TABLE IF EXISTS files")
+			cursor.execute("DROP TABLE IF EXISTS blobs")
+			cursor.execute("DELETE FROM meta")
+			cursor.execute("INSERT INTO meta VALUES ('version', ?)", (str(CACHE_VERSION), ))
+			cursor.execute("INSERT INTO meta VALUES ('generation', '0')")
+
+		cursor.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, ino INTEGER, size INTEGER, mtime INTEGER, digest TEXT)")
+		cursor.execute("CREATE TABLE IF NOT EXISTS blobs (kind TEXT, digest TEXT, data TEXT, used INTEGER, PRIMARY KEY (kind, digest))")
+
+		# Each run is one generation, used for least recently used eviction
+		row = cursor.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+		self._generation = int(row[0]) + 1 if row else 1
+		cursor.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (str(self._generation), ))
+		self._conn.commit()
+
+	def get_db_file(self):
+		return self._db_file
+
+	def get_stats(self):
+		return (self._hits, self._misses)
+
+	def __lookup_digest(self, file, key):
+		row = self._conn.execute("SELECT ino, size, mtime, digest FROM files WHERE path = ?", (file, )).fetchone()
+		if row and tuple(row[:3]) == key:
+			return row[3]
+		return None
+
+	def __save_digest(self, file, key, digest):
+		self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", (file, key[0], key[1], key[2], digest))
+
+	def get_file_digests(self, files, jobs=1):
+		"""Return the content digest of each file, only files with changed stat are hashed."""
+		res = {}
+		changed = []
+		for f in files:
+			key = _stat_key(f)
+			digest = self.__lookup_digest(f, key)
+			if digest:
+				res[f] = digest
+			else:
+				changed.append((f, key))
+
+		if jobs and jobs > 1 and len(changed) > 1:
+			with multiprocessing.Pool(jobs) as pool:
+				digests = pool.map(file_digest, [f for f, key in changed], max(1, len(changed) // (jobs * 4)))
+		else:
+			digests = [file_digest(f) for f, key in changed]
+
+		for (f, key), digest in zip(changed, digests):
+			self.__save_digest(f, key, digest)
+			res[f] = digest
+		return res
+
+	def get_file_digest(self, file):
+		return self.get_file_digests([file])[file]
+
+	def get(self, kind, digest):
+		row = self._conn.execute("SELECT data FROM blobs WHERE kind = ? AND digest = ?", (kind, digest)).fetchone()
+		if not row:
+			self._misses += 1
+			return None
+		self._hits += 1
+		self._conn.execute("UPDATE blobs SET used = ? WHERE kind = ? AND digest = ?", (self._generation, kind, digest))
+		return json.loads(row[0])
+
+	def put(self, kind, digest, value):
+		self._conn.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)", (kind, digest, json.dumps(value), self._generation))
+
+	def __evict(self):
+		total = self._conn.execute("SELECT SUM(LENGTH(data)) FROM blobs").fetchone()[0] or 0
+		if total <= self._max_size:
+			return
+
+		# Drop least recently used values until the cache fits in max_size
+		cursor = self._conn.execute("SELECT kind, digest, LENGTH(data) FROM blobs ORDER BY used")
+		victims = []
+		for kind, digest, size in cursor:
+			if total <= self._max_size:
+				break
+			victims.append((kind, digest))
+			total -= size
+		self._conn.executemany("DELETE FROM blobs WHERE kind = ? AND digest = ?", victims)
+		self._conn.execute("DELETE FROM files WHERE digest NOT IN (SELECT digest FROM blobs)")
+
+	def close(self):
+		if not self._conn:
+			return
+		self.__evict()
+		self._conn.commit()
+		self._conn.close()
+		self._conn = None
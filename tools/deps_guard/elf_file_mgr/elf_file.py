@@ -17,14 +17,264 @@
 #
 
 import os
+import re
+import subprocess
 from stat import *
 
-from .utils import command
+from .elf_parser import parse_elf_info, parse_elf_symbols, ElfParseError
+
+class ElfToolError(Exception):
+	pass
+
+def _run_tool(*args):
+	"""Output lines of readelf or size, raise ElfToolError instead of exiting if it fails."""
+	try:
+		res = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+	except OSError as e:
+		raise ElfToolError("can not run %s: %s" % (args[0], str(e)))
+	if res.returncode != 0:
+		raise ElfToolError("%s failed with status %d on %s: %s" % (args[0], res.returncode, args[-1], res.stderr.strip()))
+	return [line for line in res.stdout.strip().split("\n") if line]
+
+def empty_elf_info():
+	"""Info of a file without dependencies, used for files that can not be parsed."""
+	info = {"needed": [], "soname": "", "runpath": "", "load_segments": 0, "text_size": 0, "data_size": 0, "bss_size": 0}
+	info.update(_readelf_relocation_counts({}, False))
+	return info
+
+def _readelf_dynamic_value(line, tag):
+	pos = line.find(tag)
+	if pos <= 0:
+		return None
+	line = line[pos + len(tag):].strip()
+	pos = line.find(":")
+	if pos < 0:
+		return None
+	line = line[pos + 1:].strip()
+	if line.startswith("["):
+		line = line[1:]
+	if line.endswith("]"):
+		line = line[:-1]
+	return line.strip()
+
+def _readelf_dynamic_number(line, tag):
+	pos = line.find(tag)
+	if pos <= 0:
+		return None
+	vals = line[pos + len(tag):].split()
+	if not vals:
+		return None
+	try:
+		return int(vals[0], 0)
+	except ValueError:
+		return vals[0]
+
+def _readelf_relocation_counts(tags, is64):
+	rel_size = 16 if is64 else 8
+	rela_size = 24 if is64 else 12
+	res = {"relocs": 0, "plt_relocs": 0, "relative_relocs": 0}
+	if tags.get("RELASZ"):
+		res["relocs"] += tags["RELASZ"] // (tags.get("RELAENT") or rela_size)
+	if tags.get("RELSZ"):
+		res["relocs"] += tags["RELSZ"] // (tags.get("RELENT") or rel_size)
+	if tags.get("PLTRELSZ"):
+		if tags.get("PLTREL") == "REL":
+			res["plt_relocs"] = tags["PLTRELSZ"] // (tags.get("RELENT") or rel_size)
+		else:
+			res["plt_relocs"] = tags["PLTRELSZ"] // (tags.get("RELAENT") or rela_size)
+	res["relative_relocs"] = tags.get("RELACOUNT", 0) + tags.get("RELCOUNT", 0)
+	if tags.get("RELRSZ"):
+		res["relative_relocs"] += tags["RELRSZ"] // (tags.get("RELRENT") or (8 if is64 else 4))
+	return res
+
+def _extract_elf_info_by_readelf(file):
+	"""Return (info, error), error is the ElfToolError of size if only sizes are missing."""
+	info = {"needed": [], "soname": "", "runpath": ""}
+	reloc_tags = {}
+	is64 = False
+	load_segments = 0
+	for line in _run_tool("readelf", "--dynamic", "--segments", file):
+		if line.strip().startswith("LOAD "):
+			load_segments = load_segments + 1
+			continue
+		if line.strip().startswith("0x") and len(line.split()[0]) > 10:
+			is64 = True
+		for tag in ("RELASZ", "RELAENT", "RELSZ", "RELENT", "PLTRELSZ", "PLTREL", "RELACOUNT", "RELCOUNT", "RELRSZ", "RELRENT"):
+			val = _readelf_dynamic_number(line, "(%s)" % tag)
+			if val is not None:
+				reloc_tags[tag] = val
+		val = _readelf_dynamic_value(line, "(NEEDED)")
+		if val is not None:
+			info["needed"].append(val)
+			continue
+		val = _readelf_dynamic_value(line, "(SONAME)")
+		if val is not None:
+			info["soname"] = val
+			continue
+		val = _readelf_dynamic_value(line, "(RUNPATH)")
+		if val is not None:
+			info["runpath"] = val
+			continue
+		val = _readelf_dynamic_value(line, "(RPATH)")
+		if val is not None and not info["runpath"]:
+			info["runpath"] = val
+	info.update(_readelf_relocation_counts(reloc_tags, is64))
+	info["load_segments"] = load_segments
+
+	error = None
+	try:
+		size_data = _run_tool("size", file)
+	except ElfToolError as e:
+		size_data = None
+		error = e
+	if not size_data or len(size_data) < 2:
+		info["text_size"] = 0
+		info["data_size"] = 0
+		info["bss_size"] = 0
+	else:
+		vals = size_data[1].split()
+		info["text_size"] = int(vals[0])
+		info["data_size"] = int(vals[1])
+		info["bss_size"] = int(vals[2])
+	return (info, error)
+
+_READELF_VERSYM_RE = re.compile(r"([0-9a-f]+)(h?)\s*\(")
+_READELF_VERSYM_ROW_RE = re.compile(r"[0-9a-f]+:$")
+
+def _extract_elf_symbols_by_readelf(file):
+	"""
+	Same rules as ElfParser.dynamic_symbols(): defined symbols with the local
+	version index or a hidden version are not exported.
+
+	The version of each symbol is read from the .gnu.version table, the
+	name@VERSION form of the symbol table does not tell a hidden version
+	from a version needed from another library, such as copy relocated
+	stdout@GLIBC_2.2.5 in executables.
+	"""
+	symbols = {"imports": [], "exports": []}
+	defined = []
+	versions = []
+	section = None
+	for line in _run_tool("readelf", "--dyn-syms", "--version-info", "--wide", file):
+		if not line.startswith(" "):
+			if line.startswith("Symbol table"):
+				section = "symbols"
+			elif line.startswith("Version symbols section"):
+				section = "versym"
+			else:
+				section = None
+			continue
+		cols = line.split()
+		if not cols or not cols[0].endswith(":"):
+			continue
+		if section == "versym":
+			# Rows start with the hex index of their first entry, skip the Addr: line
+			if not _READELF_VERSYM_ROW_RE.match(cols[0]):
+				continue
+			for ver, hidden in _READELF_VERSYM_RE.findall(line[line.find(":") + 1:]):
+				versions.append((int(ver, 16), hidden == "h"))
+			continue
+		if section != "symbols" or not cols[0][:-1].isdigit():
+			continue
+		# STB_GNU_UNIQUE is printed as an OS specific binding if the OSABI is not GNU
+		cols = line.replace("<OS specific>: 10", "UNIQUE").split()
+		if len(cols) < 8:
+			continue
+		sym_type, bind, vis, ndx, name = cols[3:8]
+		if bind not in ("GLOBAL", "WEAK", "UNIQUE"):
+			continue
+		if ndx == "UND":
+			symbols["imports"].append(name.split("@")[0])
+			continue
+		if sym_type in ("SECTION", "FILE") or vis not in ("DEFAULT", "PROTECTED"):
+			continue
+		defined.append((int(cols[0][:-1]), name.split("@")[0]))
+
+	for idx, name in defined:
+		if idx < len(versions) and (versions[idx][0] == 0 or versions[idx][1]):
+			continue
+		symbols["exports"].append(name)
+	return symbols
+
+ELF_BACKEND_NATIVE = "native"
+ELF_BACKEND_READELF = "readelf"
+
+def _tool_warning(warning, error, result):
+	if warning:
+		return "%s\nWarning: %s, %s" % (warning, str(error), result)
+	return "Warning: %s, %s" % (str(error), result)
+
+def _extract_elf_info(file, backend):
+	warning = None
+	if backend == ELF_BACKEND_NATIVE:
+		try:
+			return (parse_elf_info(file), None)
+		except ElfParseError as e:
+			warning = "Warning: %s, fallback to readelf" % str(e)
+	try:
+		info, error = _extract_elf_info_by_readelf(file)
+	except ElfToolError as e:
+		return (empty_elf_info(), _tool_warning(warning, e, "it is taken as having no dependencies"))
+	if error:
+		warning = _tool_warning(warning, error, "sizes are taken as zero")
+	return (info, warning)
+
+def _extract_elf_symbols(file, backend):
+	warning = None
+	if backend == ELF_BACKEND_NATIVE:
+		try:
+			return (parse_elf_symbols(file), None)
+		except ElfParseError as e:
+			warning = "Warning: %s, fallback to readelf" % str(e)
+	try:
+		return (_extract_elf_symbols_by_readelf(file), warning)
+	except ElfToolError as e:
+		return ({"imports": [], "exports": []}, _tool_warning(warning, e, "no symbols are loaded"))
+
+def extract_elf_info_job(file, backend):
+	"""
+	Get NEEDED, SONAME, RUNPATH and section sizes of an ELF file.
+
+	The native backend parses the file in process, readelf is used as a
+	fallback for files it can not handle. If readelf fails as well, the file
+	is taken as having no dependencies and zero sizes.
+	Return (info, warning) so that warnings from worker processes can be
+	printed in order by the caller. A warning also means info comes from a
+	fallback and must not be cached. Nothing is raised, a worker process must
+	not stop the pool: info is None if the file can not be read at all.
+	"""
+	try:
+		return _extract_elf_info(file, backend)
+	except KeyboardInterrupt:
+		raise
+	except BaseException as e:
+		return (None, "Warning: can not get ELF info of %s: %r, it is skipped" % (file, e))
+
+def extract_elf_symbols_job(file, backend):
+	"""Get imported and exported dynamic symbols of an ELF file, return (symbols, warning), symbols is None on any error."""
+	try:
+		return _extract_elf_symbols(file, backend)
+	except KeyboardInterrupt:
+		raise
+	except BaseException as e:
+		return (None, "Warning: can not get dynamic symbols of %s: %r, they are skipped" % (file, e))
+
+def extract_elf_info(file, backend=ELF_BACKEND_NATIVE):
+	info, warning = extract_elf_info_job(file, backend)
+	if warning:
+		print(warning)
+	if info is None:
+		return empty_elf_info()
+	return info
 
 class ElfFile(dict):
+	BACKEND = ELF_BACKEND_NATIVE
+
 	def __init__(self, file, prefix):
 		self._f = file
-		self._f_safe = "'%s'" % file
+		self._info = None
+		self._imports = None
+		self._exports = None
 
 		self["name"] = os.path.basename(file)
 		self["size"] = os.stat(self._f)[ST_SIZE]
@@ -40,26 +290,6 @@ class ElfFile(dict):
 
 		return self["path"] == other["path"]#and self["name"] == other["name"]
 
-	def __extract_soname(self):
-		soname_data = command("mklibs-readelf", "--print-soname", self._f_safe)
-		if soname_data:
-			return soname_data.pop()
-		return ""
-
-	def __extract_elf_size(self):
-		size_data = command("size", self._f_safe)
-		if not size_data or len(size_data) < 2:
-			self["text_size"] = 0
-			self["data_size"] = 0
-			self["bss_size"] = 0
-			return 0
-
-		vals = size_data[1].split()
-		self["text_size"] = int(vals[0])
-		self["data_size"] = int(vals[1])
-		self["bss_size"] = int(vals[2])
-		return ""
-
 	def is_library(self):
 		if self["name"].find(".so") > 0:
 			return True
@@ -68,30 +298,62 @@ class ElfFile(dict):
 	def get_file(self):
 		return self._f
 
+	def get_elf_info(self):
+		if self._info is None:
+			self._info = extract_elf_info(self._f, ElfFile.BACKEND)
+		return self._info
+
+	def has_elf_info(self):
+		return self._info is not None
+
+	def reload(self):
+		"""Drop all parsed data after the file is changed on disk."""
+		self._info = None
+		self._imports = None
+		self._exports = None
+		self["size"] = os.stat(self._f)[ST_SIZE]
+
+	def set_elf_info(self, info):
+		self._info = info
+
+	def get_soname(self):
+		return self.get_elf_info()["soname"]
+
+	def get_runpath(self):
+		return self.get_elf_info()["runpath"]
+
+	def set_symbols(self, imports, exports):
+		"""Set symbol id arrays of imported symbols and sorted exported symbols."""
+		self._imports = imports
+		self._exports = exports
+
+	def has_symbols(self):
+		return self._exports is not None
+
+	def get_imports(self):
+		return self._imports
+
+	def get_exports(self):
+		return self._exports
+
+	def load_elf_size(self):
+		info = self.get_elf_info()
+		for k in ("text_size", "data_size", "bss_size"):
+			self[k] = info[k]
+
+	def load_elf_relocs(self):
+		info = self.get_elf_info()
+		for k in ("relocs", "plt_relocs", "relative_relocs"):
+			self[k] = info.get(k, 0)
+
+	def load_elf_segments(self):
+		self["load_segments"] = self.get_elf_info().get("load_segments", 0)
+
 	# Return a set of libraries the passed objects depend on.
 	def library_depends(self):
 		if not os.access(self._f, os.F_OK):
 			raise Exception("Cannot find lib: " + self._f)
-		dynamics = command("readelf", "--dynamic", self._f_safe)
-		res = []
-		for line in dynamics:
-			pos = line.find("(NEEDED)")
-			if pos <= 0:
-				continue
-			line = line[pos + 8:]
-			line = line.strip()
-			if not line.startswith("Shared library:"):
-				continue
-			line = line[15:]
-			line = line.strip()
-			if line.startswith("["):
-				line = line[1:]
-			if line.endswith("]"):
-				line = line[:-1]
-			line = line.strip()
-			res.append(line)
-		return res
-
+		return list(self.get_elf_info()["needed"])
 
 if __name__ == '__main__':
 	import elf_walker
@@ -19,9 +19,19 @@
 import string
 import sys
 import os
+import multiprocessing
+from array import array
+from bisect import bisect_left
 
-from .elf_file import ElfFile
+from .elf_file import ElfFile, extract_elf_info_job, extract_elf_symbols_job, empty_elf_info
 from .elf_walker import ELFWalker
+from .elf_cache import CACHE_KIND_ELF, CACHE_KIND_SYMBOLS
+from .elf_info_pool import ElfInfoPool
+from .symbol_table import SymbolTable
+from .lib_resolver import LibraryResolver
+from .graph_query import DepsGraphQuery
+from .graph_export import export_graph
+from .phase_profiler import NULL_PROFILER
 
 class ElfFileWithDepsInfo(ElfFile):
 	def __init__(self, file, prefix):
@@ -75,7 +85,7 @@ from .sa import SAParser
 from .innerapi import InnerAPILoader
 
 class ElfFileMgr(object):
-	def __init__(self, product_out_path=None, elfFileClass=None, dependenceClass = None):
+	def __init__(self, product_out_path=None, elfFileClass=None, dependenceClass = None, read_only=False):
 		self._elfFiles = []
 		self._path_dict = {}
 		self._basename_dict = {}
@@ -94,24 +104,205 @@ class ElfFileMgr(object):
 
 		self._not_found_depened_files = []
 
-		walker = ELFWalker(product_out_path)
-		self._prefix = walker.get_product_images_path()
-		self._product_out_path = walker.get_product_out_path()
-		self._link_file_map = walker.get_link_file_map()
-
-	def scan_all_files(self):
-		walker = ELFWalker(self._product_out_path)
-
-		self._scan_all_elf_files(walker)
-		self._build_deps_tree()
-
+		self._walker = ELFWalker(product_out_path)
+		self._prefix = self._walker.get_product_images_path()
+		self._product_out_path = self._walker.get_product_out_path()
+		# Nothing is written into read only product out directories, such as baselines
+		self._read_only = read_only
+		self._resolver = None
+		self._query = None
 		self._maxDepth = 0
 		self._maxTotalDepends = 0
-
+		self._symbols = None
+		self._dep_symbols = {}
+		self._frozen = False
+
+	def freeze(self):
+		"""
+		Make the graph read only until thaw().
+
+		Rules may be checked by forked processes sharing the graph copy on
+		write, changes made while frozen would not be seen by other rules.
+		Lazy lookup tables are built now, so workers do not each build them.
+		"""
+		self.get_resolver()
+		self._frozen = True
+
+	def thaw(self):
+		self._frozen = False
+
+	def is_frozen(self):
+		return self._frozen
+
+	def __check_not_frozen(self):
+		if self._frozen:
+			raise RuntimeError("dependency graph of %s is frozen while checking rules" % self._product_out_path)
+
+	def scan_all_files(self, jobs=1, cache=None, symbols=False, profiler=NULL_PROFILER):
+		self.__check_not_frozen()
+		with profiler.phase("walk") as phase:
+			self._scan_all_elf_files(self._walker)
+			phase["count"] = len(self._elfFiles)
+		with profiler.phase("elf_parse") as phase:
+			self._load_all_elf_info(jobs, cache)
+			phase["count"] = len(self._elfFiles)
+		with profiler.phase("build_tree") as phase:
+			self._build_deps_tree()
+			phase["count"] = len(self._deps)
+		if symbols:
+			with profiler.phase("symbols") as phase:
+				self._load_all_symbols(cache if isinstance(cache, ElfInfoPool) else None)
+				self._bind_symbols()
+				phase["count"] = len(self._symbols)
+
+		self.load_module_info(jobs, cache, profiler)
+
+	def load_module_info(self, jobs=1, cache=None, profiler=NULL_PROFILER):
+		self.__check_not_frozen()
+		# Loaders reset fields set by each other and classify modules by their edges, always run all of them in order
 		print("Load compile information now ...")
-		CompileInfoLoader.load(self, self._product_out_path)
-		HdiParser.load(self, self._product_out_path)
-		SAParser.load(self, self._product_out_path)
+		with profiler.phase("CompileInfoLoader") as phase:
+			CompileInfoLoader.load(self, self._product_out_path, save_unknown=not self._read_only)
+			phase["count"] = len([elf for elf in self._elfFiles if elf.get("labelPath")])
+		with profiler.phase("HdiParser") as phase:
+			HdiParser.load(self, self._product_out_path, cache)
+			phase["count"] = len([elf for elf in self._elfFiles if elf.get("hdiType") == "hdi_service"])
+		with profiler.phase("SAParser") as phase:
+			SAParser.load(self, self._product_out_path, cache, jobs)
+			phase["count"] = len([elf for elf in self._elfFiles if elf.get("sa_id", 0) > 0])
+
+	def update_files(self, files, jobs=1, cache=None):
+		"""
+		Update the graph in place for changed files under the images directory.
+
+		files are full paths of created, modified or deleted files. Only new
+		and modified ELF files are parsed again, and only edges of these files,
+		of callers of removed files and of callers depending on a changed
+		library name are built again. Module and dependency ids are kept dense.
+		Call load_module_info() afterwards to classify modules again.
+		Return numbers of added, changed, removed and relinked modules.
+		"""
+		self.__check_not_frozen()
+		added = []
+		changed = []
+		removed = []
+		names = set()
+		for f in sorted(set(files)):
+			if not f.startswith(self._prefix):
+				continue
+			path = f[len(self._prefix):]
+			if not path.startswith("system/") and not path.startswith("vendor/"):
+				continue
+			if self._walker.update_link(f):
+				names.add(os.path.basename(f))
+
+			elf = self._path_dict.get(path)
+			if not ELFWalker.is_elf_file(f):
+				if elf:
+					removed.append(elf)
+				continue
+			if elf:
+				elf.reload()
+				changed.append(elf)
+				continue
+			elf = self._elfFileClass(f, self._prefix)
+			if elf["name"] in [ "ld-musl-aarch64.so.1", "ld-musl-arm.so.1", "hdc_std" ]:
+				continue
+			self.add_elf_file(elf)
+			added.append(elf)
+
+		if names:
+			# Links are resolved with the whole link map
+			self._resolver = None
+
+		# Edges of removed modules and old edges of dirty modules are dropped in one pass
+		removed_ids = set([elf["id"] for elf in removed])
+		stale = []
+		dirty = {}
+		for elf in removed:
+			names.add(elf["name"])
+			for dep in elf["dependedBy"]:
+				if dep["caller"]["id"] not in removed_ids:
+					dirty[dep["caller"]["id"]] = dep["caller"]
+			stale.extend(elf["dependedBy"])
+			stale.extend(elf["deps"])
+			self.__remove_elf_file(elf)
+		for elf in added:
+			names.add(elf["name"])
+		for elf in added + changed:
+			dirty[elf["id"]] = elf
+
+		# New parsed info is needed to build edges of the dirty modules
+		self._load_all_elf_info(jobs, cache)
+
+		# Callers of a changed library name may resolve to another file now
+		for name in names:
+			if len(self._basename_dict.get(name, [])) > 1:
+				self._basename_dict[name] = self.__reorder_library(self._basename_dict[name])
+		if names:
+			for elf in self._elfFiles:
+				if elf["id"] not in dirty and not names.isdisjoint(elf.get_elf_info()["needed"]):
+					dirty[elf["id"]] = elf
+
+		for elf in dirty.values():
+			stale.extend(elf["deps"])
+		self.__remove_deps(stale)
+		for elf in dirty.values():
+			self.__build_deps_tree_for_one_elf(elf)
+
+		if stale or removed:
+			self.__renumber()
+		self._query = None
+
+		if self._symbols is not None and dirty:
+			self._dep_symbols = {}
+			self._load_all_symbols()
+			self._bind_symbols()
+
+		return {"added": len(added), "changed": len(changed), "removed": len(removed), "relinked": len(dirty)}
+
+	def __remove_deps(self, deps):
+		ids = set([dep["id"] for dep in deps])
+		if not ids:
+			return
+		touched = {}
+		for dep in deps:
+			touched[dep["caller"]["id"]] = dep["caller"]
+			touched[dep["callee"]["id"]] = dep["callee"]
+		for elf in touched.values():
+			elf["deps"] = [dep for dep in elf["deps"] if dep["id"] not in ids]
+			elf["dependedBy"] = [dep for dep in elf["dependedBy"] if dep["id"] not in ids]
+		for idx in ids:
+			self._dep_symbols.pop(idx, None)
+		self._deps = [dep for dep in self._deps if dep["id"] not in ids]
+		self._query = None
+
+	def __remove_elf_file(self, elf):
+		if self._resolver:
+			self._resolver.reset()
+		self._elfFiles = [item for item in self._elfFiles if item["id"] != elf["id"]]
+		del self._path_dict[elf["path"]]
+		same_name = [item for item in self._basename_dict.get(elf["name"], []) if item["id"] != elf["id"]]
+		if same_name:
+			self._basename_dict[elf["name"]] = same_name
+		else:
+			self._basename_dict.pop(elf["name"], None)
+
+	def __renumber(self):
+		# Ids are indexes into arrays of the query, the compact graph and the snapshot
+		for idx, elf in enumerate(self._elfFiles, 1):
+			elf["id"] = idx
+		self._elfIdx = len(self._elfFiles) + 1
+
+		dep_symbols = {}
+		for idx, dep in enumerate(self._deps, 1):
+			if dep["id"] in self._dep_symbols:
+				dep_symbols[idx] = self._dep_symbols[dep["id"]]
+			dep["id"] = idx
+			dep["caller_id"] = dep["caller"]["id"]
+			dep["callee_id"] = dep["callee"]["id"]
+		self._dep_symbols = dep_symbols
+		self._depIdx = len(self._deps) + 1
 
 	def get_product_images_path(self):
 		return self._prefix
@@ -119,7 +310,39 @@ class ElfFileMgr(object):
 	def get_product_out_path(self):
 		return self._product_out_path
 
+	def get_resolver(self):
+		# Build after walking, it needs the whole symbolic link map
+		if not self._resolver:
+			self._resolver = LibraryResolver(self._prefix, self._walker.get_link_file_map())
+		return self._resolver
+
+	def get_query(self):
+		# Reachability is computed once for the whole graph, metrics come for free
+		if not self._query:
+			self._query = DepsGraphQuery(self)
+			self._maxDepth = self._query.max_depth()
+			self._maxTotalDepends = self._query.max_total_depends()
+		return self._query
+
+	def export_graph(self, file, fmt=None, graph_filter=None):
+		"""Stream modules and dependencies to file as DOT, GraphML or JSON Lines, return the format used."""
+		return export_graph(self, file, fmt, graph_filter)
+
+	def get_max_depth(self):
+		self.get_query()
+		return self._maxDepth
+
+	def get_max_total_depends(self):
+		self.get_query()
+		return self._maxTotalDepends
+
 	def add_elf_file(self, elf):
+		self.__check_not_frozen()
+		# Cached lookup results may be changed by the new file
+		if self._resolver:
+			self._resolver.reset()
+		self._query = None
+
 		# Append to array in order
 		elf["id"] = self._elfIdx
 		self._elfIdx = self._elfIdx + 1
@@ -135,8 +358,8 @@ class ElfFileMgr(object):
 			self._basename_dict[elf["name"]] = [ elf ]
 
 	def _scan_all_elf_files(self, walker):
-		print("Scanning %d ELF files now ..." % len(walker.get_elf_files()))
-		for f in walker.get_elf_files():
+		# Start creating ElfFile objects while the walker threads are still running
+		for f in walker.iter_elf_files():
 			elf = self._elfFileClass(f, self._prefix)
 			if elf["path"] in self._path_dict:
 				print("Warning: duplicate " + elf.get_file() + ' skipped.')
@@ -147,6 +370,7 @@ class ElfFileMgr(object):
 				continue
 
 			self.add_elf_file(elf)
+		print("Scanning %d ELF files now ..." % len(walker.get_elf_files()))
 
 		# Reorder libraries with same name as defined by LD_LIBRARY_PATH
 		for bname, val in self._basename_dict.items():
@@ -154,11 +378,141 @@ class ElfFileMgr(object):
 				continue
 			self._basename_dict[bname] = self.__reorder_library(val)
 
+	def __load_cached_elf_info(self, elfs, jobs, cache):
+		digests = cache.get_file_digests([elf.get_file() for elf in elfs], jobs)
+		missed = []
+		for elf in elfs:
+			info = cache.get(CACHE_KIND_ELF, digests[elf.get_file()])
+			if info is None:
+				missed.append(elf)
+			else:
+				elf.set_elf_info(info)
+		print("    %d ELF files loaded from cache %s" % (len(elfs) - len(missed), cache.get_db_file()))
+		return (missed, digests)
+
+	def _load_all_elf_info(self, jobs=1, cache=None):
+		elfs = [elf for elf in self._elfFiles if not elf.has_elf_info()]
+		if cache and elfs:
+			elfs, digests = self.__load_cached_elf_info(elfs, jobs, cache)
+		if not elfs:
+			return
+
+		# Files with the same content are parsed only once
+		copies = {}
+		if cache:
+			unique = []
+			for elf in elfs:
+				digest = digests[elf.get_file()]
+				if digest in copies:
+					copies[digest].append(elf)
+				else:
+					copies[digest] = []
+					unique.append(elf)
+			elfs = unique
+
+		jobs_args = [(elf.get_file(), ElfFile.BACKEND) for elf in elfs]
+		if jobs and jobs > 1 and len(elfs) > 1:
+			chunksize = max(1, len(jobs_args) // (jobs * 4))
+			with multiprocessing.Pool(jobs) as pool:
+				results = pool.starmap(extract_elf_info_job, jobs_args, chunksize)
+		else:
+			results = [extract_elf_info_job(*job) for job in jobs_args]
+
+		# Results are in the same order as self._elfFiles, so the output is the same as serial run
+		for elf, (info, warning) in zip(elfs, results):
+			if warning:
+				print(warning)
+			if info is None:
+				# Unreadable files have no dependencies and are not cached, they are parsed again next time
+				for item in [elf] + (copies[digests[elf.get_file()]] if cache else []):
+					item.set_elf_info(empty_elf_info())
+				continue
+			elf.set_elf_info(info)
+			if cache:
+				digest = digests[elf.get_file()]
+				if not warning:
+					# Fallback results are not cached, the file is parsed and warned about again next time
+					cache.put(CACHE_KIND_ELF, digest, info)
+				for item in copies[digest]:
+					item.set_elf_info(info)
+
+	def __set_symbols(self, elf, symbols):
+		elf.set_symbols(self._symbols.intern_all(symbols["imports"]), self._symbols.intern_all(symbols["exports"], True))
+
+	def _load_all_symbols(self, pool=None):
+		# Parsing in process is as fast as decoding cached names or sending them back from worker processes,
+		# only symbols of files with the same content in products sharing an ElfInfoPool are parsed once
+		print("Load dynamic symbols now ...")
+		if self._symbols is None:
+			self._symbols = SymbolTable()
+		elfs = [elf for elf in self._elfFiles if not elf.has_symbols()]
+		digests = {}
+		if pool and elfs:
+			digests = pool.get_file_digests([elf.get_file() for elf in elfs])
+		for elf in elfs:
+			digest = digests.get(elf.get_file())
+			symbols = pool.get(CACHE_KIND_SYMBOLS, digest) if digest else None
+			if symbols is None:
+				symbols, warning = extract_elf_symbols_job(elf.get_file(), ElfFile.BACKEND)
+				if warning:
+					print(warning)
+				if symbols is None:
+					symbols = {"imports": [], "exports": []}
+				elif digest and not warning:
+					pool.put(CACHE_KIND_SYMBOLS, digest, symbols)
+			self.__set_symbols(elf, symbols)
+		print("    Got %d unique symbols" % len(self._symbols))
+
+	def _bind_symbols(self):
+		"""
+		Bind each imported symbol to the first library in NEEDED order that exports it.
+
+		dep["calls"] is the number of symbols bound through the dependency.
+		Symbols not exported by any NEEDED library are resolved by libraries
+		loaded indirectly or by the executable, they are not bound.
+		"""
+		total = 0
+		bound = 0
+		for elf in self._elfFiles:
+			imports = elf.get_imports()
+			deps = elf["deps"]
+			if not imports:
+				continue
+			total += len(imports)
+			if not deps:
+				continue
+
+			exports = [dep["callee"].get_exports() or array("I") for dep in deps]
+			dep_symbols = [array("I") for dep in deps]
+			for sym in imports:
+				for idx, callee_exports in enumerate(exports):
+					pos = bisect_left(callee_exports, sym)
+					if pos < len(callee_exports) and callee_exports[pos] == sym:
+						dep_symbols[idx].append(sym)
+						break
+
+			for dep, symbols in zip(deps, dep_symbols):
+				dep["calls"] = len(symbols)
+				self._dep_symbols[dep["id"]] = symbols
+				bound += len(symbols)
+		print("    %d of %d imported symbols bound to NEEDED libraries" % (bound, total))
+
+	def get_symbol_table(self):
+		return self._symbols
+
+	def get_dep_symbol_ids(self, dep):
+		return self._dep_symbols.get(dep["id"], array("I"))
+
+	def get_dep_symbols(self, dep):
+		"""Names of symbols bound through the dependency, empty if symbols are not loaded."""
+		return self._symbols.get_names(self.get_dep_symbol_ids(dep)) if self._symbols else []
+
 	def __reorder_library(self, val):
+		resolver = self.get_resolver()
 		orders = []
 		idx = 0
 		for p in val:
-			orders.append((self.__get_library_order(p["path"]), idx))
+			orders.append((resolver.get_library_order(p["path"]), idx))
 			idx = idx + 1
 		orders.sort()
 
@@ -168,26 +522,6 @@ class ElfFileMgr(object):
 
 		return res
 
-	def __get_library_order(self, path):
-		if not path.startswith("/"):
-			path = "/" + path
-		if path.find("/lib64/") > 0:
-			pathOrder = "/system/lib64:/vendor/lib64:/vendor/lib64/chipsetsdk:/system/lib64/ndk:/system/lib64/chipset-pub-sdk:/system/lib64/chipset-sdk:/system/lib64/platformsdk:/system/lib64/priv-platformsdk:/system/lib64/priv-module:/system/lib64/module:/system/lib64/module/data:/system/lib64/module/multimedia:/system/lib:/vendor/lib:/system/lib/ndk:/system/lib/chipset-pub-sdk:/system/lib/chipset-sdk:/system/lib/platformsdk:/system/lib/priv-platformsdk:/system/lib/priv-module:/system/lib/module:/system/lib/module/data:/system/lib/module/multimedia:/lib64:/lib:/usr/local/lib:/usr/lib"
-		else:
-			pathOrder = "/system/lib:/vendor/lib:/vendor/lib/chipsetsdk:/system/lib/ndk:/system/lib/chipset-pub-sdk:/system/lib/chipset-sdk:/system/lib/platformsdk:/system/lib/priv-platformsdk:/system/lib/priv-module:/system/lib/module:/system/lib/module/data:/system/lib/module/multimedia:/lib:/usr/local/lib:/usr/lib"
-
-		if path.rfind("/") < 0:
-			return 1000
-
-		path = path[:path.rfind("/")]
-		paths = pathOrder.split(':')
-		idx = 0
-		for p in paths:
-			if p == path:
-				return idx
-			idx = idx + 1
-		return 1000
-
 
 	def _build_deps_tree(self):
 		print("Build dependence tree for %d ELF files now ..." % len(self._elfFiles))
@@ -196,6 +530,8 @@ class ElfFileMgr(object):
 		print("    Got %d dependencies" % self._depIdx)
 
 	def add_dependence(self, caller, callee):
+		self.__check_not_frozen()
+		self._query = None
 		dep = self._dependenceClass(self._depIdx, caller, callee)
 		caller["deps"].append(dep)
 		callee["dependedBy"].append(dep)
@@ -215,46 +551,18 @@ class ElfFileMgr(object):
 			self.add_dependence(elf, dep_elf)
 
 	def get_elf_by_path(self, path):
-		if path not in self._path_dict and path.find("/lib64/") > 0:
-			path = path.replace("/lib64/", "/lib/")
-		if path in self._path_dict:
-			return self._path_dict[path]
-		if path.find("/platformsdk/") > 0:
-			return None
-
-		if path.startswith("system/lib64/"):
-			path = path.replace("system/lib64/", "system/lib64/platformsdk/")
-		elif path.startswith("system/lib/"):
-			path = path.replace("system/lib/", "system/lib/platformsdk/")
-		else:
-			return None
-
-		if path not in self._path_dict and path.find("/lib64/") > 0:
-			path = path.replace("/lib64/", "/lib/")
-		if path in self._path_dict:
-			return self._path_dict[path]
-		return None
+		return self.get_resolver().resolve_path(self._path_dict, path)
 
 	def get_elf_by_idx(self, idx):
 		if idx < 1 or idx > len(self._elfFiles):
 			return None
 		return self._elfFiles[idx - 1]
 
-	def __get_link_file(self, name):
-		for src, target in self._link_file_map.items():
-			tmp_name = os.path.basename(src)
-			if name != tmp_name:
-				continue
-			tmp_name = os.path.dirname(src)
-			tmp_name = os.path.join(tmp_name, target)
-			link_elf = ElfFile(tmp_name, self._prefix)
-			return self.get_elf_by_path(link_elf["path"])
-
 	def get_elf_by_name(self, name):
 		if name in self._basename_dict:
 			return self._basename_dict[name][0]
 
-		return self.__get_link_file(name)
+		return self.get_resolver().resolve_link(self._path_dict, name)
 
 	def get_all(self):
 		return self._elfFiles
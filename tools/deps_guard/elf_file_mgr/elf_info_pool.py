@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import multiprocessing
+
+from .elf_cache import file_digest, CACHE_KIND_ELF, CACHE_KIND_SYMBOLS
+
+class ElfInfoPool(object):
+	"""
+	Parsed file metadata shared by content digest across products of one run.
+
+	It has the same interface as ElfCache, so it is passed to scan_all_files()
+	as the cache. Values are kept in memory and shared as they are, they are
+	never modified after parsing. If a persistent ElfCache is given, misses
+	are looked up there and new values are written through to it, except
+	dynamic symbols, which are shared in memory only.
+	"""
+	def __init__(self, cache=None):
+		self._cache = cache
+		self._values = {}
+		self._digests = {}
+		self._files = 0
+		self._hits = 0
+		self._misses = 0
+
+	def get_db_file(self):
+		if self._cache:
+			return self._cache.get_db_file()
+		return "shared by products"
+
+	def get_stats(self):
+		return (self._hits, self._misses)
+
+	def get_elf_stats(self):
+		"""Return (ELF files of all products, unique ELF contents)."""
+		return (self._files, len([key for key in self._values if key[0] == CACHE_KIND_ELF]))
+
+	def get_file_digests(self, files, jobs=1):
+		res = {}
+		changed = []
+		for f in files:
+			# The same file may be reached from several products through symbolic links
+			st = os.stat(f)
+			key = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+			if key in self._digests:
+				res[f] = self._digests[key]
+			else:
+				changed.append((f, key))
+
+		if self._cache:
+			digests = self._cache.get_file_digests([f for f, key in changed], jobs)
+			digests = [digests[f] for f, key in changed]
+		elif jobs and jobs > 1 and len(changed) > 1:
+			with multiprocessing.Pool(jobs) as pool:
+				digests = pool.map(file_digest, [f for f, key in changed], max(1, len(changed) // (jobs * 4)))
+		else:
+			digests = [file_digest(f) for f, key in changed]
+
+		for (f, key), digest in zip(changed, digests):
+			self._digests[key] = digest
+			res[f] = digest
+		return res
+
+	def get_file_digest(self, file):
+		return self.get_file_digests([file])[file]
+
+	def get(self, kind, digest):
+		if kind == CACHE_KIND_ELF:
+			self._files += 1
+		value = self._values.get((kind, digest))
+		if value is None and self._cache and kind != CACHE_KIND_SYMBOLS:
+			value = self._cache.get(kind, digest)
+			if value is not None:
+				self._values[(kind, digest)] = value
+		if value is None:
+			self._misses += 1
+		else:
+			self._hits += 1
+		return value
+
+	def put(self, kind, digest, value):
+		self._values[(kind, digest)] = value
+		if self._cache and kind != CACHE_KIND_SYMBOLS:
+			self._cache.put(kind, digest, value)
+
+	def close(self):
+		if self._cache:
+			self._cache.close()
+			self._cache = None
@@ -0,0 +1,484 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import mmap
+import struct
+
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2LSB = 1
+ELFDATA2MSB = 2
+
+SHN_UNDEF = 0
+SHN_XINDEX = 0xffff
+
+SHT_NULL = 0
+SHT_DYNAMIC = 6
+SHT_NOBITS = 8
+SHT_DYNSYM = 11
+SHT_GNU_VERSYM = 0x6fffffff
+
+SHF_WRITE = 0x1
+SHF_ALLOC = 0x2
+SHF_EXECINSTR = 0x4
+
+PT_LOAD = 1
+PT_DYNAMIC = 2
+
+DT_NULL = 0
+DT_NEEDED = 1
+DT_PLTRELSZ = 2
+DT_HASH = 4
+DT_STRTAB = 5
+DT_SYMTAB = 6
+DT_RELA = 7
+DT_RELASZ = 8
+DT_RELAENT = 9
+DT_STRSZ = 10
+DT_SONAME = 14
+DT_RPATH = 15
+DT_REL = 17
+DT_RELSZ = 18
+DT_RELENT = 19
+DT_PLTREL = 20
+DT_RUNPATH = 29
+DT_RELRSZ = 35
+DT_RELRENT = 37
+DT_GNU_HASH = 0x6ffffef5
+DT_VERSYM = 0x6ffffff0
+DT_RELACOUNT = 0x6ffffff9
+DT_RELCOUNT = 0x6ffffffa
+
+STB_GLOBAL = 1
+STB_WEAK = 2
+STB_GNU_UNIQUE = 10
+
+STT_SECTION = 3
+STT_FILE = 4
+
+STV_DEFAULT = 0
+STV_PROTECTED = 3
+
+# Version index 0 is local, the hidden bit marks non default versions
+VER_NDX_LOCAL = 0
+VERSYM_HIDDEN = 0x8000
+
+_EXTERNAL_BINDS = frozenset((STB_GLOBAL, STB_WEAK, STB_GNU_UNIQUE))
+
+class ElfParseError(Exception):
+	pass
+
+# struct layouts indexed by ELF class, without the byte order prefix
+_LAYOUTS = {
+	ELFCLASS32: {
+		"ehdr": "HHIIIIIHHHHHH",
+		"shdr": "IIIIIIIIII",
+		"phdr": "IIIIIIII",
+		"dyn": "iI",
+		"sym": "IIIBBH",
+		"rel": 8,
+		"rela": 12
+	},
+	ELFCLASS64: {
+		"ehdr": "HHIQQQIHHHHHH",
+		"shdr": "IIQQQQIIQQ",
+		"phdr": "IIQQQQQQ",
+		"dyn": "qQ",
+		"sym": "IBBHQQ",
+		"rel": 16,
+		"rela": 24
+	}
+}
+
+class ElfParser(object):
+	"""
+	Parse ELF files in process with struct and mmap.
+
+	Only the dynamic section, the dynamic symbol table and the section headers
+	are decoded, fields are unpacked straight from the mapping without copying
+	the file contents.
+	"""
+	def __init__(self, file):
+		self._file = file
+		self._mm = None
+		try:
+			with open(file, "rb") as f:
+				self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		except (OSError, ValueError) as e:
+			raise ElfParseError("%s: %s" % (file, e))
+
+		try:
+			self.__parse_header()
+		except struct.error as e:
+			self.close()
+			raise ElfParseError("%s: truncated ELF header (%s)" % (file, e))
+		except ElfParseError:
+			self.close()
+			raise
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, traceback):
+		self.close()
+
+	def close(self):
+		if self._mm:
+			self._mm.close()
+			self._mm = None
+
+	def __parse_header(self):
+		mm = self._mm
+		if len(mm) < 16 or mm[:4] != b"\x7fELF":
+			raise ElfParseError("%s: not an ELF file" % self._file)
+
+		self._class = mm[4]
+		if self._class not in _LAYOUTS:
+			raise ElfParseError("%s: unknown ELF class %d" % (self._file, self._class))
+		if mm[5] == ELFDATA2LSB:
+			endian = "<"
+		elif mm[5] == ELFDATA2MSB:
+			endian = ">"
+		else:
+			raise ElfParseError("%s: unknown ELF data encoding %d" % (self._file, mm[5]))
+
+		layout = _LAYOUTS[self._class]
+		self._shdr = struct.Struct(endian + layout["shdr"])
+		self._phdr = struct.Struct(endian + layout["phdr"])
+		self._dyn = struct.Struct(endian + layout["dyn"])
+		self._sym = struct.Struct(endian + layout["sym"])
+		self._endian = endian
+
+		(self._e_type, self._e_machine, _, _, self._phoff, self._shoff, _, _,
+			self._phentsize, self._phnum, self._shentsize, self._shnum,
+			self._shstrndx) = struct.unpack_from(endian + layout["ehdr"], mm, 16)
+
+		# Extended numbering is stored in the first section header
+		if self._shoff and (self._shnum == 0 or self._shstrndx == SHN_XINDEX):
+			first = self.__section_header(0)
+			if self._shnum == 0:
+				self._shnum = first[5]
+			if self._shstrndx == SHN_XINDEX:
+				self._shstrndx = first[6]
+
+	def __section_header(self, idx):
+		entsize = self._shentsize or self._shdr.size
+		return self._shdr.unpack_from(self._mm, self._shoff + idx * entsize)
+
+	def sections(self):
+		"""Yield (sh_type, sh_flags, sh_offset, sh_size, sh_link, sh_entsize) of each section."""
+		if not self._shoff:
+			return
+		if self._shoff + self._shnum * self._shdr.size > len(self._mm):
+			raise ElfParseError("%s: section headers out of file" % self._file)
+		for idx in range(self._shnum):
+			sh = self.__section_header(idx)
+			yield (sh[1], sh[2], sh[4], sh[5], sh[6], sh[9])
+
+	def segments(self):
+		"""Yield (p_type, p_offset, p_vaddr, p_filesz, p_memsz) of each program header."""
+		if not self._phoff:
+			return
+		entsize = self._phentsize or self._phdr.size
+		if self._phoff + self._phnum * entsize > len(self._mm):
+			raise ElfParseError("%s: program headers out of file" % self._file)
+		for idx in range(self._phnum):
+			ph = self._phdr.unpack_from(self._mm, self._phoff + idx * entsize)
+			if self._class == ELFCLASS64:
+				yield (ph[0], ph[2], ph[3], ph[5], ph[6])
+			else:
+				yield (ph[0], ph[1], ph[2], ph[4], ph[5])
+
+	def __vaddr_to_offset(self, vaddr):
+		for p_type, p_offset, p_vaddr, p_filesz, p_memsz in self.segments():
+			if p_type == PT_LOAD and p_vaddr <= vaddr < p_vaddr + p_filesz:
+				return vaddr - p_vaddr + p_offset
+		return None
+
+	def get_string(self, offset):
+		end = self._mm.find(b"\0", offset)
+		if end < 0:
+			raise ElfParseError("%s: unterminated string at %d" % (self._file, offset))
+		return self._mm[offset:end].decode("utf-8", "replace")
+
+	def __dynamic_table(self):
+		# Prefer the section header, it gives the string table offset directly
+		for sh_type, sh_flags, sh_offset, sh_size, sh_link, sh_entsize in self.sections():
+			if sh_type != SHT_DYNAMIC:
+				continue
+			strtab = self.__section_header(sh_link)
+			return (sh_offset, sh_size, strtab[4])
+
+		# Stripped section headers, locate the table by PT_DYNAMIC
+		for p_type, p_offset, p_vaddr, p_filesz, p_memsz in self.segments():
+			if p_type != PT_DYNAMIC:
+				continue
+			strtab = None
+			for tag, val in self.__iter_dynamic(p_offset, p_filesz):
+				if tag == DT_STRTAB:
+					strtab = self.__vaddr_to_offset(val)
+			if strtab is None:
+				raise ElfParseError("%s: no DT_STRTAB in dynamic segment" % self._file)
+			return (p_offset, p_filesz, strtab)
+
+		return None
+
+	def __iter_dynamic(self, offset, size):
+		entsize = self._dyn.size
+		end = min(offset + size, len(self._mm))
+		while offset + entsize <= end:
+			tag, val = self._dyn.unpack_from(self._mm, offset)
+			if tag == DT_NULL:
+				break
+			yield (tag, val)
+			offset += entsize
+
+	def dynamic_info(self):
+		"""Return a dict with the NEEDED list, soname and runpath."""
+		res = {"needed": [], "soname": "", "runpath": ""}
+		table = self.__dynamic_table()
+		if not table:
+			return res
+
+		offset, size, strtab = table
+		rpath = ""
+		for tag, val in self.__iter_dynamic(offset, size):
+			if tag == DT_NEEDED:
+				res["needed"].append(self.get_string(strtab + val))
+			elif tag == DT_SONAME:
+				res["soname"] = self.get_string(strtab + val)
+			elif tag == DT_RUNPATH:
+				res["runpath"] = self.get_string(strtab + val)
+			elif tag == DT_RPATH:
+				rpath = self.get_string(strtab + val)
+
+		# DT_RPATH is only used by the linker when DT_RUNPATH is absent
+		if not res["runpath"]:
+			res["runpath"] = rpath
+		return res
+
+	def relocation_counts(self):
+		"""
+		Return numbers of dynamic relocations from the dynamic section.
+
+		relocs are REL/RELA entries applied at load time, plt_relocs are the
+		PLT entries, relative_relocs are the relative ones among relocs plus
+		RELR entries.
+		"""
+		res = {"relocs": 0, "plt_relocs": 0, "relative_relocs": 0}
+		table = self.__dynamic_table()
+		if not table:
+			return res
+
+		layout = _LAYOUTS[self._class]
+		tags = {}
+		for tag, val in self.__iter_dynamic(table[0], table[1]):
+			tags.setdefault(tag, val)
+
+		relocs = 0
+		if tags.get(DT_RELASZ):
+			relocs += tags[DT_RELASZ] // (tags.get(DT_RELAENT) or layout["rela"])
+		if tags.get(DT_RELSZ):
+			relocs += tags[DT_RELSZ] // (tags.get(DT_RELENT) or layout["rel"])
+		res["relocs"] = relocs
+
+		if tags.get(DT_PLTRELSZ):
+			if tags.get(DT_PLTREL) == DT_REL:
+				res["plt_relocs"] = tags[DT_PLTRELSZ] // (tags.get(DT_RELENT) or layout["rel"])
+			else:
+				res["plt_relocs"] = tags[DT_PLTRELSZ] // (tags.get(DT_RELAENT) or layout["rela"])
+
+		relative = tags.get(DT_RELACOUNT, 0) + tags.get(DT_RELCOUNT, 0)
+		if tags.get(DT_RELRSZ):
+			relative += tags[DT_RELRSZ] // (tags.get(DT_RELRENT) or (8 if self._class == ELFCLASS64 else 4))
+		res["relative_relocs"] = relative
+		return res
+
+	def load_segments(self):
+		"""Number of PT_LOAD segments, each one is mapped separately by the dynamic linker."""
+		return len([seg for seg in self.segments() if seg[0] == PT_LOAD])
+
+	def section_sizes(self):
+		"""Return text, data and bss sizes the same way as size(1) in berkeley format."""
+		text_size = 0
+		data_size = 0
+		bss_size = 0
+		for sh_type, sh_flags, sh_offset, sh_size, sh_link, sh_entsize in self.sections():
+			if sh_type == SHT_NULL or not (sh_flags & SHF_ALLOC):
+				continue
+			if (sh_flags & SHF_EXECINSTR) or not (sh_flags & SHF_WRITE):
+				text_size += sh_size
+			elif sh_type != SHT_NOBITS:
+				data_size += sh_size
+			else:
+				bss_size += sh_size
+		return {"text_size": text_size, "data_size": data_size, "bss_size": bss_size}
+
+	def __gnu_hash_symbol_count(self, offset):
+		# Symbols after symoffset are in hash chains, the last chain ends with bit 0 set
+		word = struct.Struct(self._endian + "I")
+		nbuckets, symoffset, bloom_size, bloom_shift = struct.unpack_from(self._endian + "IIII", self._mm, offset)
+		buckets = offset + 16 + bloom_size * (8 if self._class == ELFCLASS64 else 4)
+		last = 0
+		for idx in range(nbuckets):
+			last = max(last, word.unpack_from(self._mm, buckets + idx * 4)[0])
+		if last < symoffset:
+			# No hashed symbols, symoffset is not reliable in this case
+			return None
+
+		chains = buckets + nbuckets * 4
+		while not (word.unpack_from(self._mm, chains + (last - symoffset) * 4)[0] & 1):
+			last = last + 1
+		return last + 1
+
+	def __dynsym_table(self):
+		"""Return (symtab offset, symbol count, strtab offset, strtab size, versym offset or None)."""
+		symtab = None
+		versym = None
+		for sh_type, sh_flags, sh_offset, sh_size, sh_link, sh_entsize in self.sections():
+			if sh_type == SHT_DYNSYM and symtab is None:
+				strtab = self.__section_header(sh_link)
+				symtab = (sh_offset, sh_size // (sh_entsize or self._sym.size), strtab[4], strtab[5])
+			elif sh_type == SHT_GNU_VERSYM:
+				versym = sh_offset
+		if symtab:
+			return symtab + (versym, )
+
+		# Stripped section headers, locate the tables by PT_DYNAMIC
+		for p_type, p_offset, p_vaddr, p_filesz, p_memsz in self.segments():
+			if p_type != PT_DYNAMIC:
+				continue
+			tags = {}
+			for tag, val in self.__iter_dynamic(p_offset, p_filesz):
+				tags.setdefault(tag, val)
+			if DT_SYMTAB not in tags or DT_STRTAB not in tags:
+				return None
+
+			count = None
+			if DT_HASH in tags:
+				hash_offset = self.__vaddr_to_offset(tags[DT_HASH])
+				if hash_offset is not None:
+					count = struct.unpack_from(self._endian + "I", self._mm, hash_offset + 4)[0]
+			if count is None and DT_GNU_HASH in tags:
+				hash_offset = self.__vaddr_to_offset(tags[DT_GNU_HASH])
+				if hash_offset is not None:
+					count = self.__gnu_hash_symbol_count(hash_offset)
+
+			symtab = self.__vaddr_to_offset(tags[DT_SYMTAB])
+			strtab = self.__vaddr_to_offset(tags[DT_STRTAB])
+			if symtab is None or strtab is None:
+				raise ElfParseError("%s: dynamic symbol table out of file" % self._file)
+			if count is None and strtab > symtab:
+				# Linkers place .dynstr right after .dynsym
+				count = (strtab - symtab) // self._sym.size
+			if count is None:
+				raise ElfParseError("%s: no hash table to count dynamic symbols" % self._file)
+			if DT_VERSYM in tags:
+				versym = self.__vaddr_to_offset(tags[DT_VERSYM])
+			return (symtab, count, strtab, tags.get(DT_STRSZ, len(self._mm) - strtab), versym)
+
+		return None
+
+	def dynamic_symbols(self):
+		"""
+		Return a dict with the imported and exported dynamic symbol names.
+
+		Imports are undefined global or weak symbols, exports are defined global,
+		weak or unique symbols with default or protected visibility. Exports
+		with a hidden (non default) version can not be bound by name only, they
+		are skipped.
+		"""
+		res = {"imports": [], "exports": []}
+		table = self.__dynsym_table()
+		if not table:
+			return res
+
+		symtab, count, strtab, strsz, versym = table
+		if symtab + count * self._sym.size > len(self._mm):
+			raise ElfParseError("%s: dynamic symbol table out of file" % self._file)
+		strings = self._mm[strtab:strtab + strsz]
+		versions = None
+		if versym is not None and versym + count * 2 <= len(self._mm):
+			versions = struct.unpack_from("%s%dH" % (self._endian, count), self._mm, versym)
+
+		if self._class == ELFCLASS64:
+			name_idx, info_idx, other_idx, shndx_idx = (0, 1, 2, 3)
+		else:
+			name_idx, info_idx, other_idx, shndx_idx = (0, 3, 4, 5)
+
+		# Symbol names are almost always ASCII, byte offsets are the same in the decoded text then
+		if strings.isascii():
+			strings = strings.decode("ascii")
+			nul = "\0"
+		else:
+			nul = b"\0"
+
+		imports = res["imports"]
+		exports = res["exports"]
+		data = self._mm[symtab + self._sym.size:symtab + count * self._sym.size]
+		for idx, sym in enumerate(self._sym.iter_unpack(data), 1):
+			info = sym[info_idx]
+			if (info >> 4) not in _EXTERNAL_BINDS or not sym[name_idx]:
+				continue
+			if sym[shndx_idx] != SHN_UNDEF:
+				if (info & 0xf) in (STT_SECTION, STT_FILE):
+					continue
+				if (sym[other_idx] & 0x3) not in (STV_DEFAULT, STV_PROTECTED):
+					continue
+				if versions and (versions[idx] == VER_NDX_LOCAL or versions[idx] & VERSYM_HIDDEN):
+					continue
+
+			start = sym[name_idx]
+			end = strings.find(nul, start)
+			if end < 0:
+				continue
+			name = strings[start:end]
+			if nul != "\0":
+				name = name.decode("utf-8", "replace")
+
+			if sym[shndx_idx] == SHN_UNDEF:
+				imports.append(name)
+			else:
+				exports.append(name)
+		return res
+
+def parse_elf_info(file):
+	"""Parse all metadata deps_guard needs from one ELF file."""
+	with ElfParser(file) as parser:
+		try:
+			info = parser.dynamic_info()
+			info.update(parser.relocation_counts())
+			info.update(parser.section_sizes())
+			info["load_segments"] = parser.load_segments()
+		except struct.error as e:
+			raise ElfParseError("%s: truncated ELF file (%s)" % (file, e))
+	return info
+
+def parse_elf_symbols(file):
+	"""Parse imported and exported dynamic symbols of one ELF file."""
+	with ElfParser(file) as parser:
+		try:
+			return parser.dynamic_symbols()
+		except struct.error as e:
+			raise ElfParseError("%s: truncated ELF file (%s)" % (file, e))
+
+if __name__ == '__main__':
+	import sys
+
+	for f in sys.argv[1:]:
+		print(f, parse_elf_info(f))
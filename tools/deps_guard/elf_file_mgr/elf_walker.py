@@ -20,16 +20,25 @@ import string
 import json
 import sys
 import os
-import struct
+import queue
+import threading
 
 # find out/rk3568/packages/phone/system/ -type f -print | file -f - | grep ELF | cut -d":" -f1 | wc -l
 
+ELF_MAGIC = b"\x7fELF"
+
+ENTRY_ELF = 1
+ENTRY_LINK = 2
+
 class ELFWalker():
+	SUBDIRS = ("packages/phone/system", "packages/phone/vendor")
+
 	def __init__(self, product_out_path="/home/z00325844/demo/archinfo/assets/rk3568/3.2.7.5"):
 		self._files = []
 		self._links = {}
 		self._walked = False
 		self._product_out_path = product_out_path
+		self._queues = None
 
 	def get_product_images_path(self):
 		return os.path.join(self._product_out_path, "packages/phone/")
@@ -37,38 +46,142 @@ class ELFWalker():
 	def get_product_out_path(self):
 		return self._product_out_path
 
-	def __walk_path(self, subdir):
-		for root, subdirs, files in os.walk(os.path.join(self._product_out_path, subdir)):
-			for _filename in files:
-				_assetFile = os.path.join(root, _filename)
-				if os.path.islink(_assetFile):
-					if _assetFile.find(".so") > 0:
-						target = os.readlink(_assetFile)
-						self._links[_assetFile] = target
+	@staticmethod
+	def __is_elf_file(path):
+		try:
+			fd = os.open(path, os.O_RDONLY)
+		except OSError:
+			return False
+		try:
+			return os.read(fd, 4) == ELF_MAGIC
+		except OSError:
+			return False
+		finally:
+			os.close(fd)
+
+	@staticmethod
+	def __walk_path(top, out):
+		# The consumer waits for the None item, send it even if the walk fails
+		try:
+			ELFWalker.__walk_tree(top, out)
+		except BaseException as e:
+			# Raised again in the consumer thread
+			out.put(e)
+		finally:
+			out.put(None)
+
+	@staticmethod
+	def __walk_tree(top, out):
+		# Same order as os.walk top-down: files of a directory first, then its subdirectories
+		stack = [top]
+		while stack:
+			subdirs = []
+			batch = []
+			try:
+				entries = list(os.scandir(stack.pop()))
+			except OSError:
+				continue
+			for entry in entries:
+				try:
+					is_dir = entry.is_dir()
+				except OSError:
+					is_dir = False
+				if is_dir:
+					# Do not follow symbolic links to directories
+					if not entry.is_symlink():
+						subdirs.append(entry.path)
+					continue
+				if entry.is_symlink():
+					if entry.path.find(".so") > 0:
+						try:
+							batch.append((ENTRY_LINK, entry.path, os.readlink(entry.path)))
+						except OSError:
+							pass
 					continue
-				if not os.path.isfile(_assetFile):
+				if not entry.is_file(follow_symlinks=False):
 					continue
-				with open(_assetFile, "rb") as f:
-					data = f.read(4)
-					try:
-						magic = struct.unpack("Bccc", data)
-						if magic[0] == 0x7F and magic[1] == b'E' and magic[2] == b'L' and magic[3] == b'F':
-							self._files.append(_assetFile)
-					except:
-						pass
+				if ELFWalker.__is_elf_file(entry.path):
+					batch.append((ENTRY_ELF, entry.path, None))
+			# One queue item per directory to keep locking overhead low
+			if batch:
+				out.put(batch)
+			stack.extend(reversed(subdirs))
 
+	@staticmethod
+	def is_elf_file(path):
+		return os.path.isfile(path) and not os.path.islink(path) and ELFWalker.__is_elf_file(path)
+
+	def update_link(self, path):
+		"""Update the symbolic link map for a changed path, return True if the map is changed."""
+		target = None
+		if os.path.islink(path) and path.find(".so") > 0:
+			try:
+				target = os.readlink(path)
+			except OSError:
+				pass
+		links = self.get_link_file_map()
+		if links.get(path) == target:
+			return False
+		if target is None:
+			del links[path]
+		else:
+			links[path] = target
+		return True
+
+	def __start(self):
+		# Walk each subtree in its own thread, results are consumed in SUBDIRS order
+		self._queues = []
+		for subdir in ELFWalker.SUBDIRS:
+			q = queue.Queue()
+			t = threading.Thread(target=ELFWalker.__walk_path, args=(os.path.join(self._product_out_path, subdir), q))
+			t.daemon = True
+			t.start()
+			self._queues.append(q)
+
+	def __next_elf_file(self):
+		if self._queues is None:
+			self.__start()
+		while self._queues:
+			batch = self._queues[0].get()
+			if batch is None:
+				self._queues.pop(0)
+				continue
+			if isinstance(batch, BaseException):
+				# Its None item is dropped with the queue
+				self._queues.pop(0)
+				raise batch
+			got = False
+			for kind, path, target in batch:
+				if kind == ENTRY_LINK:
+					self._links[path] = target
+				else:
+					self._files.append(path)
+					got = True
+			if got:
+				return True
 		self._walked = True
+		return False
+
+	def iter_elf_files(self):
+		"""Yield ELF files while the walk is still in progress."""
+		idx = 0
+		while True:
+			while idx < len(self._files):
+				yield self._files[idx]
+				idx = idx + 1
+			if self._walked or not self.__next_elf_file():
+				return
+
+	def __walk_all(self):
+		while not self._walked and self.__next_elf_file():
+			pass
 
 	def get_link_file_map(self):
-		if not self._walked:
-			self.__walk_path("packages/phone/system")
-			self.__walk_path("packages/phone/vendor")
+		self.__walk_all()
 		return self._links
 
 	def get_elf_files(self):
-		if not self._walked:
-			self.__walk_path("packages/phone/system")
-			self.__walk_path("packages/phone/vendor")
+		self.__walk_all()
 		return self._files
 
 if __name__ == '__main__':
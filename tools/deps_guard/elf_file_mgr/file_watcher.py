@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import sys
+import stat
+import errno
+import struct
+import ctypes
+import ctypes.util
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+def _walk_dirs(top):
+	# Symbolic links to directories are not followed, the same as ELFWalker
+	for root, dirs, files in os.walk(top):
+		yield root
+
+def _walk_files(top):
+	for root, dirs, files in os.walk(top):
+		for name in files:
+			yield os.path.join(root, name)
+
+class InotifyWatcher(object):
+	"""
+	Watch directories with Linux inotify through ctypes.
+
+	roots is a list of (directory, recursive). read_changes() returns the set
+	of changed file paths, or None if events were lost and everything must be
+	scanned again.
+	"""
+	def __init__(self, roots):
+		if not sys.platform.startswith("linux"):
+			raise OSError(errno.ENOSYS, "inotify is only available on Linux")
+		self._libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+		self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+		if self._fd < 0:
+			err = ctypes.get_errno()
+			raise OSError(err, os.strerror(err))
+		self._wds = {}
+		for root, recursive in roots:
+			if not os.path.isdir(root):
+				continue
+			if recursive:
+				for d in _walk_dirs(root):
+					self.__add_watch(d, True)
+			else:
+				self.__add_watch(root, False)
+
+	def __add_watch(self, path, recursive):
+		wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+		if wd < 0:
+			err = ctypes.get_errno()
+			raise OSError(err, "%s: %s" % (path, os.strerror(err)))
+		self._wds[wd] = (path, recursive)
+
+	def fileno(self):
+		return self._fd
+
+	def read_changes(self):
+		changes = set()
+		while True:
+			try:
+				data = os.read(self._fd, 64 * 1024)
+			except BlockingIOError:
+				break
+			if not data:
+				break
+
+			offset = 0
+			while offset + EVENT_HEADER.size <= len(data):
+				wd, mask, cookie, size = EVENT_HEADER.unpack_from(data, offset)
+				name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + size].rstrip(b"\0")
+				offset += EVENT_HEADER.size + size
+
+				if mask & IN_Q_OVERFLOW:
+					return None
+				if wd not in self._wds:
+					continue
+				path, recursive = self._wds[wd]
+				if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+					# Files under a directory moved away are not reported one by one
+					del self._wds[wd]
+					return None
+				full_name = os.path.join(path, os.fsdecode(name))
+				if mask & IN_ISDIR:
+					if mask & IN_MOVED_FROM:
+						return None
+					if recursive and mask & (IN_CREATE | IN_MOVED_TO):
+						# Files may be created before the new directory is watched
+						for d in _walk_dirs(full_name):
+							self.__add_watch(d, True)
+						changes.update(_walk_files(full_name))
+					continue
+				changes.add(full_name)
+		return changes
+
+	def close(self):
+		if self._fd >= 0:
+			os.close(self._fd)
+			self._fd = -1
+
+class PollingWatcher(object):
+	"""Watch directories by comparing stat results of all files at each read_changes() call."""
+	def __init__(self, roots):
+		self._roots = roots
+		self._files = self.__scan()
+
+	def __scan(self):
+		files = {}
+		for root, recursive in self._roots:
+			stack = [root]
+			while stack:
+				try:
+					entries = list(os.scandir(stack.pop()))
+				except OSError:
+					continue
+				for entry in entries:
+					try:
+						st = entry.stat(follow_symlinks=False)
+					except OSError:
+						continue
+					if stat.S_ISDIR(st.st_mode):
+						if recursive:
+							stack.append(entry.path)
+						continue
+					files[entry.path] = (st.st_ino, st.st_size, st.st_mtime_ns, st.st_mode)
+		return files
+
+	def fileno(self):
+		return None
+
+	def read_changes(self):
+		files = self.__scan()
+		changes = set([f for f, st in files.items() if self._files.get(f) != st])
+		changes.update([f for f in self._files if f not in files])
+		self._files = files
+		return changes
+
+	def close(self):
+		pass
+
+def create_file_watcher(roots, polling=False):
+	"""Return an inotify watcher, or a polling watcher if inotify is not available or polling is True."""
+	if not polling:
+		try:
+			return InotifyWatcher(roots)
+		except (OSError, AttributeError) as e:
+			print("inotify is not available (%s), polling for changes" % str(e))
+	return PollingWatcher(roots)
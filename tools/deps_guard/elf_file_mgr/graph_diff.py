@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from .graph_snapshot import SNAPSHOT_MODULE_KEYS, SNAPSHOT_DEP_KEYS
+
+# Classification changes listed in the report
+CLASSIFY_KEYS = ("modGroup", "platformsdk", "chipsetsdk")
+
+class GraphDiff(object):
+	"""
+	Differences between two graph snapshots of the same product.
+
+	Modules are matched by path, dependencies by (caller path, callee path).
+	Attributes of modules and dependencies in both graphs are compared.
+	"""
+	def __init__(self, old, new):
+		old_modules = old["modules"]
+		new_modules = new["modules"]
+
+		self._added_modules = sorted([p for p in new_modules if p not in old_modules])
+		self._removed_modules = sorted([p for p in old_modules if p not in new_modules])
+
+		old_deps = dict([((caller, callee), attrs) for caller, callee, attrs in old["deps"]])
+		new_deps = dict([((caller, callee), attrs) for caller, callee, attrs in new["deps"]])
+		self._added_deps = sorted([dep for dep in new_deps if dep not in old_deps])
+		self._removed_deps = sorted([dep for dep in old_deps if dep not in new_deps])
+
+		# {(caller, callee): {key: (old value, new value)}} of dependencies in both graphs
+		self._changed_deps = {}
+		for dep, attrs in new_deps.items():
+			if dep not in old_deps:
+				continue
+			old_attrs = old_deps[dep]
+			changes = {}
+			for k in SNAPSHOT_DEP_KEYS:
+				if old_attrs.get(k) != attrs.get(k):
+					changes[k] = (old_attrs.get(k), attrs.get(k))
+			if changes:
+				self._changed_deps[dep] = changes
+
+		# {path: {key: (old value, new value)}} of modules in both graphs
+		self._changed_modules = {}
+		for path, mod in new_modules.items():
+			if path not in old_modules:
+				continue
+			old_mod = old_modules[path]
+			changes = {}
+			for k in SNAPSHOT_MODULE_KEYS:
+				if old_mod.get(k) != mod.get(k):
+					changes[k] = (old_mod.get(k), mod.get(k))
+			if changes:
+				self._changed_modules[path] = changes
+
+	def get_added_modules(self):
+		return self._added_modules
+
+	def get_removed_modules(self):
+		return self._removed_modules
+
+	def get_added_deps(self):
+		return self._added_deps
+
+	def get_removed_deps(self):
+		return self._removed_deps
+
+	def get_changed_modules(self):
+		return self._changed_modules
+
+	def get_changed_deps(self):
+		return self._changed_deps
+
+	def get_classification_changes(self):
+		"""Return [(path, key, old value, new value)] of CLASSIFY_KEYS changes."""
+		res = []
+		for path in sorted(self._changed_modules.keys()):
+			changes = self._changed_modules[path]
+			for k in CLASSIFY_KEYS:
+				if k in changes:
+					res.append((path, k, changes[k][0], changes[k][1]))
+		return res
+
+	def is_empty(self):
+		return not (self._added_modules or self._removed_modules or self._added_deps or self._removed_deps or
+			self._changed_modules or self._changed_deps)
+
+	def get_affected_paths(self):
+		"""
+		Paths of modules in the new graph that rules have to check again.
+
+		These are added and changed modules, both ends of added or removed
+		dependencies, and callers of dependencies with changed attributes.
+		"""
+		res = set(self._added_modules)
+		res.update(self._changed_modules.keys())
+		res.update([caller for caller, callee in self._changed_deps])
+		for caller, callee in self._added_deps + self._removed_deps:
+			res.add(caller)
+			res.add(callee)
+		res.difference_update(self._removed_modules)
+		return res
+
+	def to_json(self):
+		return {
+			"added_modules": self._added_modules,
+			"removed_modules": self._removed_modules,
+			"added_deps": [list(dep) for dep in self._added_deps],
+			"removed_deps": [list(dep) for dep in self._removed_deps],
+			"changed_deps": [[caller, callee, dict([(k, list(v)) for k, v in changes.items()])]
+				for (caller, callee), changes in sorted(self._changed_deps.items())],
+			"classification_changes": [list(item) for item in self.get_classification_changes()]
+		}
+
+	def print_report(self):
+		for path in self._added_modules:
+			print("  added module %s" % path)
+		for path in self._removed_modules:
+			print("  removed module %s" % path)
+		for caller, callee in self._added_deps:
+			print("  added dependence %s -> %s" % (caller, callee))
+		for caller, callee in self._removed_deps:
+			print("  removed dependence %s -> %s" % (caller, callee))
+		for (caller, callee), changes in sorted(self._changed_deps.items()):
+			for k in SNAPSHOT_DEP_KEYS:
+				if k in changes:
+					print("  dependence %s -> %s %s changed from %s to %s" % (caller, callee, k, changes[k][0], changes[k][1]))
+		for path, k, old, new in self.get_classification_changes():
+			print("  %s %s changed from %s to %s" % (path, k, old, new))
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+from xml.sax.saxutils import escape
+
+GRAPH_EXPORT_FORMATS = ("dot", "graphml", "jsonl")
+
+# Exported attributes and their GraphML types
+NODE_ATTRS = (("name", "string"), ("path", "string"), ("type", "string"), ("componentName", "string"),
+	("subsystem", "string"), ("modGroup", "string"), ("labelPath", "string"), ("chipsetsdk", "boolean"),
+	("platformsdk", "boolean"), ("innerapi", "boolean"), ("napi", "boolean"), ("chipset", "boolean"),
+	("sa_id", "int"), ("hdiType", "string"))
+EDGE_ATTRS = (("external", "boolean"), ("platformsdk", "boolean"), ("chipsetsdk", "boolean"), ("calls", "int"))
+
+# Filter keys and the module attribute each of them matches
+FILTER_KEYS = {"component": "componentName", "subsystem": "subsystem", "modGroup": "modGroup"}
+
+def get_export_format(file, fmt=None):
+	"""Format given explicitly, or guessed from the file extension."""
+	if fmt:
+		return fmt
+	ext = os.path.splitext(file)[1].lstrip(".").lower()
+	if ext in ("dot", "gv"):
+		return "dot"
+	if ext in ("graphml", "xml"):
+		return "graphml"
+	return "jsonl"
+
+class GraphFilter(object):
+	"""
+	Select modules to export.
+
+	Values of the same key match any of them, different keys must all match.
+	around() keeps only modules within depth dependencies of the given
+	modules in both directions. Dependencies are exported if both ends are.
+	"""
+	def __init__(self):
+		self._attrs = {}
+		self._ids = None
+
+	def add(self, key, value):
+		if key not in FILTER_KEYS:
+			raise ValueError("unknown filter key %s, use one of %s" % (key, ", ".join(sorted(FILTER_KEYS))))
+		self._attrs.setdefault(FILTER_KEYS[key], set()).add(value)
+
+	def add_expr(self, expr):
+		"""Add a filter written as key=value."""
+		key, sep, value = expr.partition("=")
+		if not sep:
+			raise ValueError("filter %s is not in key=value format" % expr)
+		self.add(key.strip(), value.strip())
+
+	def around(self, modules, depth=1):
+		# Only the subgraph is kept in memory, not the whole image
+		ids = set([mod["id"] for mod in modules])
+		front = list(modules)
+		for i in range(depth):
+			next_front = []
+			for mod in front:
+				for dep in mod["deps"]:
+					if dep["callee"]["id"] not in ids:
+						ids.add(dep["callee"]["id"])
+						next_front.append(dep["callee"])
+				for dep in mod["dependedBy"]:
+					if dep["caller"]["id"] not in ids:
+						ids.add(dep["caller"]["id"])
+						next_front.append(dep["caller"])
+			front = next_front
+		self._ids = ids if self._ids is None else self._ids & ids
+
+	def match(self, mod):
+		if self._ids is not None and mod["id"] not in self._ids:
+			return False
+		for key, values in self._attrs.items():
+			if mod.get(key) not in values:
+				return False
+		return True
+
+def _iter_graph(mgr, graph_filter):
+	"""Yield ("node", module) for selected modules, then ("edge", dep) for dependencies between them."""
+	match = graph_filter.match if graph_filter else (lambda mod: True)
+	for elf in mgr.get_all():
+		if match(elf):
+			yield ("node", elf)
+	for elf in mgr.get_all():
+		if not match(elf):
+			continue
+		for dep in elf["deps"]:
+			if match(dep["callee"]):
+				yield ("edge", dep)
+
+def _attr_values(obj, attrs):
+	return [(k, obj[k]) for k, t in attrs if obj.get(k) is not None]
+
+def _dot_value(val):
+	if isinstance(val, bool):
+		return "true" if val else "false"
+	if isinstance(val, int):
+		return str(val)
+	return '"%s"' % str(val).replace("\\", "\\\\").replace('"', '\\"')
+
+def _graphml_value(val):
+	if isinstance(val, bool):
+		return "true" if val else "false"
+	return escape(str(val))
+
+def export_dot(mgr, f, graph_filter=None):
+	f.write("digraph deps_guard {\n")
+	for kind, item in _iter_graph(mgr, graph_filter):
+		if kind == "node":
+			attrs = [("label", item["name"])] + _attr_values(item, NODE_ATTRS)
+			f.write('  n%d [%s];\n' % (item["id"], ", ".join(["%s=%s" % (k, _dot_value(v)) for k, v in attrs])))
+		else:
+			attrs = _attr_values(item, EDGE_ATTRS)
+			f.write('  n%d -> n%d [%s];\n' % (item["caller"]["id"], item["callee"]["id"], ", ".join(["%s=%s" % (k, _dot_value(v)) for k, v in attrs])))
+	f.write("}\n")
+
+def export_graphml(mgr, f, graph_filter=None):
+	f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+	f.write('<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n')
+	for k, t in NODE_ATTRS:
+		f.write('  <key id="n_%s" for="node" attr.name="%s" attr.type="%s"/>\n' % (k, k, t))
+	for k, t in EDGE_ATTRS:
+		f.write('  <key id="e_%s" for="edge" attr.name="%s" attr.type="%s"/>\n' % (k, k, t))
+	f.write('  <graph id="deps_guard" edgedefault="directed">\n')
+	for kind, item in _iter_graph(mgr, graph_filter):
+		if kind == "node":
+			f.write('    <node id="n%d">' % item["id"])
+			for k, v in _attr_values(item, NODE_ATTRS):
+				f.write('<data key="n_%s">%s</data>' % (k, _graphml_value(v)))
+			f.write('</node>\n')
+		else:
+			f.write('    <edge id="e%d" source="n%d" target="n%d">' % (item["id"], item["caller"]["id"], item["callee"]["id"]))
+			for k, v in _attr_values(item, EDGE_ATTRS):
+				f.write('<data key="e_%s">%s</data>' % (k, _graphml_value(v)))
+			f.write('</edge>\n')
+	f.write('  </graph>\n')
+	f.write('</graphml>\n')
+
+def export_jsonl(mgr, f, graph_filter=None):
+	for kind, item in _iter_graph(mgr, graph_filter):
+		if kind == "node":
+			obj = dict([("kind", "node"), ("id", item["id"])] + _attr_values(item, NODE_ATTRS))
+		else:
+			obj = dict([("kind", "edge"), ("id", item["id"]), ("source", item["caller"]["id"]), ("target", item["callee"]["id"])] + _attr_values(item, EDGE_ATTRS))
+		f.write(json.dumps(obj))
+		f.write("\n")
+
+EXPORTERS = {"dot": export_dot, "graphml": export_graphml, "jsonl": export_jsonl}
+
+def export_graph(mgr, file, fmt=None, graph_filter=None):
+	"""
+	Stream modules and dependencies of mgr to file as DOT, GraphML or JSON Lines.
+
+	Lines are written while walking the graph, nothing is collected, so
+	memory use does not grow with the image size.
+	"""
+	fmt = get_export_format(file, fmt)
+	if fmt not in EXPORTERS:
+		raise ValueError("unknown export format %s, use one of %s" % (fmt, ", ".join(GRAPH_EXPORT_FORMATS)))
+	# GraphML declares UTF-8, the other formats use it as well
+	with open(file, "w", encoding="utf-8") as f:
+		EXPORTERS[fmt](mgr, f, graph_filter)
+	return fmt
+
+if __name__ == '__main__':
+	import sys
+
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	from elf_file_mgr import ElfFileMgr
+
+	# Example: python elf_file_mgr/graph_export.py <product out path> <output file> [module path]
+	mgr = ElfFileMgr(sys.argv[1])
+	mgr.scan_all_files()
+	graph_filter = None
+	if len(sys.argv) > 3:
+		graph_filter = GraphFilter()
+		graph_filter.around([mgr.get_elf_by_path(sys.argv[3])], 2)
+	print("Exported as %s" % export_graph(mgr, sys.argv[2], None, graph_filter))
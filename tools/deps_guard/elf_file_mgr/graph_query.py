@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from collections import deque
+
+def _bits_to_list(bits):
+	res = []
+	pos = 0
+	for c in reversed(bin(bits)[2:]):
+		if c == "1":
+			res.append(pos)
+		pos = pos + 1
+	return res
+
+def _postorder(succ):
+	"""Iterative DFS post order of all nodes, and the longest path length from each node."""
+	n = len(succ)
+	order = []
+	depth = [0] * n
+	state = [0] * n # 0: new, 1: on stack, 2: done
+	for root in range(n):
+		if state[root]:
+			continue
+		state[root] = 1
+		stack = [(root, 0)]
+		while stack:
+			v, i = stack[-1]
+			if i < len(succ[v]):
+				stack[-1] = (v, i + 1)
+				w = succ[v][i]
+				if not state[w]:
+					state[w] = 1
+					stack.append((w, 0))
+				continue
+			stack.pop()
+			state[v] = 2
+			# Edges back to nodes still on the stack are part of a cycle, skip them
+			d = 0
+			for w in succ[v]:
+				if state[w] == 2 and depth[w] + 1 > d:
+					d = depth[w] + 1
+			depth[v] = d
+			order.append(v)
+	return (order, depth)
+
+def _reach_bitsets(succ, order):
+	"""
+	Reachability of each node as a bitset indexed by post order position.
+
+	Post order numbering keeps libraries at low bit positions, so most
+	bitsets stay small. Cycles are handled by iterating to a fixed point,
+	one extra pass confirms the result on acyclic graphs.
+	"""
+	pos = [0] * len(succ)
+	for idx, v in enumerate(order):
+		pos[v] = idx
+
+	reach = [0] * len(succ)
+	changed = True
+	while changed:
+		changed = False
+		for v in order:
+			bits = reach[v]
+			for w in succ[v]:
+				bits |= reach[w] | (1 << pos[w])
+			if bits != reach[v]:
+				reach[v] = bits
+				changed = True
+	return reach
+
+class DepsGraphQuery(object):
+	"""
+	Transitive queries over the dependency graph of an ElfFileMgr or CompactGraph.
+
+	Modules are passed and returned as the graph's own module objects.
+	"""
+	def __init__(self, mgr):
+		self._mgr = mgr
+		elfs = mgr.get_all()
+		self._succ = []
+		self._pred = [[] for elf in elfs]
+		for elf in elfs:
+			callees = []
+			for dep in elf["deps"]:
+				callee = dep["callee_id"] - 1
+				if callee not in callees:
+					callees.append(callee)
+					self._pred[callee].append(elf["id"] - 1)
+			self._succ.append(callees)
+
+		self._order, self._depth = _postorder(self._succ)
+		self._pos = [0] * len(self._order)
+		for idx, v in enumerate(self._order):
+			self._pos[v] = idx
+		self._reach = None
+		self._rorder = None
+		self._rreach = None
+
+	def __forward(self):
+		if self._reach is None:
+			self._reach = _reach_bitsets(self._succ, self._order)
+		return self._reach
+
+	def __backward(self):
+		if self._rreach is None:
+			self._rorder = _postorder(self._pred)[0]
+			self._rreach = _reach_bitsets(self._pred, self._rorder)
+		return self._rreach
+
+	def __to_elfs(self, bits, order, predicate):
+		res = [order[p] for p in _bits_to_list(bits)]
+		res.sort()
+		res = [self._mgr.get_elf_by_idx(idx + 1) for idx in res]
+		if predicate:
+			res = [elf for elf in res if predicate(elf)]
+		return res
+
+	def transitive_deps(self, mod, predicate=None):
+		"""All modules mod loads directly or indirectly, optionally filtered by predicate."""
+		return self.__to_elfs(self.__forward()[mod["id"] - 1], self._order, predicate)
+
+	def transitive_depended_by(self, mod, predicate=None):
+		"""All modules that load mod directly or indirectly."""
+		return self.__to_elfs(self.__backward()[mod["id"] - 1], self._rorder, predicate)
+
+	def depends_on(self, caller, callee):
+		return bool((self.__forward()[caller["id"] - 1] >> self._pos[callee["id"] - 1]) & 1)
+
+	def total_depends(self, mod):
+		return bin(self.__forward()[mod["id"] - 1]).count("1")
+
+	def fan_in(self, mod):
+		return bin(self.__backward()[mod["id"] - 1]).count("1")
+
+	def depth(self, mod):
+		"""Length of the longest dependency chain starting from mod."""
+		return self._depth[mod["id"] - 1]
+
+	def max_depth(self):
+		return max(self._depth) if self._depth else 0
+
+	def max_total_depends(self):
+		reach = self.__forward()
+		return max([bin(bits).count("1") for bits in reach]) if reach else 0
+
+	def shortest_path(self, caller, callee):
+		"""Shortest dependency chain from caller to callee as a list of modules, None if not reachable."""
+		src = caller["id"] - 1
+		dst = callee["id"] - 1
+		prev = {src: None}
+		queue = deque([src])
+		while queue:
+			v = queue.popleft()
+			if v == dst:
+				path = []
+				while v is not None:
+					path.append(self._mgr.get_elf_by_idx(v + 1))
+					v = prev[v]
+				path.reverse()
+				return path
+			for w in self._succ[v]:
+				if w not in prev:
+					prev[w] = v
+					queue.append(w)
+		return None
+
+if __name__ == '__main__':
+	import os
+	import sys
+
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+	from elf_file_mgr import ElfFileMgr
+
+	# Example: python elf_file_mgr/graph_query.py <product out path> <module path>
+	mgr = ElfFileMgr(sys.argv[1])
+	mgr.scan_all_files()
+	query = mgr.get_query()
+	mod = mgr.get_elf_by_path(sys.argv[2])
+	print("%s: depth %d, total depends %d, fan in %d" % (mod["name"], query.depth(mod), query.total_depends(mod), query.fan_in(mod)))
+	for elf in query.transitive_deps(mod, lambda elf: elf["path"].startswith("system/")):
+		print("    " + " -> ".join([item["name"] for item in query.shortest_path(mod, elf)]))
+	print("max depth %d, max total depends %d" % (mgr.get_max_depth(), mgr.get_max_total_depends()))
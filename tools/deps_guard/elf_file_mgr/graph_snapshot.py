@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+
+SNAPSHOT_VERSION = 1
+GRAPH_SNAPSHOT_NAME = "deps_guard_graph.json"
+
+# Module attributes kept in the snapshot, rules only look at these
+SNAPSHOT_MODULE_KEYS = ("name", "type", "componentName", "subsystem", "labelPath", "modGroup",
+	"platformsdk", "chipsetsdk", "innerapi", "napi", "chipset", "sa_id", "hdiType",
+	"shlib_type", "innerapi_tags", "version_script")
+
+SNAPSHOT_DEP_KEYS = ("external", "platformsdk", "chipsetsdk")
+
+def create_graph_snapshot(mgr):
+	"""
+	Plain JSON compatible copy of the dependency graph.
+
+	Modules are keyed by path, dependencies are [caller path, callee path, attributes].
+	"""
+	modules = {}
+	for elf in mgr.get_all():
+		modules[elf["path"]] = dict([(k, elf[k]) for k in SNAPSHOT_MODULE_KEYS if k in elf])
+
+	deps = []
+	for dep in mgr.get_all_deps():
+		attrs = dict([(k, dep[k]) for k in SNAPSHOT_DEP_KEYS if k in dep])
+		deps.append([dep["caller"]["path"], dep["callee"]["path"], attrs])
+
+	return {"version": SNAPSHOT_VERSION, "modules": modules, "deps": deps}
+
+def save_graph_snapshot(snapshot, product_out_path):
+	snapshot_file = os.path.join(product_out_path, GRAPH_SNAPSHOT_NAME)
+	try:
+		with open(snapshot_file, "w") as f:
+			json.dump(snapshot, f)
+	except:
+		print("Failed to save dependency graph to %s" % snapshot_file)
+		return None
+	return snapshot_file
+
+def load_graph_snapshot(path):
+	"""
+	Load the snapshot from a file, or from the GRAPH_SNAPSHOT_NAME file in a product out directory.
+
+	Return None if there is no valid snapshot.
+	"""
+	if os.path.isdir(path):
+		path = os.path.join(path, GRAPH_SNAPSHOT_NAME)
+	try:
+		with open(path) as f:
+			snapshot = json.load(f)
+	except:
+		return None
+
+	if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+		return None
+	return snapshot
@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import re
+import json
+import time
+import sqlite3
+import pathlib
+
+# Bump this when the schema changes
+GRAPH_STORE_VERSION = 1
+GRAPH_STORE_NAME = "deps_guard_graph.db"
+
+MODULE_COLUMNS = ("path", "name", "type", "size", "subsystem", "componentName", "moduleName", "labelPath",
+	"modGroup", "third_party", "chipset", "napi", "sa_id", "innerapi", "innerapi_declared", "innerapi_tags",
+	"platformsdk", "chipsetsdk", "hdiType", "shlib_type", "version_script")
+
+DEP_COLUMNS = ("caller_id", "callee_id", "external", "platformsdk", "chipsetsdk", "calls")
+
+# Edge attributes that can be queried with get_edges()
+DEP_FLAGS = ("external", "platformsdk", "chipsetsdk")
+
+SCHEMA = (
+	"CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)",
+	"CREATE TABLE modules (id INTEGER PRIMARY KEY, %s)" % ", ".join(MODULE_COLUMNS),
+	"CREATE TABLE deps (id INTEGER PRIMARY KEY, %s)" % ", ".join(DEP_COLUMNS),
+	"CREATE TABLE symbols (id INTEGER PRIMARY KEY, name TEXT)",
+	"CREATE TABLE module_symbols (module_id INTEGER, symbol_id INTEGER, export INTEGER)",
+	"CREATE TABLE dep_symbols (dep_id INTEGER, symbol_id INTEGER)",
+	"CREATE TABLE rules (name TEXT PRIMARY KEY, passed INTEGER, help_url TEXT)",
+	"CREATE TABLE findings (rule TEXT, seq INTEGER, message TEXT)",
+	"CREATE UNIQUE INDEX modules_path ON modules (path)",
+	"CREATE INDEX modules_name ON modules (name)",
+	"CREATE INDEX modules_component ON modules (componentName)",
+	"CREATE INDEX deps_caller ON deps (caller_id)",
+	"CREATE INDEX deps_callee ON deps (callee_id)",
+	"CREATE INDEX symbols_name ON symbols (name)",
+	"CREATE INDEX module_symbols_symbol ON module_symbols (symbol_id)",
+	"CREATE INDEX dep_symbols_dep ON dep_symbols (dep_id)",
+	"CREATE INDEX findings_rule ON findings (rule)"
+)
+
+_COLOR_RE = re.compile("\x1b\\[[0-9;]*m")
+
+def _column_value(val):
+	if isinstance(val, (list, tuple, dict)):
+		return json.dumps(val)
+	return val
+
+def save_graph_store(mgr, db_file):
+	"""
+	Save modules, dependencies and dynamic symbols of mgr to a new sqlite file.
+
+	The file is written aside and renamed, readers never see a partial store.
+	Module and dependency ids are the same as in mgr. Symbols are saved only
+	if they are loaded by scan_all_files(symbols=True).
+	"""
+	tmp_file = "%s.%d.tmp" % (db_file, os.getpid())
+	if os.path.exists(tmp_file):
+		os.unlink(tmp_file)
+	conn = sqlite3.connect(tmp_file)
+	try:
+		for sql in SCHEMA:
+			conn.execute(sql)
+		conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+			("version", str(GRAPH_STORE_VERSION)),
+			("product_out_path", mgr.get_product_out_path()),
+			("created", str(int(time.time())))
+		])
+
+		conn.executemany("INSERT INTO modules VALUES (?, %s)" % ", ".join(["?"] * len(MODULE_COLUMNS)),
+			[[elf["id"]] + [_column_value(elf.get(k)) for k in MODULE_COLUMNS] for elf in mgr.get_all()])
+		conn.executemany("INSERT INTO deps VALUES (?, %s)" % ", ".join(["?"] * len(DEP_COLUMNS)),
+			[[dep["id"]] + [dep.get(k) for k in DEP_COLUMNS] for dep in mgr.get_all_deps()])
+
+		symbols = mgr.get_symbol_table()
+		if symbols:
+			conn.executemany("INSERT INTO symbols VALUES (?, ?)", enumerate(symbols.get_names(range(len(symbols)))))
+			for elf in mgr.get_all():
+				conn.executemany("INSERT INTO module_symbols VALUES (?, ?, 0)", [(elf["id"], sym) for sym in elf.get_imports() or []])
+				conn.executemany("INSERT INTO module_symbols VALUES (?, ?, 1)", [(elf["id"], sym) for sym in elf.get_exports() or []])
+			for dep in mgr.get_all_deps():
+				conn.executemany("INSERT INTO dep_symbols VALUES (?, ?)", [(dep["id"], sym) for sym in mgr.get_dep_symbol_ids(dep)])
+		conn.commit()
+	finally:
+		conn.close()
+	os.replace(tmp_file, db_file)
+	return db_file
+
+def save_rule_findings(db_file, results):
+	"""Replace rule results in the store with results of evaluate_rules() or check_all_rules()."""
+	conn = sqlite3.connect(db_file)
+	try:
+		conn.execute("DELETE FROM rules")
+		conn.execute("DELETE FROM findings")
+		for res in results:
+			conn.execute("INSERT INTO rules VALUES (?, ?, ?)", (res["name"], res["passed"], res["help_url"]))
+			# The first message is the "Do xxx rule checking now:" title
+			conn.executemany("INSERT INTO findings VALUES (?, ?, ?)",
+				[(res["name"], seq, _COLOR_RE.sub("", msg)) for seq, msg in enumerate(res["messages"][1:])])
+		conn.commit()
+	finally:
+		conn.close()
+
+class GraphStore(object):
+	"""
+	Read only queries on a store saved by save_graph_store().
+
+	Modules are returned as dicts of the modules table, dependencies as
+	dicts with "caller" and "callee" module dicts.
+	"""
+	def __init__(self, db_file):
+		if not os.path.isfile(db_file):
+			raise ValueError("%s does not exist" % db_file)
+		# Quote ?, # and % of the path in the URI
+		uri = pathlib.Path(os.path.abspath(db_file)).as_uri() + "?mode=ro"
+		self._conn = sqlite3.connect(uri, uri=True)
+		self._conn.row_factory = sqlite3.Row
+		try:
+			row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+		except sqlite3.DatabaseError:
+			row = None
+		if not row or row[0] != str(GRAPH_STORE_VERSION):
+			self._conn.close()
+			raise ValueError("%s is not a dependency graph store of version %d" % (db_file, GRAPH_STORE_VERSION))
+
+	def get_meta(self, key):
+		row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key, )).fetchone()
+		return row[0] if row else None
+
+	def execute(self, sql, params=()):
+		return [dict(row) for row in self._conn.execute(sql, params)]
+
+	def find_modules(self, name):
+		"""Modules with the file name or the path under the images directory."""
+		return self.execute("SELECT * FROM modules WHERE name = ? OR path = ? ORDER BY id", (name, name))
+
+	def __related(self, modules, transitive, column, other):
+		ids = [mod["id"] for mod in modules]
+		if not ids:
+			return []
+		marks = ", ".join(["?"] * len(ids))
+		if not transitive:
+			sql = "SELECT DISTINCT m.* FROM deps d JOIN modules m ON m.id = d.%s WHERE d.%s IN (%s) ORDER BY m.id" % (other, column, marks)
+			return self.execute(sql, ids)
+		sql = ("WITH RECURSIVE related(id) AS (SELECT %s FROM deps WHERE %s IN (%s) "
+			"UNION SELECT d.%s FROM deps d JOIN related r ON d.%s = r.id) "
+			"SELECT m.* FROM modules m JOIN related r ON m.id = r.id ORDER BY m.id") % (other, column, marks, other, column)
+		return self.execute(sql, ids)
+
+	def get_depended_by(self, modules, transitive=False):
+		"""Modules depending on any of modules, directly or transitively."""
+		return self.__related(modules, transitive, "callee_id", "caller_id")
+
+	def get_deps(self, modules, transitive=False):
+		"""Modules depended on by any of modules, directly or transitively."""
+		return self.__related(modules, transitive, "caller_id", "callee_id")
+
+	def get_edges(self, flags):
+		"""Dependencies having all attributes in flags set, such as ("chipsetsdk", )."""
+		for flag in flags:
+			if flag not in DEP_FLAGS:
+				raise ValueError("unknown dependency attribute %s" % flag)
+		where = " AND ".join(["d.%s" % flag for flag in flags]) or "1"
+		rows = self._conn.execute("SELECT d.*, %s, %s FROM deps d JOIN modules a ON a.id = d.caller_id JOIN modules b ON b.id = d.callee_id WHERE %s ORDER BY d.id"
+			% (", ".join(["a.%s AS caller_%s" % (k, k) for k in MODULE_COLUMNS]), ", ".join(["b.%s AS callee_%s" % (k, k) for k in MODULE_COLUMNS]), where))
+		res = []
+		for row in rows:
+			row = dict(row)
+			dep = dict([(k, row[k]) for k in ("id", ) + DEP_COLUMNS])
+			dep["caller"] = dict([(k, row["caller_%s" % k]) for k in MODULE_COLUMNS])
+			dep["callee"] = dict([(k, row["callee_%s" % k]) for k in MODULE_COLUMNS])
+			res.append(dep)
+		return res
+
+	def get_components_by_fan_in(self, limit=None):
+		"""
+		Components ordered by the number of other components depending on them.
+
+		Return dicts of componentName, fan_in, edges and modules.
+		"""
+		sql = ("SELECT b.componentName AS componentName, COUNT(DISTINCT a.componentName) AS fan_in, COUNT(*) AS edges, "
+			"COUNT(DISTINCT b.id) AS modules FROM deps d JOIN modules a ON a.id = d.caller_id JOIN modules b ON b.id = d.callee_id "
+			"WHERE a.componentName != b.componentName GROUP BY b.componentName ORDER BY fan_in DESC, edges DESC, componentName")
+		if limit:
+			return self.execute(sql + " LIMIT ?", (limit, ))
+		return self.execute(sql)
+
+	def get_symbol_modules(self, name):
+		"""Modules exporting and importing the symbol, as (exporters, importers)."""
+		sql = "SELECT m.* FROM symbols s JOIN module_symbols ms ON ms.symbol_id = s.id JOIN modules m ON m.id = ms.module_id WHERE s.name = ? AND ms.export = ? ORDER BY m.id"
+		return (self.execute(sql, (name, 1)), self.execute(sql, (name, 0)))
+
+	def get_rules(self):
+		return self.execute("SELECT * FROM rules")
+
+	def get_findings(self, rule=None):
+		if rule:
+			return self.execute("SELECT * FROM findings WHERE rule = ? ORDER BY seq", (rule, ))
+		return self.execute("SELECT * FROM findings ORDER BY rule, seq")
+
+	def close(self):
+		self._conn.close()
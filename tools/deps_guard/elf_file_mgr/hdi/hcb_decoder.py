@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import struct
+
+HCB_MAGIC = 0xA00AA00A
+HCB_HEADER_SIZE = 20
+
+# Opcodes written by hc-gen
+HCS_NODE = 0x01
+HCS_TERM = 0x02
+HCS_NODEREF = 0x03
+HCS_ARRAY = 0x04
+HCS_BYTE = 0x10
+HCS_WORD = 0x11
+HCS_DWORD = 0x12
+HCS_QWORD = 0x13
+HCS_STRING = 0x14
+
+class HcbDecoder(object):
+	"""
+	Decoder of the hdf_default.hcb binary written by hc-gen.
+
+	The file is a 20 bytes header: magic, major and minor version, checksum
+	and total size, followed by the root node. A negative total size means
+	every opcode, byte and word is stored in 4 bytes and strings are padded
+	to 4 bytes. Nodes are decoded into dicts:
+	{"name": name, "attrs": {name: value}, "nodes": [child nodes]}
+	Node references are decoded as {"ref": offset}.
+	"""
+	def __init__(self, data):
+		self._data = data
+		self._align = False
+		self._version = None
+
+	def decode(self):
+		data = self._data
+		if len(data) < HCB_HEADER_SIZE:
+			raise ValueError("hcb file too short")
+		magic, major, minor, checksum, total = struct.unpack_from("<IIIIi", data, 0)
+		if magic != HCB_MAGIC:
+			raise ValueError("bad hcb magic 0x%x" % magic)
+		self._version = (major, minor)
+		if total < 0:
+			self._align = True
+			total = -total
+		end = HCB_HEADER_SIZE + total
+		if end > len(data):
+			raise ValueError("hcb total size %d exceeds file size" % total)
+
+		opcode, pos = self.__read_opcode(HCB_HEADER_SIZE, end)
+		if opcode != HCS_NODE:
+			raise ValueError("hcb root is not a node")
+		node, pos = self.__read_node(pos, end)
+		return node
+
+	def get_version(self):
+		return self._version
+
+	def __read(self, fmt, pos, end):
+		size = struct.calcsize(fmt)
+		if pos + size > end:
+			raise ValueError("hcb data truncated at 0x%x" % pos)
+		return struct.unpack_from(fmt, self._data, pos)[0], pos + size
+
+	def __read_opcode(self, pos, end):
+		if self._align:
+			return self.__read("<I", pos, end)
+		return self.__read("<B", pos, end)
+
+	def __read_string(self, pos, end):
+		nul = self._data.find(b"\0", pos, end)
+		if nul < 0:
+			raise ValueError("hcb string not terminated at 0x%x" % pos)
+		value = self._data[pos:nul].decode("utf-8", "replace")
+		size = nul + 1 - pos
+		if self._align:
+			size = (size + 3) & ~3
+		return value, pos + size
+
+	def __read_node(self, pos, end):
+		name, pos = self.__read_string(pos, end)
+		size, pos = self.__read("<I", pos, end)
+		node_end = pos + size
+		if node_end > end:
+			raise ValueError("hcb node %s exceeds its parent" % name)
+
+		node = {"name": name, "attrs": {}, "nodes": []}
+		while pos < node_end:
+			opcode, pos = self.__read_opcode(pos, node_end)
+			if opcode == HCS_NODE:
+				child, pos = self.__read_node(pos, node_end)
+				node["nodes"].append(child)
+			elif opcode == HCS_TERM:
+				attr, pos = self.__read_string(pos, node_end)
+				opcode, pos = self.__read_opcode(pos, node_end)
+				node["attrs"][attr], pos = self.__read_value(opcode, pos, node_end)
+			else:
+				raise ValueError("unexpected hcb opcode 0x%x in node %s" % (opcode, name))
+		return node, pos
+
+	def __read_value(self, opcode, pos, end):
+		if opcode == HCS_BYTE:
+			return self.__read("<I" if self._align else "<B", pos, end)
+		if opcode == HCS_WORD:
+			return self.__read("<I" if self._align else "<H", pos, end)
+		if opcode == HCS_DWORD:
+			return self.__read("<I", pos, end)
+		if opcode == HCS_QWORD:
+			return self.__read("<Q", pos, end)
+		if opcode == HCS_STRING:
+			return self.__read_string(pos, end)
+		if opcode == HCS_NODEREF:
+			ref, pos = self.__read("<I", pos, end)
+			return {"ref": ref}, pos
+		if opcode == HCS_ARRAY:
+			count, pos = self.__read("<I" if self._align else "<H", pos, end)
+			values = []
+			for i in range(count):
+				opcode, pos = self.__read_opcode(pos, end)
+				value, pos = self.__read_value(opcode, pos, end)
+				values.append(value)
+			return values, pos
+		raise ValueError("unknown hcb opcode 0x%x at 0x%x" % (opcode, pos))
+
+def decode_hcb_file(hcb_file):
+	with open(hcb_file, "rb") as f:
+		return HcbDecoder(f.read()).decode()
+
+def iter_hcb_attrs(node, attr):
+	"""Yield the value of every attribute named attr in the tree."""
+	stack = [node]
+	while stack:
+		node = stack.pop()
+		if attr in node["attrs"]:
+			yield node["attrs"][attr]
+		stack.extend(reversed(node["nodes"]))
+
+if __name__ == "__main__":
+	import sys
+	root = decode_hcb_file(sys.argv[1])
+	for name in iter_hcb_attrs(root, "moduleName"):
+		print(name)
@@ -19,12 +19,65 @@
 import os
 import subprocess
 
+from ..elf_cache import CACHE_KIND_HCB
+from .hcb_decoder import decode_hcb_file, iter_hcb_attrs
+
 class HdiParser(object):
 	@staticmethod
-	def load(mgr, product_out_path):
+	def load(mgr, product_out_path, cache=None):
+		hcs_file = os.path.join(product_out_path, "packages/phone/vendor/etc/hdfconfig/hdf_default.hcb")
+		modules = None
+		if os.path.isfile(hcs_file):
+			modules = HdiParser.__load_hcb_modules(hcs_file, cache)
+		if modules is None:
+			modules = HdiParser.__load_hcs_modules(product_out_path, hcs_file)
+		if modules is None:
+			return
+
+		if not mgr:
+			return
+
+		modules = set(modules)
+		for elf in mgr.get_all():
+			if elf["name"] in modules:
+				elf["hdiType"] = "hdi_service"
+
+	@staticmethod
+	def __module_file_name(name):
+		if not name.endswith(".so"):
+			name = "lib%s.z.so" % name
+		return name
+
+	@staticmethod
+	def __load_hcb_modules(hcs_file, cache):
+		# Decode hcb file in process, the decoded module names are cached by hcb content
+		digest = None
+		if cache:
+			digest = cache.get_file_digest(hcs_file)
+			modules = cache.get(CACHE_KIND_HCB, digest)
+			if modules is not None:
+				return modules
+
+		try:
+			root = decode_hcb_file(hcs_file)
+		except (OSError, ValueError) as e:
+			print("hcb decode error: %s, decode with hc-gen now" % str(e))
+			return None
+
+		modules = []
+		for name in iter_hcb_attrs(root, "moduleName"):
+			if not isinstance(name, str) or name == "":
+				continue
+			modules.append(HdiParser.__module_file_name(name))
+
+		if cache:
+			cache.put(CACHE_KIND_HCB, digest, modules)
+		return modules
+
+	@staticmethod
+	def __load_hcs_modules(product_out_path, hcs_file):
 		# Decode hcb file to get hcs file
 		hdi_tool = os.path.join(product_out_path, "obj/drivers/hdf_core/framework/tools/hc-gen/hc-gen")
-		hcs_file = os.path.join(product_out_path, "packages/phone/vendor/etc/hdfconfig/hdf_default.hcb")
 		out_file = os.path.join(product_out_path, "device_info.hcs")
 		subprocess.Popen('%s -d "%s" -o "%s"' % (hdi_tool, hcs_file, out_file), shell=True).wait()
 		try:
@@ -36,7 +89,7 @@ class HdiParser(object):
 				with open(out_file) as f:
 					lines = f.readlines()
 			except:
-				return
+				return None
 
 		modules = []
 		for line in lines:
@@ -55,16 +108,8 @@ class HdiParser(object):
 			if name == "":
 				continue
 
-			if not name.endswith(".so"):
-				name = "lib%s.z.so" % name
-			modules.append(name)
-
-		if not mgr:
-			return
-
-		for elf in mgr.get_all():
-			if elf["name"] in modules:
-				elf["hdiType"] = "hdi_service"
+			modules.append(HdiParser.__module_file_name(name))
+		return modules
 
 if __name__ == "__main__":
 	parser = HdiParser()
@@ -17,3 +17,4 @@
 #
 
 from .innerapi import InnerAPILoader
+from .inner_kits_index import InnerKitsIndex, HeaderChecker
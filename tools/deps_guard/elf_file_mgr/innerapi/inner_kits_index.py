@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+
+INNER_KITS_INFO = "build_configs/parts_info/inner_kits_info.json"
+
+# Parsed indexes by product out path, with the stat of the file they were parsed from
+_indexes = {}
+
+class InnerKitsIndex(object):
+	"""
+	inner_kits_info.json indexed by the GN label of each innerapi.
+
+	The file maps component names to innerapi names to {"label",
+	"header_base", "header_files"}. A label may be declared by more than
+	one component, so each label holds a list of (component, innerapi).
+	"""
+	def __init__(self, info):
+		self._labels = {}
+		for component, innerapis in info.items():
+			for name, innerapi in innerapis.items():
+				self._labels.setdefault(innerapi["label"], []).append((component, innerapi))
+
+	@staticmethod
+	def load(product_out_path):
+		"""
+		Index of the product, parsed once and shared by all users.
+
+		The file is parsed again only if it is changed. Raise the errors of
+		open() and json.load() if it can not be read.
+		"""
+		inner_kits_info = os.path.join(product_out_path, INNER_KITS_INFO)
+		st = os.stat(inner_kits_info)
+		key = (st.st_ino, st.st_size, st.st_mtime_ns)
+		item = _indexes.get(product_out_path)
+		if item is None or item[0] != key:
+			with open(inner_kits_info, "r") as f:
+				item = (key, InnerKitsIndex(json.load(f)))
+			_indexes[product_out_path] = item
+		return item[1]
+
+	def __contains__(self, label):
+		return label in self._labels
+
+	def __len__(self):
+		return len(self._labels)
+
+	def get_innerapis(self, label, component=None):
+		"""Innerapis declared with label, only those of component if it is given."""
+		return [innerapi for owner, innerapi in self._labels.get(label, []) if component is None or owner == component]
+
+	def get_headers(self, label, component=None):
+		"""Header files of the innerapis declared with label, as source paths such as //base/a/include/a.h."""
+		headers = []
+		for innerapi in self.get_innerapis(label, component):
+			base = innerapi["header_base"]
+			for f in innerapi["header_files"]:
+				headers.append(os.path.join(base, f))
+		return headers
+
+class HeaderChecker(object):
+	"""
+	Check whether header files exist in the source tree.
+
+	Headers of one innerapi share a few directories, so each directory is
+	listed once and every header is looked up in the listing instead of
+	being checked with its own stat call.
+	"""
+	def __init__(self, source_root):
+		self._source_root = source_root
+		self._dirs = {}
+
+	def get_source_path(self, header):
+		if header.startswith("//"):
+			header = header[2:]
+		return os.path.normpath(os.path.join(self._source_root, header))
+
+	def __list_dir(self, path):
+		if path not in self._dirs:
+			try:
+				self._dirs[path] = set(os.listdir(path))
+			except OSError:
+				self._dirs[path] = set()
+		return self._dirs[path]
+
+	def exists(self, header):
+		path = self.get_source_path(header)
+		return os.path.basename(path) in self.__list_dir(os.path.dirname(path))
+
+	def get_missing(self, headers):
+		return [header for header in headers if not self.exists(header)]
+
+if __name__ == '__main__':
+	import sys
+
+	# Example: python elf_file_mgr/innerapi/inner_kits_index.py <product out path> <label> [source root]
+	index = InnerKitsIndex.load(sys.argv[1])
+	headers = index.get_headers(sys.argv[2])
+	print("%d labels, %d headers of %s" % (len(index), len(headers), sys.argv[2]))
+	checker = HeaderChecker(sys.argv[3]) if len(sys.argv) > 3 else None
+	for header in headers:
+		if checker and not checker.exists(header):
+			print("  %s (missing)" % header)
+		else:
+			print("  %s" % header)
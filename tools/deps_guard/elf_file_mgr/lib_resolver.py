@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+
+# Default search paths of ld-musl if no namespace config file is found in the image
+DEFAULT_LIB64_ORDER = "/system/lib64:/vendor/lib64:/vendor/lib64/chipsetsdk:/system/lib64/ndk:/system/lib64/chipset-pub-sdk:/system/lib64/chipset-sdk:/system/lib64/platformsdk:/system/lib64/priv-platformsdk:/system/lib64/priv-module:/system/lib64/module:/system/lib64/module/data:/system/lib64/module/multimedia:/system/lib:/vendor/lib:/system/lib/ndk:/system/lib/chipset-pub-sdk:/system/lib/chipset-sdk:/system/lib/platformsdk:/system/lib/priv-platformsdk:/system/lib/priv-module:/system/lib/module:/system/lib/module/data:/system/lib/module/multimedia:/lib64:/lib:/usr/local/lib:/usr/lib"
+DEFAULT_LIB_ORDER = "/system/lib:/vendor/lib:/vendor/lib/chipsetsdk:/system/lib/ndk:/system/lib/chipset-pub-sdk:/system/lib/chipset-sdk:/system/lib/platformsdk:/system/lib/priv-platformsdk:/system/lib/priv-module:/system/lib/module:/system/lib/module/data:/system/lib/module/multimedia:/lib:/usr/local/lib:/usr/lib"
+
+NAMESPACE_CONFIG_DIR = "system/etc"
+NAMESPACE_LIB_PATHS_KEY = "namespace.default.lib.paths"
+
+UNKNOWN_ORDER = 1000
+MAX_LINK_DEPTH = 40
+
+def _compile_order(path_order):
+	res = {}
+	for idx, p in enumerate(path_order.split(":")):
+		if p and p not in res:
+			res[p] = idx
+	return res
+
+def load_namespace_lib_paths(images_path):
+	"""
+	Read default namespace search paths from ld-musl-namespace-*.ini.
+
+	Return (lib64_order, lib_order), each is None if not configured.
+	"""
+	lib64_order = None
+	lib_order = None
+	config_dir = os.path.join(images_path, NAMESPACE_CONFIG_DIR)
+	try:
+		names = sorted(os.listdir(config_dir))
+	except OSError:
+		return (None, None)
+
+	for name in names:
+		if not name.startswith("ld-musl-namespace-") or not name.endswith(".ini"):
+			continue
+		paths = None
+		try:
+			with open(os.path.join(config_dir, name)) as f:
+				for line in f:
+					line = line.strip()
+					if not line.startswith(NAMESPACE_LIB_PATHS_KEY):
+						continue
+					parts = line.split("=", 1)
+					if len(parts) == 2 and parts[0].strip() == NAMESPACE_LIB_PATHS_KEY:
+						paths = parts[1].strip()
+						break
+		except (OSError, UnicodeDecodeError):
+			continue
+		if not paths:
+			continue
+		if paths.find("/lib64") >= 0:
+			lib64_order = lib64_order or paths
+		else:
+			lib_order = lib_order or paths
+
+	return (lib64_order, lib_order)
+
+class LibraryResolver(object):
+	"""
+	Precompiled dynamic linker resolution tables for ElfFileMgr.
+
+	All paths are relative to the product images path, the same as elf["path"].
+	"""
+	def __init__(self, images_path, link_file_map):
+		lib64_order, lib_order = load_namespace_lib_paths(images_path)
+		self._lib64_order = _compile_order(lib64_order or DEFAULT_LIB64_ORDER)
+		self._lib_order = _compile_order(lib_order or DEFAULT_LIB_ORDER)
+
+		# Symbolic links, the first link with the same basename wins as before
+		self._links = {}
+		self._link_by_name = {}
+		for src, target in link_file_map.items():
+			if not src.startswith(images_path):
+				continue
+			src = src[len(images_path):]
+			self._links[src] = target
+			self._link_by_name.setdefault(os.path.basename(src), src)
+
+		self._path_cache = {}
+
+	def get_library_order(self, path):
+		if not path.startswith("/"):
+			path = "/" + path
+		pos = path.rfind("/")
+		if pos < 0:
+			return UNKNOWN_ORDER
+
+		if path.find("/lib64/") > 0:
+			order = self._lib64_order
+		else:
+			order = self._lib_order
+		return order.get(path[:pos], UNKNOWN_ORDER)
+
+	def reset(self):
+		self._path_cache = {}
+
+	@staticmethod
+	def __lookup_path(path_dict, path):
+		if path not in path_dict and path.find("/lib64/") > 0:
+			path = path.replace("/lib64/", "/lib/")
+		if path in path_dict:
+			return path
+		if path.find("/platformsdk/") > 0:
+			return None
+
+		if path.startswith("system/lib64/"):
+			path = path.replace("system/lib64/", "system/lib64/platformsdk/")
+		elif path.startswith("system/lib/"):
+			path = path.replace("system/lib/", "system/lib/platformsdk/")
+		else:
+			return None
+
+		if path not in path_dict and path.find("/lib64/") > 0:
+			path = path.replace("/lib64/", "/lib/")
+		if path in path_dict:
+			return path
+		return None
+
+	def resolve_path(self, path_dict, path):
+		"""Return path_dict value of the path, the resolved key is memorized."""
+		if path in path_dict:
+			return path_dict[path]
+		if path in self._path_cache:
+			key = self._path_cache[path]
+		else:
+			key = LibraryResolver.__lookup_path(path_dict, path)
+			self._path_cache[path] = key
+		if key is None:
+			return None
+		return path_dict[key]
+
+	def resolve_link_path(self, name):
+		"""Follow the whole symbolic link chain of a library name, return the final path."""
+		if name not in self._link_by_name:
+			return None
+
+		path = self._link_by_name[name]
+		for i in range(MAX_LINK_DEPTH):
+			if path not in self._links:
+				return path
+			target = self._links[path]
+			if target.startswith("/"):
+				path = os.path.normpath(target[1:])
+			else:
+				path = os.path.normpath(os.path.join(os.path.dirname(path), target))
+		return None
+
+	def resolve_link(self, path_dict, name):
+		path = self.resolve_link_path(name)
+		if not path:
+			return None
+		return self.resolve_path(path_dict, path)
@@ -19,69 +19,128 @@
 import os
 import json
 
+JSON_CHUNK_SIZE = 1024 * 1024
+
+def iter_json_array(f, chunk_size=JSON_CHUNK_SIZE):
+	"""
+	Yield the objects of a top level JSON array without loading the whole file.
+
+	Each value is decoded with raw_decode from a sliding buffer, the buffer
+	is refilled when a value is cut at the end of the current chunk. A value
+	is only taken when a separator follows it, raw_decode also succeeds on
+	the first part of a cut number such as 123 of 12345.
+	"""
+	decoder = json.JSONDecoder()
+	buf = ""
+	pos = 0
+	started = False
+	eof = False
+	while True:
+		# Skip white spaces and separators
+		while pos < len(buf) and buf[pos] in " \t\r\n,":
+			pos = pos + 1
+		if pos >= len(buf):
+			more = f.read(chunk_size)
+			if not more:
+				raise ValueError("unexpected end of JSON array")
+			buf = more
+			pos = 0
+			continue
+
+		if not started:
+			if buf[pos] != "[":
+				raise ValueError("JSON array expected")
+			started = True
+			pos = pos + 1
+			continue
+		if buf[pos] == "]":
+			return
+
+		try:
+			item, end = decoder.raw_decode(buf, pos)
+			complete = eof or (end < len(buf) and buf[end] in " \t\r\n,]")
+		except ValueError:
+			if eof:
+				raise
+			complete = False
+		if not complete:
+			more = f.read(chunk_size)
+			if not more:
+				eof = True
+			buf = buf[pos:] + more
+			pos = 0
+			continue
+		pos = end
+		yield item
+
 class CompileInfoLoader(object):
 	@staticmethod
-	def __load_output_module_info(product_out_path):
+	def __iter_output_module_info(product_out_path):
 		try:
-			with open(os.path.join(product_out_path, "packages/phone/system_module_info.json")) as f:
-				modules = json.load(f)
+			f = open(os.path.join(product_out_path, "packages/phone/system_module_info.json"))
 		except:
 			print("file info not found.")
-			return None
-
-		res = []
-		for item in modules:
-			info = {}
-			info["name"] = item["dest"][0]
-			if info["name"].startswith("updater/"):
-				if len(item["dest"]) > 1:
-					info["name"] = item["dest"][1]
-				else:
-					continue
-
-			if "label" in item:
-				info["labelPath"] = item["label"]
-			else:
-				info["labelPath"] = ""
-			if info["labelPath"].find("(") > 0:
-				info["labelPath"] = info["labelPath"][:info["labelPath"].find("(")]
-			if "subsystem_name" in item:
-				info["subsystem"] = item["subsystem_name"]
+			return
+
+		with f:
+			try:
+				for item in iter_json_array(f):
+					info = CompileInfoLoader.__parse_module_info(item)
+					if info:
+						yield info
+			except ValueError as e:
+				print("file info parse error: %s" % str(e))
+
+	@staticmethod
+	def __parse_module_info(item):
+		info = {}
+		info["name"] = item["dest"][0]
+		if info["name"].startswith("updater/"):
+			if len(item["dest"]) > 1:
+				info["name"] = item["dest"][1]
 			else:
-				if info["labelPath"].startswith("//build/common"):
-					info["subsystem"] = "commonlibrary"
-				else:
-					info["subsystem"] = "unknown"
-			if "part_name" in item:
-				info["componentName"] = item["part_name"]
+				return None
+
+		if "label" in item:
+			info["labelPath"] = item["label"]
+		else:
+			info["labelPath"] = ""
+		if info["labelPath"].find("(") > 0:
+			info["labelPath"] = info["labelPath"][:info["labelPath"].find("(")]
+		if "subsystem_name" in item:
+			info["subsystem"] = item["subsystem_name"]
+		else:
+			if info["labelPath"].startswith("//build/common"):
+				info["subsystem"] = "commonlibrary"
 			else:
-				if info["labelPath"].startswith("//build/common"):
-					info["componentName"] = "c_utils"
-				else:
-					info["componentName"] = "unknown"
-			if "label_name" in item:
-				info["moduleName"] = item["label_name"]
+				info["subsystem"] = "unknown"
+		if "part_name" in item:
+			info["componentName"] = item["part_name"]
+		else:
+			if info["labelPath"].startswith("//build/common"):
+				info["componentName"] = "c_utils"
 			else:
-				info["moduleName"] = ""
-			if "version_script" in item:
-				info["version_script"] = item["version_script"]
-			info["third_party"] = False
-			info["chipset"] = False
-			info["napi"] = False
-			info["innerapi"] = False
-			info["innerapi_declared"] = False
-			if "shlib_type" in item:
-				info["shlib_type"] = item["shlib_type"]
-			if "innerapi_tags" in item:
-				info["innerapi_tags"] = item["innerapi_tags"]
-			info["sa_id"] = 0
-			res.append(info)
-		return res
+				info["componentName"] = "unknown"
+		if "label_name" in item:
+			info["moduleName"] = item["label_name"]
+		else:
+			info["moduleName"] = ""
+		if "version_script" in item:
+			info["version_script"] = item["version_script"]
+		info["third_party"] = False
+		info["chipset"] = False
+		info["napi"] = False
+		info["innerapi"] = False
+		info["innerapi_declared"] = False
+		if "shlib_type" in item:
+			info["shlib_type"] = item["shlib_type"]
+		if "innerapi_tags" in item:
+			info["innerapi_tags"] = item["innerapi_tags"]
+		info["sa_id"] = 0
+		return info
 
 	@staticmethod
-	def load(mgr, product_out_path):
-		info = CompileInfoLoader.__load_output_module_info(product_out_path)
-
+	def load(mgr, product_out_path, save_unknown=True):
 		defaultInfo = {
 			"subsystem": "unknown",
 			"componentName": "unknown",
@@ -98,14 +157,14 @@ class CompileInfoLoader(object):
 			"innerapi_declared": False
 		}
 
-		if info:
-			for item in info:
-				elf = mgr.get_elf_by_path(item["name"])
-				if not elf:
-					continue
-				for k in defaultInfo.keys():
-					if k in item:
-						elf[k] = item[k]
+		# Join each record onto the ELF index as soon as it is parsed
+		for item in CompileInfoLoader.__iter_output_module_info(product_out_path):
+			elf = mgr.get_elf_by_path(item["name"])
+			if not elf:
+				continue
+			for k in defaultInfo.keys():
+				if k in item:
+					elf[k] = item[k]
 
 		unknown_items = []
 		for elf in mgr.get_all():
@@ -142,9 +201,10 @@ class CompileInfoLoader(object):
 
 		if len(unknown_items) > 0:
 			print("%d modules has no component info" % len(unknown_items))
-			with open(os.path.join(product_out_path, "unknown.json"), "w") as f:
-				res = json.dumps(unknown_items, indent=4)
-				f.write(res)
+			if save_unknown:
+				with open(os.path.join(product_out_path, "unknown.json"), "w") as f:
+					res = json.dumps(unknown_items, indent=4)
+					f.write(res)
 
 		# init platformsdk, chipsetsdk, innerapi flags
 		for elf in mgr.get_all():
@@ -175,9 +235,10 @@ class CompileInfoLoader(object):
 
 		# for component dependedBy_internal and dependedBy_external
 
-		platformsdks = []
-		chipsetsdks = []
-		innerapi_ccs = []
+		# SDK modules keyed by id, in the order they are found
+		platformsdks = {}
+		chipsetsdks = {}
+		innerapi_ccs = {}
 
 		for dep in mgr.get_all_deps():
 			caller = dep["caller"]
@@ -207,8 +268,8 @@ class CompileInfoLoader(object):
 
 				dep["platformsdk"] = True
 				callee["platformsdk"] = True
-				if callee not in platformsdks:
-					platformsdks.append(callee)
+				if callee["id"] not in platformsdks:
+					platformsdks[callee["id"]] = callee
 			elif caller["chipset"] != callee["chipset"]:
 				# For Chipset SDK modules detection
 				if callee["modGroup"] not in ("publicapi", "pentry"):
@@ -216,11 +277,11 @@ class CompileInfoLoader(object):
 				if callee["hdiType"] != "hdi_proxy": # hdi proxy modules can be called by both system and chipset
 					dep["chipsetsdk"] = True
 					callee["chipsetsdk"] = True
-					if callee not in chipsetsdks:
-						chipsetsdks.append(callee)
+					if callee["id"] not in chipsetsdks:
+						chipsetsdks[callee["id"]] = callee
 			elif dep["external"] == True:
-				if callee not in innerapi_ccs:
-					innerapi_ccs.append(callee)
+				if callee["id"] not in innerapi_ccs:
+					innerapi_ccs[callee["id"]] = callee
 
 			# Highest priority
 			if caller["napi"]:
@@ -234,9 +295,14 @@ class CompileInfoLoader(object):
 				callee["modGroup"] = "pentry"
 
 if __name__ == "__main__":
-	import sqlite3
-	import elf_modules
-	conn = sqlite3.connect("symdb.db")
-	cursor = conn.cursor()
+	import sys
+
+	sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+	from elf_file_mgr import ElfFileMgr
+	from elf_file_mgr.graph_store import save_graph_store
 
-	mgr = elf_modules.ElfModuleMgr(cursor)
+	# Example: python elf_file_mgr/module_info/compile_info_loader.py <product out path> [symdb.db]
+	# Compile information is loaded by scan_all_files(), query the saved file with deps_query.py
+	mgr = ElfFileMgr(sys.argv[1])
+	mgr.scan_all_files()
+	save_graph_store(mgr, sys.argv[2] if len(sys.argv) > 2 else "symdb.db")
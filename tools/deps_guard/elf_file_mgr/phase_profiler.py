@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+
+try:
+	import resource
+except ImportError:
+	resource = None
+
+PROFILE_VERSION = 1
+PHASE_PROFILE_NAME = "deps_guard_profile.json"
+
+def _children_cpu_time():
+	# Worker processes of -j are only counted after they are joined
+	if not resource:
+		return 0.0
+	usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+	return usage.ru_utime + usage.ru_stime
+
+def _peak_rss_kb():
+	if not resource:
+		return None
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+class PhaseProfiler(object):
+	"""
+	Wall time, CPU time, peak RSS and item count of each phase of a run.
+
+	CPU time includes joined worker processes, peak RSS is the peak of this
+	process when the phase ended. If cprofile_dir is given, each phase is
+	also run under cProfile and dumped to <cprofile_dir>/<phase>.prof.
+	"""
+	def __init__(self, cprofile_dir=None):
+		self._phases = []
+		self._cprofile_dir = cprofile_dir
+		self._start = time.perf_counter()
+		if cprofile_dir and not os.path.isdir(cprofile_dir):
+			os.makedirs(cprofile_dir)
+
+	@contextmanager
+	def phase(self, name):
+		"""Measure the body as phase name, set "count" in the yielded dict to record the number of items."""
+		record = {"name": name, "count": None}
+		profile = None
+		if self._cprofile_dir:
+			profile = cProfile.Profile()
+
+		wall = time.perf_counter()
+		cpu = time.process_time() + _children_cpu_time()
+		if profile:
+			profile.enable()
+		try:
+			yield record
+		finally:
+			if profile:
+				profile.disable()
+			record["wall"] = time.perf_counter() - wall
+			record["cpu"] = time.process_time() + _children_cpu_time() - cpu
+			record["peak_rss_kb"] = _peak_rss_kb()
+			self._phases.append(record)
+			if profile:
+				profile.dump_stats(os.path.join(self._cprofile_dir, "%s.prof" % name.replace(":", "_").replace("/", "_")))
+
+	def add_phase(self, name, wall, cpu=None, count=None):
+		"""Record a phase measured by the caller, such as one rule of the rule engine."""
+		self._phases.append({"name": name, "count": count, "wall": wall, "cpu": cpu, "peak_rss_kb": _peak_rss_kb()})
+
+	def get_phases(self):
+		return self._phases
+
+	def to_json(self):
+		return {
+			"version": PROFILE_VERSION,
+			"wall": time.perf_counter() - self._start,
+			"cpu": time.process_time() + _children_cpu_time(),
+			"peak_rss_kb": _peak_rss_kb(),
+			"phases": self._phases
+		}
+
+	def save(self, file):
+		try:
+			with open(file, "w") as f:
+				json.dump(self.to_json(), f, indent=4)
+		except:
+			pass
+
+	def print_report(self):
+		print("  %-32s %8s %10s %10s %12s" % ("phase", "count", "wall(s)", "cpu(s)", "peak RSS(KB)"))
+		for item in self._phases:
+			print("  %-32s %8s %10.3f %10s %12s" % (item["name"], "" if item["count"] is None else item["count"], item["wall"],
+				"" if item["cpu"] is None else "%.3f" % item["cpu"], "" if item["peak_rss_kb"] is None else item["peak_rss_kb"]))
+
+class NullProfiler(object):
+	"""Profiler doing nothing, used when profiling is not enabled."""
+	@contextmanager
+	def phase(self, name):
+		yield {}
+
+	def add_phase(self, name, wall, cpu=None, count=None):
+		pass
+
+NULL_PROFILER = NullProfiler()
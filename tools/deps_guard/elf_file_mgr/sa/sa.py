@@ -20,27 +20,60 @@ import string
 import json
 import sys
 import os
+import multiprocessing
 import xml.etree.ElementTree as ET
 
+from ..elf_cache import CACHE_KIND_SA_PROFILE
+
 def xml_node_find_by_name(node, name):
 	for item in node:
 		if item.tag == name:
 			return item.text
 	return None
 
-class SAParser(object):
-	@staticmethod
-	def __parse_sa_profile(all_sa, f):
+def parse_sa_profile_job(f):
+	"""Parse one SA profile, return ([[sa_key, sa_item], ...], error)."""
+	try:
 		root = ET.parse(f).getroot()
 		process = xml_node_find_by_name(root, "process")
+		items = []
 		for sa in root.findall("systemability"):
 			libpath = xml_node_find_by_name(sa, "libpath")
-			sa_key = os.path.basename(libpath)
+			if libpath is None:
+				raise ValueError("systemability without libpath")
 			sa_item = {}
 			for item in sa:
 				sa_item[item.tag] = item.text
 				sa_item["process"] = process
-			all_sa[sa_key] = sa_item
+			items.append([os.path.basename(libpath), sa_item])
+	except (ET.ParseError, OSError, ValueError) as e:
+		return (None, str(e))
+	return (items, None)
+
+class SAParser(object):
+	@staticmethod
+	def __parse_sa_profiles(files, jobs, cache):
+		results = {}
+		digests = {}
+		if cache:
+			digests = cache.get_file_digests(files)
+			for f in files:
+				res = cache.get(CACHE_KIND_SA_PROFILE, digests[f])
+				if res is not None:
+					results[f] = res
+		missed = [f for f in files if f not in results]
+
+		if jobs and jobs > 1 and len(missed) > 1:
+			with multiprocessing.Pool(jobs) as pool:
+				parsed = pool.map(parse_sa_profile_job, missed, max(1, len(missed) // (jobs * 4)))
+		else:
+			parsed = [parse_sa_profile_job(f) for f in missed]
+
+		for f, res in zip(missed, parsed):
+			results[f] = res
+			if cache:
+				cache.put(CACHE_KIND_SA_PROFILE, digests[f], res)
+		return results
 
 	@staticmethod
 	def __add_sa_info(all_sa, mgr):
@@ -53,18 +86,26 @@ class SAParser(object):
 			mod["sa_id"] = int(all_sa[mod["name"]]["name"])
 
 	@staticmethod
-	def load(mgr, out_root_path):
+	def load(mgr, out_root_path, cache=None, jobs=1):
 		all_sa = {}
 		path = os.path.join(out_root_path, "packages/phone/system/profile")
 		if not os.path.exists(path):
 			return
 
+		files = []
 		for f in os.listdir(path):
 			full_name = os.path.join(path, f)
 			if os.path.isfile(full_name) and f.endswith(".xml"):
-				try:
-					SAParser.__parse_sa_profile(all_sa, full_name)
-				except:
-					pass
+				files.append(full_name)
+
+		# Merge in directory order, later profiles override earlier ones as before
+		results = SAParser.__parse_sa_profiles(files, jobs, cache)
+		for f in files:
+			items, error = results[f]
+			if error:
+				print("sa profile parse error: %s: %s" % (f, error))
+				continue
+			for sa_key, sa_item in items:
+				all_sa[sa_key] = sa_item
 
 		SAParser.__add_sa_info(all_sa, mgr)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+
+from .unused_deps import estimate_pages, estimate_relocs
+
+STARTUP_COST_REPORT_NAME = "deps_guard_startup_cost.json"
+
+class StartupCostEstimator(object):
+	"""
+	Static load cost of each process: executables and SA modules with their whole library closure.
+
+	All numbers are sums over the module and every library it loads directly
+	or indirectly: file size, text/data/bss sizes, mapped pages, relocations
+	and PT_LOAD segments, each segment is one mmap of the dynamic linker.
+	"""
+	def __init__(self, mgr):
+		self._mgr = mgr
+		query = mgr.get_query()
+
+		self._costs = {}
+		self._entries = []
+		for elf in mgr.get_all():
+			if elf["type"] != "bin" and not elf["sa_id"] > 0:
+				continue
+			closure = [elf] + query.transitive_deps(elf)
+			item = {
+				"name": elf["name"],
+				"path": elf["path"],
+				"sa_id": elf["sa_id"],
+				"libraries": len(closure) - 1,
+				"file_size": 0,
+				"text_size": 0,
+				"data_size": 0,
+				"bss_size": 0,
+				"pages": 0,
+				"relocs": 0,
+				"mmaps": 0
+			}
+			for mod in closure:
+				cost = self.__module_cost(mod)
+				for k, v in cost.items():
+					item[k] += v
+			self._entries.append(item)
+
+		self._entries.sort(key=lambda item: (-item["pages"], -item["relocs"], item["path"]))
+
+	def __module_cost(self, mod):
+		if mod["id"] not in self._costs:
+			mod.load_elf_size()
+			mod.load_elf_segments()
+			self._costs[mod["id"]] = {
+				"file_size": mod["size"],
+				"text_size": mod["text_size"],
+				"data_size": mod["data_size"],
+				"bss_size": mod["bss_size"],
+				"pages": estimate_pages(mod),
+				"relocs": estimate_relocs(mod),
+				"mmaps": mod["load_segments"]
+			}
+		return self._costs[mod["id"]]
+
+	def get_entries(self):
+		"""Process entries with their summed cost, heaviest first."""
+		return self._entries
+
+	def save(self, product_out_path):
+		try:
+			with open(os.path.join(product_out_path, STARTUP_COST_REPORT_NAME), "w") as f:
+				json.dump(self._entries, f, indent=4)
+		except:
+			pass
+
+	def print_report(self, limit=20):
+		print("Startup cost of %d heaviest process entries of %d:" % (min(limit, len(self._entries)), len(self._entries)))
+		print("  %4s %6s %6s %8s %8s %10s %10s %10s %10s  %s" % ("rank", "libs", "mmaps", "pages", "relocs", "file(KB)", "text(KB)", "data(KB)", "bss(KB)", "module"))
+		for idx, item in enumerate(self._entries[:limit]):
+			print("  %4d %6d %6d %8d %8d %10d %10d %10d %10d  %s" % (idx + 1, item["libraries"], item["mmaps"], item["pages"], item["relocs"],
+				item["file_size"] // 1024, item["text_size"] // 1024, item["data_size"] // 1024, item["bss_size"] // 1024, item["name"]))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from array import array
+
+class SymbolTable(object):
+	"""
+	Interned symbol names of a whole product.
+
+	Each name is stored once, ELF files and dependencies keep arrays of
+	integer symbol ids instead of lists of strings.
+	"""
+	def __init__(self):
+		self._ids = {}
+		self._names = []
+
+	def intern(self, name):
+		idx = self._ids.get(name)
+		if idx is None:
+			idx = len(self._names)
+			self._ids[name] = idx
+			self._names.append(name)
+		return idx
+
+	def intern_all(self, names, sort=False):
+		"""Return an array of symbol ids, sorted and unique if sort is True."""
+		ids = []
+		known = self._ids
+		for name in names:
+			idx = known.get(name)
+			if idx is None:
+				idx = len(self._names)
+				known[name] = idx
+				self._names.append(name)
+			ids.append(idx)
+		if sort:
+			ids = sorted(set(ids))
+		return array("I", ids)
+
+	def get_id(self, name):
+		return self._ids.get(name)
+
+	def get_name(self, idx):
+		return self._names[idx]
+
+	def get_names(self, ids):
+		return [self._names[idx] for idx in ids]
+
+	def __len__(self):
+		return len(self._names)
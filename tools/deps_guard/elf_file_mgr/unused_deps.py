@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import os
+import json
+
+PAGE_SIZE = 4096
+UNUSED_DEPS_REPORT_NAME = "deps_guard_unused_deps.json"
+
+def _pages(size):
+	return (size + PAGE_SIZE - 1) // PAGE_SIZE
+
+def estimate_pages(elf):
+	"""Pages mapped for a module, text and read only data, then data and bss."""
+	elf.load_elf_size()
+	return _pages(elf["text_size"]) + _pages(elf["data_size"] + elf["bss_size"])
+
+def estimate_relocs(elf):
+	"""Relocations processed when loading a module."""
+	elf.load_elf_relocs()
+	return elf["relocs"] + elf["plt_relocs"]
+
+class UnusedDepsReport(object):
+	"""
+	NEEDED entries that resolve no symbols, and what each process entry would save without them.
+
+	A NEEDED library is unused if the caller binds no symbol to it, and no
+	unbound import of the caller is exported by the libraries it loads
+	indirectly. The library may still be kept for its constructors, the
+	report can not tell that.
+	It needs an ElfFileMgr scanned with symbols=True.
+	"""
+	def __init__(self, mgr):
+		if not mgr.get_symbol_table():
+			raise Exception("UnusedDepsReport needs dynamic symbols, scan with symbols=True")
+		self._mgr = mgr
+		self._query = mgr.get_query()
+
+		self._unused = []
+		for elf in mgr.get_all():
+			unbound = None
+			for dep in elf["deps"]:
+				if dep["calls"] > 0:
+					continue
+				if unbound is None:
+					unbound = self.__unbound_imports(elf)
+				if self.__provided_indirectly(dep["callee"], unbound):
+					continue
+				self._unused.append(dep)
+		self._unused_ids = set([dep["id"] for dep in self._unused])
+
+		self._pentries = []
+		for elf in mgr.get_all():
+			if elf["modGroup"] != "pentry":
+				continue
+			item = self.__pentry_savings(elf)
+			if item:
+				self._pentries.append(item)
+		self._pentries.sort(key=lambda item: (-item["pages"], -item["relocs"], item["path"]))
+
+	def __unbound_imports(self, elf):
+		unbound = set(elf.get_imports() or [])
+		for dep in elf["deps"]:
+			unbound.difference_update(self._mgr.get_dep_symbol_ids(dep))
+		return unbound
+
+	def __provided_indirectly(self, callee, unbound):
+		if not unbound:
+			return False
+		for lib in self._query.transitive_deps(callee):
+			exports = lib.get_exports()
+			if exports and not unbound.isdisjoint(exports):
+				return True
+		return False
+
+	def __closure(self, elf, skip_unused):
+		seen = set([elf["id"]])
+		stack = [elf]
+		res = []
+		while stack:
+			mod = stack.pop()
+			for dep in mod["deps"]:
+				if skip_unused and dep["id"] in self._unused_ids:
+					continue
+				callee = dep["callee"]
+				if callee["id"] in seen:
+					continue
+				seen.add(callee["id"])
+				res.append(callee)
+				stack.append(callee)
+		return res
+
+	def __pentry_savings(self, elf):
+		loaded = self.__closure(elf, False)
+		unused = 0
+		for mod in [elf] + loaded:
+			for dep in mod["deps"]:
+				if dep["id"] in self._unused_ids:
+					unused = unused + 1
+		if not unused:
+			return None
+
+		kept = set([mod["id"] for mod in self.__closure(elf, True)])
+		dropped = [mod for mod in loaded if mod["id"] not in kept]
+		return {
+			"name": elf["name"],
+			"path": elf["path"],
+			"unused_deps": unused,
+			"libraries": [mod["name"] for mod in dropped],
+			"pages": sum([estimate_pages(mod) for mod in dropped]),
+			"relocs": sum([estimate_relocs(mod) for mod in dropped])
+		}
+
+	def get_unused_deps(self):
+		return self._unused
+
+	def get_pentry_savings(self):
+		"""Process entries with unused NEEDED entries in their load closure, most saved pages first."""
+		return self._pentries
+
+	def to_json(self):
+		unused = []
+		for dep in self._unused:
+			caller = dep["caller"]
+			callee = dep["callee"]
+			unused.append({"caller": caller["path"], "callee": callee["path"], "labelPath": caller["labelPath"]})
+		return {"unused_deps": unused, "pentries": self._pentries}
+
+	def save(self, product_out_path):
+		try:
+			with open(os.path.join(product_out_path, UNUSED_DEPS_REPORT_NAME), "w") as f:
+				json.dump(self.to_json(), f, indent=4)
+		except:
+			pass
+
+	def print_report(self, limit=20):
+		print("%d NEEDED libraries resolve no symbols:" % len(self._unused))
+		for dep in self._unused:
+			print("  %s -> %s in %s" % (dep["caller"]["name"], dep["callee"]["name"], dep["caller"]["labelPath"]))
+
+		print("Process entries loading unused libraries, %d of %d listed:" % (min(limit, len(self._pentries)), len(self._pentries)))
+		for item in self._pentries[:limit]:
+			print("  %s: %d unused NEEDED, %d libraries not loaded, %d pages, %d relocations" % (item["name"], item["unused_deps"], len(item["libraries"]), item["pages"], item["relocs"]))
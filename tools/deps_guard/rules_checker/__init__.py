@@ -16,28 +16,186 @@
 # limitations under the License.
 #
 
+import json
+import multiprocessing
+
 from .napi_rule import NapiRule
 from .sa_rule import SaRule
 from .hdi_rule import HdiRule
 from .chipsetsdk import ChipsetSDKRule
+from .cycle_rule import CycleRule
+from .rule_engine import RuleEngine
+from .base_rule import format_warning
 
-def check_all_rules(mgr, args):
-	rules = [
-		NapiRule,
-		SaRule,
-		HdiRule,
-		ChipsetSDKRule
-	]
+ALL_RULES = [
+	NapiRule,
+	SaRule,
+	HdiRule,
+	ChipsetSDKRule,
+	CycleRule
+]
 
-	passed = True
+def get_enabled_rules(args):
+	"""Rules to check: all rules except optional ones not enabled with --enable-rule."""
+	enabled = []
+	if args and getattr(args, "enable_rule", None):
+		enabled = args.enable_rule
+	return [rule for rule in ALL_RULES if not rule.OPTIONAL or rule.RULE_NAME in enabled]
+
+def _get_rule_jobs(args):
+	if args and getattr(args, "rule_jobs", None):
+		return args.rule_jobs
+	return 1
+
+def _run_rules(mgr, args, rules, modules=None, cpu_time=False):
+	checkers = []
 	for rule in rules:
 		r = rule(mgr, args)
+		r.buffer_messages()
+		if modules is not None:
+			r.set_partial()
 		r.log("Do %s rule checking now:" % rule.RULE_NAME)
-		if not r.check():
+		checkers.append(r)
+
+	# Evaluate all rules in one pass over the graph
+	engine = RuleEngine(mgr, checkers, modules, cpu_time)
+	engine.run()
+
+	# White list usage is only known after checking all modules
+	stale = args and getattr(args, "report_stale_whitelist", False) and modules is None
+
+	records = []
+	for r in checkers:
+		records.append({
+			"name": r.RULE_NAME,
+			"passed": engine.get_result(r),
+			"messages": list(r.get_messages()),
+			"help_url": r.get_help_url(),
+			"outputs": r.get_outputs(),
+			"stale": r.get_white_lists().get_stale_entries() if stale else [],
+			"elapsed": engine.get_elapsed(r),
+			"cpu_time": engine.get_cpu_time(r)
+		})
+	return records
+
+# Arguments of the running run_rules(), inherited by worker processes through fork
+_rule_jobs_args = []
+
+def _run_rules_job(group):
+	mgr, args, rules, modules, cpu_time = _rule_jobs_args[0]
+	return _run_rules(mgr, args, [rules[i] for i in group], modules, cpu_time)
+
+def run_rules(mgr, args, rules=None, modules=None, cpu_time=False):
+	"""
+	Evaluate rules on the frozen graph, return one record for each rule in rule order.
+
+	Records hold name, passed, messages, help_url, outputs, stale white list
+	entries, elapsed and cpu_time. With --rule-jobs N, rules are split into N
+	groups checked by forked processes, each walking the graph it shares
+	with the parent copy on write. Messages are kept per rule and records
+	are merged in rule order, so the result does not depend on N.
+	"""
+	if rules is None:
+		rules = get_enabled_rules(args)
+
+	jobs = min(_get_rule_jobs(args), len(rules))
+	# Workers of a multiprocessing pool, such as deps_guard_products() ones, can not fork again
+	if "fork" not in multiprocessing.get_all_start_methods() or multiprocessing.current_process().daemon:
+		jobs = 1
+
+	frozen = mgr.is_frozen()
+	mgr.freeze()
+	try:
+		if jobs <= 1:
+			return _run_rules(mgr, args, rules, modules, cpu_time)
+
+		groups = [list(range(i, len(rules), jobs)) for i in range(jobs)]
+		_rule_jobs_args[:] = [(mgr, args, rules, modules, cpu_time)]
+		try:
+			with multiprocessing.get_context("fork").Pool(jobs) as pool:
+				parts = pool.map(_run_rules_job, groups, 1)
+		finally:
+			_rule_jobs_args[:] = []
+
+		records = [None] * len(rules)
+		for group, part in zip(groups, parts):
+			for i, record in zip(group, part):
+				records[i] = record
+		return records
+	finally:
+		if not frozen:
+			mgr.thaw()
+
+def write_rule_outputs(results):
+	"""
+	Side effect phase: write files asked for by rules with add_output().
+
+	Files are written in rule order in the calling process. "outputs" of
+	each result is replaced by the list of files written.
+	"""
+	for res in results:
+		files = []
+		for file, data in res["outputs"]:
+			try:
+				with open(file, "w") as f:
+					json.dump(data, f, indent = 4)
+				files.append(file)
+			except:
+				pass
+		res["outputs"] = files
+
+def evaluate_rules(mgr, args, rules=None, side_effects=True):
+	"""
+	Run rules in one RuleEngine pass without printing anything.
+
+	Return a list of {"name", "passed", "messages", "help_url", "outputs"}
+	in rule order, messages are what check_all_rules() would print for the
+	rule. If side_effects is False, "outputs" are left as (file, data) pairs
+	for write_rule_outputs(), such as in worker processes.
+	"""
+	results = []
+	for record in run_rules(mgr, args, rules):
+		results.append(dict([(k, record[k]) for k in ("name", "passed", "messages", "help_url", "outputs")]))
+	if side_effects:
+		write_rule_outputs(results)
+	return results
+
+def print_rule_results(results):
+	"""Print results of evaluate_rules() the same way as check_all_rules(), return True if all rules passed."""
+	passed = True
+	for res in results:
+		for info in res["messages"]:
+			print(info)
+		if not res["passed"]:
 			passed = False
 
 		if not passed:
-			r.log("  Please refer to: \033[91m%s\x1b[0m" % r.get_help_url())
+			print("  Please refer to: \033[91m%s\x1b[0m" % res["help_url"])
+	return passed
+
+def check_all_rules(mgr, args, modules=None, profiler=None, results=None):
+	"""Check and print all rules, results of each rule are appended to results if it is a list, the same as evaluate_rules()."""
+	records = run_rules(mgr, args, None, modules, profiler is not None)
+	write_rule_outputs(records)
+
+	if profiler:
+		count = len(mgr.get_all()) if modules is None else len(modules)
+		for record in records:
+			profiler.add_phase("rule:%s" % record["name"], record["elapsed"], record["cpu_time"], count)
+
+	if results is not None:
+		for record in records:
+			results.append(dict([(k, record[k]) for k in ("name", "passed", "messages", "help_url", "outputs")]))
+
+	passed = print_rule_results(records)
+
+	for record in records:
+		for entry in record["stale"]:
+			print(format_warning("white list entry %s of %s rule is not used" % (entry, record["name"])))
+
+	if args and getattr(args, "rule_timing", False):
+		for record in records:
+			print("%s rule checking takes %.3f seconds" % (record["name"], record["elapsed"]))
 
 	if args and args.no_fail:
 		return True
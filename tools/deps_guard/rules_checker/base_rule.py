@@ -19,19 +19,58 @@
 import os
 import json
 
+from .whitelist import WhiteList
+
+# Compiled white lists shared by all rule instances in this process
+_white_lists_cache = {}
+
+def reset_white_lists(rule_name=None):
+	"""Load white lists from disk again, for all rules or one rule."""
+	for key in list(_white_lists_cache.keys()):
+		if rule_name is None or key[0] == rule_name:
+			del _white_lists_cache[key]
+
+# Inputs a rule result depends on besides its own white lists:
+#   elf: ELF files and symbolic links, the dependency graph
+#   module_info: system_module_info.json
+#   sa_profile: SA profiles under system/profile
+#   hdi: hdf_default.hcb
+#   inner_kits: build_configs/parts_info/inner_kits_info.json
+RULE_INPUT_KINDS = ("elf", "module_info", "sa_profile", "hdi", "inner_kits")
+
+def format_warning(info):
+	return "\033[35m[WARNING]\x1b[0m: %s" % info
+
 class BaseRule(object):
 	RULE_NAME = ""
+	INPUTS = ("elf", "module_info")
+	# Optional rules only run if enabled by name with --enable-rule
+	OPTIONAL = False
 
 	def __init__(self, mgr, args):
 		self._mgr = mgr
 		self._args = args
-		self.__white_lists = self.load_files("whitelist.json")
+		self.__white_lists = self.load_white_list("whitelist.json")
+		self._passed = True
+		self._messages = None
+		self._partial = False
+		self._outputs = []
 
-	def load_files(self, name):
+	def get_rules_dirs(self):
 		rules_dir = []
 		rules_dir.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), "../rules"))
 		if self._args and self._args.rules:
 			rules_dir = rules_dir + self._args.rules
+		return rules_dir
+
+	def load_white_list(self, name):
+		key = (self.__class__.RULE_NAME, name, tuple(self.get_rules_dirs()))
+		if key not in _white_lists_cache:
+			_white_lists_cache[key] = WhiteList(self.load_files(name), "%s of %s rule" % (name, self.__class__.RULE_NAME))
+		return _white_lists_cache[key]
+
+	def load_files(self, name):
+		rules_dir = self.get_rules_dirs()
 
 		res = []
 		for d in rules_dir:
@@ -51,19 +90,81 @@ class BaseRule(object):
 	def get_white_lists(self):
 		return self.__white_lists
 
+	def buffer_messages(self):
+		"""Keep messages until flush_messages(), so rules evaluated together do not interleave."""
+		if self._messages is None:
+			self._messages = []
+
+	def flush_messages(self):
+		messages = self._messages or []
+		self._messages = None
+		for info in messages:
+			print(info)
+
+	def get_messages(self):
+		return self._messages or []
+
+	def __output(self, info):
+		if self._messages is not None:
+			self._messages.append(info)
+		else:
+			print(info)
+
 	def log(self, info):
-		print(info)
+		self.__output(info)
 
 	def warn(self, info):
-		print("\033[35m[WARNING]\x1b[0m: %s" % info)
+		self.__output(format_warning(info))
 
 	def error(self, info):
-		print("\033[91m[NOT ALLOWED]\x1b[0m: %s" % info)
+		self.__output("\033[91m[NOT ALLOWED]\x1b[0m: %s" % info)
+
+	def set_partial(self):
+		"""Only part of the modules are checked, rules must not write outputs of the whole product."""
+		self._partial = True
+
+	def is_partial(self):
+		return self._partial
+
+	def add_output(self, file, data):
+		"""
+		Save data as a JSON file after all rules are checked.
+
+		Rules may run in worker processes on a frozen graph, so they never
+		write files themselves. Outputs are written by write_rule_outputs()
+		in the main process, in rule order.
+		"""
+		self._outputs.append((file, data))
+
+	def get_outputs(self):
+		return self._outputs
+
+	def set_failed(self):
+		self._passed = False
+
+	def is_passed(self):
+		return self._passed
 
 	def get_help_url(self):
 		return "https://gitee.com/openharmony/developtools_integration_verification/tree/master/tools/deps_guard/rules/%s/README.md" % self.__class__.RULE_NAME
 
-	# To be override
+	# To be override, called by RuleEngine for each module
+	def on_module(self, mod):
+		pass
+
+	# To be override, called by RuleEngine for each dependency in mod["deps"]
+	def on_dependence(self, mod, dep):
+		pass
+
+	# To be override, called by RuleEngine for each dependency in mod["dependedBy"]
+	def on_depended_by(self, mod, dep):
+		pass
+
+	# To be override, called after all modules are visited, return the check result
+	def on_finish(self):
+		return self._passed
+
 	def check(self):
-		# Default pass
-		return True
+		from .rule_engine import RuleEngine
+
+		return RuleEngine(self._mgr, [self]).run()
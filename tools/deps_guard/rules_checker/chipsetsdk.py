@@ -17,12 +17,14 @@
 #
 
 import os
-import json
+
+from elf_file_mgr.innerapi import InnerKitsIndex, HeaderChecker
 
 from .base_rule import BaseRule
 
 class ChipsetSDKRule(BaseRule):
 	RULE_NAME = "ChipsetSDK"
+	INPUTS = ("elf", "module_info", "hdi", "inner_kits")
 
 	def __is_chipsetsdk_tagged(self, mod):
 		if not "innerapi_tags" in mod:
@@ -33,111 +35,107 @@ class ChipsetSDKRule(BaseRule):
 			return True
 		return False
 
-	def __write_innerkits_header_files(self, chipsetsdks):
-		inner_kits_info = os.path.join(self.get_mgr().get_product_out_path(), "build_configs/parts_info/inner_kits_info.json")
-		with open(inner_kits_info, "r") as f:
-			info = json.load(f)
+	def __get_innerkits_header_files(self, chipsetsdks):
+		index = InnerKitsIndex.load(self.get_mgr().get_product_out_path())
 
 		headers = []
 		for sdk in chipsetsdks:
 			path = sdk["labelPath"][:sdk["labelPath"].find(":")]
-			item = {"chipsetsdk": sdk["name"], "path": path, "headers": []}
-			if sdk["componentName"] not in info:
-				headers.append(item)
-				continue
-
-			for name, innerapi in info[sdk["componentName"]].items():
-				if innerapi["label"] != sdk["labelPath"]:
-					continue
-				gotHeaders = True
-				base = innerapi["header_base"]
-				for f in innerapi["header_files"]:
-					item["headers"].append(os.path.join(base, f))
-			headers.append(item)
-
-		try:
-			with open(os.path.join(self.get_mgr().get_product_images_path(), "chipsetsdk_info.json"), "w") as f:
-				json.dump(headers, f, indent = 4)
-		except:
-			pass
+			headers.append({"chipsetsdk": sdk["name"], "path": path, "headers": index.get_headers(sdk["labelPath"], sdk["componentName"])})
 
 		return headers
 
-	def __check_depends_on_chipsetsdk(self):
+	def __check_header_files(self, headers, source_root):
+		checker = HeaderChecker(source_root)
+		for item in headers:
+			for header in checker.get_missing(item["headers"]):
+				self.warn("header %s of Chipset SDK module %s does not exist in %s" % (header, item["chipsetsdk"], source_root))
+
+	def __init__(self, mgr, args):
+		super(ChipsetSDKRule, self).__init__(mgr, args)
+		self._chipsetsdks = []
+		self._chipsetsdk_ids = set()
+		self._modules_with_chipsetsdk_tag = []
+
+	def __add_chipsetsdk(self, mod):
+		if mod["id"] in self._chipsetsdk_ids:
+			return
+		self._chipsetsdk_ids.add(mod["id"])
+		self._chipsetsdks.append(mod)
+
+	def on_module(self, mod):
+		if self.__is_chipsetsdk_tagged(mod):
+			self._modules_with_chipsetsdk_tag.append(mod)
+
+	# Check chipset modules depends
+	def on_dependence(self, mod, dep):
+		# Check chipset modules only
+		if mod["path"].startswith("system"):
+			return
+
+		callee = dep["callee"]
+
+		# If callee is chipset module, it is OK
+		if not callee["path"].startswith("system"):
+			return
+
+		if "hdiType" not in callee or callee["hdiType"] != "hdi_proxy":
+			self.__add_chipsetsdk(callee)
+		# If callee is in Chipset SDK white list module, it is OK
+		if callee["name"] in self.get_white_lists():
+			return
+
+		# If callee is asan library, it is OK
+		if callee["name"].endswith(".asan.so"):
+			return
+
+		# If callee is hdi proxy module, it is OK
+		if "hdiType" in callee and callee["hdiType"] == "hdi_proxy":
+			return
+
+		# Not allowed
+		self.set_failed()
+		self.error("chipset module %s depends on non Chipset SDK module %s in %s" % (mod["name"], callee["name"], mod["labelPath"]))
+
+	# Check chipset modules dependedBy
+	def on_depended_by(self, mod, dep):
+		# Check chipset modules only
+		if mod["path"].startswith("system"):
+			return
+
+		caller = dep["caller"]
+
+		# Called by chipset module, it is OK
+		if not caller["path"].startswith("system"):
+			return
+
+		self.__add_chipsetsdk(mod)
+
+		# If chipset module is in Chipset SDK white list module, it is OK
+		if mod["name"] in self.get_white_lists():
+			return
+
+		# Not allowed
+		self.set_failed()
+		self.error("system module %s depends on chipset module %s in %s" % (caller["name"], mod["name"], caller["labelPath"]))
+
+	def on_finish(self):
 		lists = self.get_white_lists()
 
-		passed = True
-
-		chipsetsdks = []
-		modules_with_chipsetsdk_tag = []
-
-		# Check if any napi modules has dependedBy
-		for mod in self.get_mgr().get_all():
-			if self.__is_chipsetsdk_tagged(mod):
-				modules_with_chipsetsdk_tag.append(mod)
-
-			# Check chipset modules only
-			if mod["path"].startswith("system"):
-				continue
-
-			# Check chipset modules depends
-			for dep in mod["deps"]:
-				callee = dep["callee"]
-
-				# If callee is chipset module, it is OK
-				if not callee["path"].startswith("system"):
-					continue
-
-				if callee not in chipsetsdks:
-					if "hdiType" not in callee or callee["hdiType"] != "hdi_proxy":
-						chipsetsdks.append(callee)
-				# If callee is in Chipset SDK white list module, it is OK
-				if callee["name"] in lists:
-					continue
-
-				# If callee is asan library, it is OK
-				if callee["name"].endswith(".asan.so"):
-					continue
-
-				# If callee is hdi proxy module, it is OK
-				if "hdiType" in callee and callee["hdiType"] == "hdi_proxy":
-					continue
-
-				# Not allowed
-				passed = False
-				self.error("chipset module %s depends on non Chipset SDK module %s in %s" % (mod["name"], callee["name"], mod["labelPath"]))
-
-			# Check chipset modules dependedBy
-			for dep in mod["dependedBy"]:
-				caller = dep["caller"]
-
-				# Called by chipset module, it is OK
-				if not caller["path"].startswith("system"):
-					continue
-
-				if mod not in chipsetsdks:
-					chipsetsdks.append(mod)
-
-				# If chipset module is in Chipset SDK white list module, it is OK
-				if mod["name"] in lists:
-					continue
-
-				# Not allowed
-				passed = False
-				self.error("system module %s depends on chipset module %s in %s" % (caller["name"], mod["name"], caller["labelPath"]))
-
-		for mod in chipsetsdks:
+		for mod in self._chipsetsdks:
 			if not self.__is_chipsetsdk_tagged(mod):
 				self.warn('Chipset SDK module %s has no innerapi_tags with "chipsetsdk" or "csdk", add it in %s' % (mod["name"], mod["labelPath"]))
 
-		for mod in modules_with_chipsetsdk_tag:
+		for mod in self._modules_with_chipsetsdk_tag:
 			if mod["name"] not in lists:
-				passed = False
+				self.set_failed()
 				self.error('non chipsetsdk module %s with innerapi_tags="chipsetsdk" or "csdk", %s' % (mod["name"], mod["labelPath"]))
 
-		self.__write_innerkits_header_files(chipsetsdks)
-
-		return passed
+		# Chipset SDK list is incomplete if only affected modules are checked
+		if not self.is_partial():
+			headers = self.__get_innerkits_header_files(self._chipsetsdks)
+			if self._args and getattr(self._args, "source_root", None):
+				self.__check_header_files(headers, self._args.source_root)
+			self.add_output(os.path.join(self.get_mgr().get_product_images_path(), "chipsetsdk_info.json"), headers)
 
-	def check(self):
-		return self.__check_depends_on_chipsetsdk()
+		return self.is_passed()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+from elf_file_mgr.dep_cycles import DepsCycleReport
+
+from .base_rule import BaseRule
+
+class CycleRule(BaseRule):
+	RULE_NAME = "NO-Cycle-Depends"
+	OPTIONAL = True
+
+	def __init__(self, mgr, args):
+		super(CycleRule, self).__init__(mgr, args)
+		self._visited = set()
+
+	def on_module(self, mod):
+		# Only needed when part of the modules are checked
+		if self.is_partial():
+			self._visited.add(mod["id"])
+
+	def __is_allowed(self, cycle):
+		white_lists = self.get_white_lists()
+		if cycle["key"] in white_lists:
+			return True
+		# A module listed alone may be part of any cycle
+		return all([mod["name"] in white_lists for mod in cycle["modules"]])
+
+	def on_finish(self):
+		for cycle in DepsCycleReport(self.get_mgr()).get_cycles():
+			# A new cycle always has a new dependency from one of the checked modules
+			if self.is_partial() and self._visited.isdisjoint([mod["id"] for mod in cycle["modules"]]):
+				continue
+			if self.__is_allowed(cycle):
+				continue
+
+			self.error("%d modules depend on each other in components [%s]:" % (cycle["size"], ", ".join(cycle["components"])))
+			self.log("   %s" % " -> ".join([mod["name"] for mod in cycle["loop"]]))
+			for mod in cycle["modules"]:
+				self.log("   module [%s] defined in [%s]" % (mod["name"], mod["labelPath"]))
+			self.log("   white list entry: \"%s\"" % cycle["key"])
+			self.set_failed()
+
+		return self._passed
@@ -22,60 +22,60 @@ from .base_rule import BaseRule
 
 class HdiRule(BaseRule):
 	RULE_NAME = "NO-Depends-On-HDI"
+	INPUTS = ("elf", "module_info", "hdi")
 
-	def __check_depends_on_hdi(self):
-		lists = self.get_white_lists()
+	def __init__(self, mgr, args):
+		super(HdiRule, self).__init__(mgr, args)
+		self._hdi_without_shlib_type = []
+		self._non_hdi_with_hdi_shlib_type = []
 
-		passed = True
+	# Check if any napi modules has dependedBy
+	def on_module(self, mod):
+		lists = self.get_white_lists()
 
-		hdi_without_shlib_type = []
-		non_hdi_with_hdi_shlib_type = []
+		is_hdi = False
+		if "hdiType" in mod and mod["hdiType"] == "hdi_service":
+			is_hdi = True
+		# Collect non HDI modules with shlib_type of value "hdi"
+		if not is_hdi and ("shlib_type" in mod and mod["shlib_type"] == "hdi"):
+			self._non_hdi_with_hdi_shlib_type.append(mod)
 
-		# Check if any napi modules has dependedBy
-		for mod in self.get_mgr().get_all():
-			is_hdi = False
-			if "hdiType" in mod and mod["hdiType"] == "hdi_service":
-				is_hdi = True
-			# Collect non HDI modules with shlib_type of value "hdi"
-			if not is_hdi and ("shlib_type" in mod and mod["shlib_type"] == "hdi"):
-				non_hdi_with_hdi_shlib_type.append(mod)
+		# Collect HDI modules without shlib_type with value of "hdi"
+		if is_hdi and ("shlib_type" not in mod or mod["shlib_type"] != "hdi"):
+			if mod["name"] not in lists:
+				self._hdi_without_shlib_type.append(mod)
 
-			# Collect HDI modules without shlib_type with value of "hdi"
-			if is_hdi and ("shlib_type" not in mod or mod["shlib_type"] != "hdi"):
-				if mod["name"] not in lists:
-					hdi_without_shlib_type.append(mod)
+		if not is_hdi:
+			return
 
-			if not is_hdi:
-				continue
+		if len(mod["dependedBy"]) == 0:
+			return
 
-			if len(mod["dependedBy"]) == 0:
-				continue
+		if mod["name"] in lists:
+			return
 
-			if mod["name"] in lists:
-				continue
+		# If hdi module has version_script to specify exported symbols, it can be depended by others
+		if "version_script" in mod:
+			return
 
-			# If hdi module has version_script to specify exported symbols, it can be depended by others
-			if "version_script" in mod:
-				continue
+		# Check if HDI modules is depended by other modules
+		self.error("hdi module %s depended by:" % mod["name"])
+		for dep in mod["dependedBy"]:
+			caller = dep["caller"]
+			self.log("   module [%s] defined in [%s]" % (caller["name"], caller["labelPath"]))
+		self.set_failed()
 
-			# Check if HDI modules is depended by other modules
-			self.error("hdi module %s depended by:" % mod["name"])
-			for dep in mod["dependedBy"]:
-				caller = dep["caller"]
-				self.log("   module [%s] defined in [%s]" % (caller["name"], caller["labelPath"]))
-			passed = False
+	def on_finish(self):
+		lists = self.get_white_lists()
 
-		if len(hdi_without_shlib_type) > 0:
-			for mod in hdi_without_shlib_type:
+		if len(self._hdi_without_shlib_type) > 0:
+			for mod in self._hdi_without_shlib_type:
 				if mod["name"] not in lists:
-					passed = False
+					self.set_failed()
 					self.error('hdi module %s has no shlib_type="hdi", add it in %s' % (mod["name"], mod["labelPath"]))
 
-		if len(non_hdi_with_hdi_shlib_type) > 0:
-			for mod in non_hdi_with_hdi_shlib_type:
+		if len(self._non_hdi_with_hdi_shlib_type) > 0:
+			for mod in self._non_hdi_with_hdi_shlib_type:
 				self.warn('non hdi module %s with shlib_type="hdi", %s' % (mod["name"], mod["labelPath"]))
 
-		return passed
-
-	def check(self):
-		return self.__check_depends_on_hdi()
+		return self.is_passed()
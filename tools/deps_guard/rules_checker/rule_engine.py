@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import time
+
+from .base_rule import BaseRule
+
+def _overrides(rule, name):
+	return getattr(type(rule), name) is not getattr(BaseRule, name)
+
+def _cpu_timed(callback, cpu, i):
+	def timed(*args):
+		start = time.process_time()
+		res = callback(*args)
+		cpu[i] += time.process_time() - start
+		return res
+	return timed
+
+class RuleEngine(object):
+	"""
+	Evaluate rules in one walk over the dependency graph.
+
+	Each module is visited once, then each of its deps and dependedBy edges,
+	and every callback is dispatched to the rules that override it. The cost
+	stays O(V+E) whatever the number of rules.
+
+	If modules is given, only these modules and their edges are visited.
+	If cpu_time is True, CPU time of each rule is measured as well.
+	"""
+	def __init__(self, mgr, rules, modules=None, cpu_time=False):
+		self._mgr = mgr
+		self._rules = rules
+		self._modules = modules
+		self._cpu_time = cpu_time
+		self._elapsed = {}
+		self._cpu = {}
+		self._results = {}
+
+	def run(self):
+		rules = self._rules
+		elapsed = [0.0] * len(rules)
+		clock = time.perf_counter
+
+		module_rules = [(i, r.on_module) for i, r in enumerate(rules) if _overrides(r, "on_module")]
+		deps_rules = [(i, r.on_dependence) for i, r in enumerate(rules) if _overrides(r, "on_dependence")]
+		depended_rules = [(i, r.on_depended_by) for i, r in enumerate(rules) if _overrides(r, "on_depended_by")]
+		finish_rules = [(i, r.on_finish) for i, r in enumerate(rules)]
+
+		# Only pay for the second clock when asked to
+		cpu = [0.0] * len(rules)
+		if self._cpu_time:
+			module_rules = [(i, _cpu_timed(callback, cpu, i)) for i, callback in module_rules]
+			deps_rules = [(i, _cpu_timed(callback, cpu, i)) for i, callback in deps_rules]
+			depended_rules = [(i, _cpu_timed(callback, cpu, i)) for i, callback in depended_rules]
+			finish_rules = [(i, _cpu_timed(callback, cpu, i)) for i, callback in finish_rules]
+
+		modules = self._modules
+		if modules is None:
+			modules = self._mgr.get_all()
+
+		for mod in modules:
+			for i, callback in module_rules:
+				start = clock()
+				callback(mod)
+				elapsed[i] += clock() - start
+
+			if deps_rules:
+				for dep in mod["deps"]:
+					for i, callback in deps_rules:
+						start = clock()
+						callback(mod, dep)
+						elapsed[i] += clock() - start
+
+			if depended_rules:
+				for dep in mod["dependedBy"]:
+					for i, callback in depended_rules:
+						start = clock()
+						callback(mod, dep)
+						elapsed[i] += clock() - start
+
+		passed = True
+		for i, callback in finish_rules:
+			r = rules[i]
+			start = clock()
+			result = callback()
+			elapsed[i] += clock() - start
+			self._results[r.RULE_NAME] = result
+			self._elapsed[r.RULE_NAME] = elapsed[i]
+			if self._cpu_time:
+				self._cpu[r.RULE_NAME] = cpu[i]
+			if not result:
+				passed = False
+
+		return passed
+
+	def get_result(self, rule):
+		return self._results[rule.RULE_NAME]
+
+	def get_elapsed(self, rule):
+		"""Seconds spent in the callbacks of the rule."""
+		return self._elapsed[rule.RULE_NAME]
+
+	def get_cpu_time(self, rule):
+		"""CPU seconds spent in the callbacks of the rule, None if not measured."""
+		return self._cpu.get(rule.RULE_NAME)
+
+	def get_module_count(self):
+		"""Number of modules visited by the last run."""
+		if self._modules is None:
+			return len(self._mgr.get_all())
+		return len(self._modules)
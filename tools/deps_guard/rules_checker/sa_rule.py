@@ -22,58 +22,56 @@ from .base_rule import BaseRule
 
 class SaRule(BaseRule):
 	RULE_NAME = "NO-Depends-On-SA"
+	INPUTS = ("elf", "module_info", "sa_profile")
 
-	def __check_depends_on_sa(self):
-		lists = self.get_white_lists()
-
-		passed = True
-
-		sa_without_shlib_type = []
-		non_sa_with_sa_shlib_type = []
-
-		# Check if any napi modules has dependedBy
-		for mod in self.get_mgr().get_all():
-			is_sa = False
-			if "sa_id" in mod and mod["sa_id"] > 0:
-				is_sa = True
-			# Collect non SA modules with shlib_type of value "sa"
-			if not is_sa and ("shlib_type" in mod and mod["shlib_type"] == "sa"):
-				non_sa_with_sa_shlib_type.append(mod)
-
-			# Collect SA modules without shlib_type with value of "sa"
-			if is_sa and ("shlib_type" not in mod or mod["shlib_type"] != "sa"):
-				if mod["name"] not in lists:
-					sa_without_shlib_type.append(mod)
-
-			if not is_sa:
-				continue
+	def __init__(self, mgr, args):
+		super(SaRule, self).__init__(mgr, args)
+		self._sa_without_shlib_type = []
+		self._non_sa_with_sa_shlib_type = []
 
-			if len(mod["dependedBy"]) == 0:
-				continue
-
-			if mod["name"] in lists:
-				continue
-
-			# If sa module has version_script to specify exported symbols, it can be depended by others
-			if "version_script" in mod:
-				continue
-
-			# Check if SA modules is depended by other modules
-			self.error("sa module %s depended by:" % mod["name"])
-			for dep in mod["dependedBy"]:
-				caller = dep["caller"]
-				self.log("   module [%s] defined in [%s]" % (caller["name"], caller["labelPath"]))
-			passed = False
+	# Check if any napi modules has dependedBy
+	def on_module(self, mod):
+		lists = self.get_white_lists()
 
-		if len(sa_without_shlib_type) > 0:
-			for mod in sa_without_shlib_type:
+		is_sa = False
+		if "sa_id" in mod and mod["sa_id"] > 0:
+			is_sa = True
+		# Collect non SA modules with shlib_type of value "sa"
+		if not is_sa and ("shlib_type" in mod and mod["shlib_type"] == "sa"):
+			self._non_sa_with_sa_shlib_type.append(mod)
+
+		# Collect SA modules without shlib_type with value of "sa"
+		if is_sa and ("shlib_type" not in mod or mod["shlib_type"] != "sa"):
+			if mod["name"] not in lists:
+				self._sa_without_shlib_type.append(mod)
+
+		if not is_sa:
+			return
+
+		if len(mod["dependedBy"]) == 0:
+			return
+
+		if mod["name"] in lists:
+			return
+
+		# If sa module has version_script to specify exported symbols, it can be depended by others
+		if "version_script" in mod:
+			return
+
+		# Check if SA modules is depended by other modules
+		self.error("sa module %s depended by:" % mod["name"])
+		for dep in mod["dependedBy"]:
+			caller = dep["caller"]
+			self.log("   module [%s] defined in [%s]" % (caller["name"], caller["labelPath"]))
+		self.set_failed()
+
+	def on_finish(self):
+		if len(self._sa_without_shlib_type) > 0:
+			for mod in self._sa_without_shlib_type:
 				self.warn('sa module %s has no shlib_type="sa", add it in %s' % (mod["name"], mod["labelPath"]))
 
-		if len(non_sa_with_sa_shlib_type) > 0:
-			for mod in non_sa_with_sa_shlib_type:
+		if len(self._non_sa_with_sa_shlib_type) > 0:
+			for mod in self._non_sa_with_sa_shlib_type:
 				self.warn('non sa module %s with shlib_type="sa", %s' % (mod["name"], mod["labelPath"]))
 
-		return passed
-
-	def check(self):
-		return self.__check_depends_on_sa()
+		return self.is_passed()
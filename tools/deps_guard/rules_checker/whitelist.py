@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+#coding=utf-8
+
+#
+# Copyright (c) 2023 Huawei Device Co., Ltd.
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+
+import re
+import fnmatch
+
+REGEX_PREFIX = "re:"
+GLOB_CHARS = "*?["
+
+class WhiteList(object):
+	"""
+	Compiled white list of a rule.
+
+	Plain names are kept in a set, glob entries (such as "*.asan.so") and
+	entries starting with "re:" are compiled one by one and tried in order.
+	Every entry records whether it was ever matched, so stale entries can
+	be reported after checking. Invalid regular expressions are reported
+	with source, the rule and file the entries come from, and ignored.
+	"""
+	def __init__(self, entries, source=None):
+		self._entries = []
+		self._names = set()
+		self._matched = set()
+		self._patterns = []
+		self._pattern_results = {}
+
+		seen = set()
+		for entry in entries:
+			if entry in seen:
+				continue
+			seen.add(entry)
+			if entry.startswith(REGEX_PREFIX):
+				regex = entry[len(REGEX_PREFIX):]
+			elif any(c in entry for c in GLOB_CHARS):
+				regex = fnmatch.translate(entry)
+			else:
+				self._entries.append(entry)
+				self._names.add(entry)
+				continue
+			try:
+				# Compiled alone first, so errors are about the entry itself
+				re.compile(regex)
+				self._patterns.append((re.compile(regex + "\\Z"), entry))
+			except re.error as e:
+				print("Warning: invalid white list entry %s in %s: %s, it is ignored" % (entry, source or "white list", str(e)))
+				continue
+			self._entries.append(entry)
+
+	def __match_pattern(self, name):
+		# Pattern results are memorized, so each name is matched once
+		if name in self._pattern_results:
+			return self._pattern_results[name]
+		entry = None
+		for regex, pattern_entry in self._patterns:
+			if regex.match(name):
+				entry = pattern_entry
+				break
+		self._pattern_results[name] = entry
+		return entry
+
+	def __contains__(self, name):
+		if name in self._names:
+			self._matched.add(name)
+			return True
+		if not self._patterns:
+			return False
+		entry = self.__match_pattern(name)
+		if entry is None:
+			return False
+		self._matched.add(entry)
+		return True
+
+	def __iter__(self):
+		return iter(self._entries)
+
+	def __len__(self):
+		return len(self._entries)
+
+	def get_stale_entries(self):
+		return [entry for entry in self._entries if entry not in self._matched]